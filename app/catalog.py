@@ -0,0 +1,210 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Columns the document listing can be sorted by
+SORTABLE_COLUMNS = ("created_at", "document_name", "chunk_count")
+
+# Global catalog
+_catalog = None
+
+class DocumentCatalog:
+    """
+    Lightweight SQLite catalog of ingested documents, kept next to the Chroma data.
+
+    It holds one row per document so listings never have to scan the chunk collection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    document_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    content_hash TEXT
+                )
+                """
+            )
+            # Catalogs created before content hashes were tracked
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if "content_hash" not in columns:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+
+            for column in SORTABLE_COLUMNS:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_source ON documents (source, document_name)")
+
+    def add_document(
+        self,
+        document_id: str,
+        document_name: str,
+        source: str,
+        chunk_count: int,
+        created_at: datetime,
+        content_hash: Optional[str] = None
+    ):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO documents (document_id, document_name, source, chunk_count, created_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (document_id, document_name, source, chunk_count, created_at.isoformat(), content_hash)
+            )
+
+    def delete_document(self, document_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+            return cursor.rowcount > 0
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Find a document with exactly this content"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE content_hash = ? LIMIT 1", (content_hash,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find_previous_version(self, document_name: str, source: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an earlier version of a document.
+
+        A document with the same name from the same source is a previous version. Sources that carry
+        an external ID (e.g. "google_drive:<file id>") identify the document on their own, so a
+        renamed file is still matched.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE source = ? AND document_name = ? ORDER BY created_at DESC LIMIT 1",
+                (source, document_name)
+            ).fetchone()
+            if row is None and ":" in source:
+                row = self._conn.execute(
+                    "SELECT * FROM documents WHERE source = ? ORDER BY created_at DESC LIMIT 1", (source,)
+                ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_documents(
+        self, limit: int = 100, offset: int = 0, sort_by: str = "created_at", descending: bool = True
+    ) -> List[Dict[str, Any]]:
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort documents by {sort_by}")
+
+        order = "DESC" if descending else "ASC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM documents ORDER BY {sort_by} {order}, document_id LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def rebuild(self, vector_store, page_size: int = 5000) -> int:
+        """Reconstruct the catalog from chunk metadata in the vector store, one page at a time"""
+        documents = {}
+        offset = 0
+
+        while True:
+            page = vector_store.get(include=["metadatas"], limit=page_size, offset=offset)
+            metadatas = page["metadatas"] if page else []
+            if not metadatas:
+                break
+
+            for metadata in metadatas:
+                document_id = metadata.get("document_id")
+                if not document_id:
+                    continue
+                created_at = metadata.get("created_at") or datetime.now().isoformat()
+                document = documents.setdefault(document_id, {
+                    "document_name": metadata.get("document_name", "Unknown"),
+                    "source": metadata.get("source", "Unknown"),
+                    "chunk_count": 0,
+                    "created_at": created_at,
+                    "content_hash": metadata.get("content_hash")
+                })
+                document["chunk_count"] += 1
+                document["created_at"] = min(document["created_at"], created_at)
+
+            offset += len(metadatas)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.executemany(
+                """
+                INSERT INTO documents (document_id, document_name, source, chunk_count, created_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        document_id, doc["document_name"], doc["source"], doc["chunk_count"],
+                        doc["created_at"], doc["content_hash"]
+                    )
+                    for document_id, doc in documents.items()
+                ]
+            )
+
+        logger.info(f"Rebuilt document catalog with {len(documents)} documents from {offset} chunks")
+        return len(documents)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        document = dict(row)
+        document["created_at"] = datetime.fromisoformat(document["created_at"])
+        return document
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+async def get_catalog() -> DocumentCatalog:
+    """Get or create the document catalog"""
+    global _catalog
+    if _catalog is None:
+        _catalog = DocumentCatalog(os.path.join(settings.chroma_persist_directory, "catalog.db"))
+    return _catalog
+
+if __name__ == "__main__":
+    # Rebuild the catalog from the vector store: python -m app.catalog rebuild
+    import sys
+    import asyncio
+    from app.services.vector_store import get_vector_store
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.catalog rebuild")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO)
+    vector_store = asyncio.run(get_vector_store())
+    catalog = DocumentCatalog(os.path.join(settings.chroma_persist_directory, "catalog.db"))
+    count = catalog.rebuild(vector_store)
+    vector_store.close()
+    print(f"Catalog rebuilt with {count} documents")
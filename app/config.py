@@ -5,6 +5,15 @@ from typing import Optional
 class Settings(BaseModel):
     # ChromaDB
     chroma_persist_directory: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "chroma_db")
+
+    # Vector store: "chroma", or "numpy" for memory-mapped arrays in the data directory
+    vector_store: str = os.getenv("VECTOR_STORE", "chroma")
+    vector_store_dtype: str = os.getenv("VECTOR_STORE_DTYPE", "float16")  # float32, float16 or int8 (numpy store)
+    vector_index: str = os.getenv("VECTOR_INDEX", "auto")  # flat, hnsw, or auto: flat below the threshold
+    vector_hnsw_threshold: int = int(os.getenv("VECTOR_HNSW_THRESHOLD", "50000"))
+    hnsw_m: int = int(os.getenv("HNSW_M", "16"))
+    hnsw_ef_construction: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    hnsw_ef_search: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
     
     # LLM
     ollama_base_url: str = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
@@ -13,19 +22,116 @@ class Settings(BaseModel):
     temperature: float = float(os.getenv("TEMPERATURE", "0.7"))
     top_p: float = float(os.getenv("TOP_P", "0.9"))
     max_tokens: int = int(os.getenv("MAX_TOKENS", "2000"))
+    ollama_timeout: float = float(os.getenv("OLLAMA_TIMEOUT", "240"))
+    ollama_max_concurrency: int = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "1"))  # across all workers
+    ollama_max_queue: int = int(os.getenv("OLLAMA_MAX_QUEUE", "16"))
+    ollama_keep_alive: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # how long Ollama keeps the model loaded
+    warmup_retry_interval: float = float(os.getenv("WARMUP_RETRY_INTERVAL", "30"))
 
     # Google Drive
     google_credentials_file: str = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials/credentials.json")
     google_token_file: str = os.getenv("GOOGLE_TOKEN_FILE", "credentials/token.json")
+    drive_download_workers: int = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "4"))
+    drive_page_size: int = int(os.getenv("DRIVE_PAGE_SIZE", "1000"))
 
     # Vector store
     collection_name: str = "document_chunks"
+    # Set to use a Chroma server (`chroma run`) instead of opening chroma_persist_directory in-process,
+    # required when running several workers
+    chroma_server_host: Optional[str] = os.getenv("CHROMA_SERVER_HOST")
+    chroma_server_port: int = int(os.getenv("CHROMA_SERVER_PORT", "8000"))
 
     # Embedding model and service
-    embedding_model: str = "all-MiniLM-L6-v2"
-    
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    embedding_workers: int = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "huggingface")  # huggingface, onnx or onnx-int8
+    embedding_max_tokens: int = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))  # the model's max sequence length
+    onnx_model_directory: str = os.getenv("ONNX_MODEL_DIRECTORY", "models")
+    onnx_threads: int = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets ONNX Runtime decide
+    # Set to embed through a shared embedding server (app/embedding_server.py) instead of loading the model in every worker
+    embedding_server_url: Optional[str] = os.getenv("EMBEDDING_SERVER_URL")
+    embedding_server_timeout: float = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "60"))
+
+    # Re-embedding: when embedding_model differs from the model of the active collection, a background
+    # job re-embeds every chunk into a new collection and swaps it in (see app/services/reembedding.py)
+    reembed_auto_start: bool = os.getenv("REEMBED_AUTO_START", "true").lower() == "true"
+    reembed_batch_size: int = int(os.getenv("REEMBED_BATCH_SIZE", "1024"))  # chunks read and embedded per step
+    reembed_duty_cycle: float = float(os.getenv("REEMBED_DUTY_CYCLE", "0.5"))  # share of the time the job may work
+    reembed_keep_previous: bool = os.getenv("REEMBED_KEEP_PREVIOUS", "false").lower() == "true"
+
+    # Several workers (uvicorn --workers) share runtime settings, ingestion jobs and migrations through
+    # SQLite in the data directory; each worker reports itself alive at this interval
+    worker_heartbeat_interval: float = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "2"))
+    worker_heartbeat_timeout: float = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "30"))  # then its work is taken over
+
+    # Embedding cache
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv(
+        "EMBEDDING_CACHE_PATH",
+        os.path.join(os.getenv("CHROMA_PERSIST_DIRECTORY", "chroma_db"), "embedding_cache.db")
+    )
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+    # Query cache
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    query_cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+    # Retrieval: "vector", or "hybrid" to fuse BM25 and vector results with reciprocal rank fusion
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "vector")
+    retrieval_top_k: int = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # taken from each ranking before fusion
+    rrf_k: int = int(os.getenv("RRF_K", "60"))
+
+    # Batch search API (/api/search)
+    search_max_queries: int = int(os.getenv("SEARCH_MAX_QUERIES", "1000"))
+    search_max_top_k: int = int(os.getenv("SEARCH_MAX_TOP_K", "100"))
+
+    # Context assembly: overlapping chunks are merged and near-duplicates dropped to fit the token budget
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    mmr_lambda: float = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = relevance only, 0 = diversity only
+    context_duplicate_similarity: float = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.95"))
+
+    # Chat sessions: past this many history tokens, older turns are summarized in the background
+    session_history_tokens: int = int(os.getenv("SESSION_HISTORY_TOKENS", "1000"))
+    session_keep_messages: int = int(os.getenv("SESSION_KEEP_MESSAGES", "4"))  # recent messages kept verbatim
+    session_summary_tokens: int = int(os.getenv("SESSION_SUMMARY_TOKENS", "256"))
+    session_ttl_days: int = int(os.getenv("SESSION_TTL_DAYS", "30"))
+
+    # Cross-encoder reranking: score a wider candidate set and keep only the best chunks for the prompt
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    rerank_keep: int = int(os.getenv("RERANK_KEEP", "3"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    rerank_cache_size: int = int(os.getenv("RERANK_CACHE_SIZE", "8192"))
+
+    # Answer cache
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    answer_cache_max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+    answer_cache_similarity: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
     # Chunk settings
     chunk_size: int = 1000
     chunk_overlap: int = 200
 
+    # Ingestion
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "1"))
+    upload_spool_directory: str = os.getenv(
+        "UPLOAD_SPOOL_DIRECTORY",
+        os.path.join(os.getenv("CHROMA_PERSIST_DIRECTORY", "chroma_db"), "uploads")
+    )
+    upload_block_size: int = int(os.getenv("UPLOAD_BLOCK_SIZE", str(1024 * 1024)))
+    ingest_window: int = int(os.getenv("INGEST_WINDOW", "256"))  # chunks embedded and written at a time
+    pdf_workers: int = int(os.getenv("PDF_WORKERS", "2"))
+    pdf_parallel_min_pages: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+    pdf_pages_per_task: int = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+
+    # Bulk ingestion
+    bulk_extract_workers: int = int(os.getenv("BULK_EXTRACT_WORKERS", "4"))
+    bulk_batch_size: int = int(os.getenv("BULK_BATCH_SIZE", "1024"))  # chunks embedded together across documents
+    archive_max_members: int = int(os.getenv("ARCHIVE_MAX_MEMBERS", "10000"))
+    archive_max_member_bytes: int = int(os.getenv("ARCHIVE_MAX_MEMBER_BYTES", str(100 * 1024 * 1024)))
+    chroma_add_batch_size: int = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "5000"))
+
 settings = Settings()
\ No newline at end of file
@@ -1,43 +1,65 @@
-import chromadb
-import os
 import logging
-from chromadb.config import Settings as ChromaSettings
 from app.config import settings
+from app.catalog import get_catalog
+from app.services.lexical_index import get_lexical_index
+from app.services.vector_store import get_vector_store
+from app.services.answer_cache import answer_cache
+from app.services.shared_state import get_shared_state
 
 logger = logging.getLogger(__name__)
 
-# Global client for ChromaDB
-_client = None
+# Incremented whenever documents are added or deleted, so cached query results can be invalidated.
+# The counter lives in the shared state so every worker sees it; this is the value last seen here
+_collection_version = 0
+_shared_state = None
 
 async def init_db():
-    """Initialize the ChromaDB client and create the collection if needed"""
-    global _client
-    
+    """Open the vector store, and rebuild the catalog and lexical index from it if they are missing"""
+    global _shared_state
+    _shared_state = await get_shared_state()
+    sync_collection_version()
     try:
-        # Create the directory for ChromaDB persistence if it doesn't exist
-        os.makedirs(settings.chroma_persist_directory, exist_ok=True)
-        
-        # Initialize ChromaDB client with persistence
-        _client = chromadb.PersistentClient(path=settings.chroma_persist_directory)
-        
-        # Create the collection - this will either create a new one or get an existing one
-        try:
-            # Try to get the collection first
-            collection = _client.get_collection(name=settings.collection_name)
-            logger.info(f"Using existing collection: {settings.collection_name}")
-        except Exception:
-            # If it doesn't exist, create it
-            collection = _client.create_collection(name=settings.collection_name)
-            logger.info(f"Created new collection: {settings.collection_name}")
+        vector_store = await get_vector_store()
+
+        # Populate the document catalog for collections created before it existed
+        catalog = await get_catalog()
+        if catalog.count() == 0 and vector_store.count() > 0:
+            logger.info("Document catalog is empty, rebuilding it from the vector store")
+            catalog.rebuild(vector_store)
+
+        # Likewise for the lexical index used by hybrid retrieval
+        lexical_index = await get_lexical_index()
+        if lexical_index.count() == 0 and vector_store.count() > 0:
+            logger.info("Lexical index is empty, rebuilding it from the vector store")
+            lexical_index.rebuild(vector_store)
             
-        logger.info("ChromaDB initialized successfully")
+        logger.info(f"Vector store ({settings.vector_store}) initialized successfully")
     except Exception as e:
-        logger.error(f"Error initializing ChromaDB: {str(e)}")
+        logger.error(f"Error initializing the vector store: {str(e)}")
         raise
 
-async def get_client():
-    """Return the ChromaDB client instance"""
-    global _client
-    if _client is None:
-        await init_db()
-    return _client
\ No newline at end of file
+def get_collection_version() -> int:
+    """Return the current version of the collection contents"""
+    return _collection_version
+
+def sync_collection_version():
+    """Pick up changes made by other workers, dropping the cached answers they may have made stale"""
+    global _collection_version
+    if _shared_state is None:
+        return
+    version = _shared_state.counter("collection_version")
+    if version != _collection_version:
+        _collection_version = version
+        answer_cache.clear()
+
+def bump_collection_version():
+    """Mark the collection contents as changed"""
+    global _collection_version
+    if _shared_state is None:
+        _collection_version += 1
+        return
+    version = _shared_state.increment("collection_version")
+    if version != _collection_version + 1:
+        # Another worker changed the collection too
+        answer_cache.clear()
+    _collection_version = version
@@ -0,0 +1,69 @@
+"""
+Shared embedding server: holds the embedding models once for all the workers of the app,
+instead of one copy per worker process.
+
+Point the workers to it with EMBEDDING_SERVER_URL, and run a single process of it:
+
+    uvicorn app.embedding_server:app --host 0.0.0.0 --port 8100
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+from app.config import settings
+from app.services.embedding_backends import create_backend, EmbeddingBackend
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Embedding server")
+
+# One backend per (model, backend name), created on first use
+_backends: Dict[Tuple[str, str], EmbeddingBackend] = {}
+
+# The models run in worker threads so encoding never blocks the event loop
+_executor = ThreadPoolExecutor(max_workers=settings.embedding_workers, thread_name_prefix="embedding")
+
+class LoadRequest(BaseModel):
+    model: str
+    backend: str = Field(default=settings.embedding_backend)
+
+class EmbedRequest(LoadRequest):
+    texts: List[str]
+
+def _backend(model: str, name: str) -> EmbeddingBackend:
+    key = (model, name)
+    if key not in _backends:
+        try:
+            _backends[key] = create_backend(name, model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return _backends[key]
+
+@app.post("/load")
+async def load(request: LoadRequest):
+    """Load a model ahead of its first use"""
+    backend = _backend(request.model, request.backend)
+    await asyncio.get_running_loop().run_in_executor(_executor, backend.load)
+    return {"model": request.model, "backend": backend.name}
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    """Embed texts; the response body holds one float32 row per text"""
+    backend = _backend(request.model, request.backend)
+    vectors = await asyncio.get_running_loop().run_in_executor(_executor, backend.embed, request.texts) if request.texts else []
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(request.texts), -1) if vectors else np.zeros((0, 0), np.float32)
+    return Response(
+        content=matrix.tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Embedding-Dimension": str(matrix.shape[1])}
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "models": [f"{model} ({name})" for model, name in _backends]}
@@ -1,16 +1,114 @@
+import time
+import asyncio
+import logging
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from app.routes import chat, documents, settings
-from app.database import init_db
+from app.config import settings as app_settings
+from app.routes import chat, documents, embeddings, search, settings
+from app.database import init_db, sync_collection_version
+from app.services.chat_service import get_chat_service
+from app.services.document_service import get_document_service
+from app.services.embeddings_service import get_embedding_service
+from app.services.ollama_client import get_ollama_client, close_ollama_client
+from app.services.ingestion_jobs import get_job_queue
+from app.services.sessions import get_session_manager
+from app.services.metrics import ServerTimingMiddleware, render_metrics
+from app.services.vector_store import close_vector_store, is_multiprocess_safe
+from app.services.reembedding import get_migrator
+from app.services.shared_state import (
+    get_shared_state, close_shared_state, apply_settings, SharedStateMiddleware
+)
+
+logger = logging.getLogger(__name__)
+
+async def warm_up(app: FastAPI):
+    """
+    Load the embedding model, the reranker and the Ollama model before traffic arrives.
+
+    Progress is tracked in app.state.warmup, which the readiness probe reports. Ollama (and a
+    remote embedding backend) may start after the app, and a failed model load would otherwise
+    keep the app unready for good, so every step is retried until it succeeds.
+    """
+    state = app.state.warmup
+
+    async def run(name: str, step):
+        while True:
+            try:
+                await step()
+                state[name] = "ready"
+                logger.info(f"Warmup: {name} ready")
+                return
+            except Exception as e:
+                state[name] = f"failed: {str(e)}"
+                logger.error(f"Warmup: {name} failed: {str(e)}")
+                await asyncio.sleep(app_settings.warmup_retry_interval)
+
+    async def load_ollama_model():
+        await app.state.ollama_client.warmup(app_settings.ollama_model, app_settings.ollama_keep_alive)
+
+    steps = [
+        run("embedding_model", app.state.embedding_service.warmup),
+        run("ollama_model", load_ollama_model)
+    ]
+    if app.state.chat_service.reranker is not None:
+        steps.append(run("reranker", app.state.chat_service.reranker.warmup))
+    await asyncio.gather(*steps)
+
+async def check_single_worker():
+    """
+    Refuse to start next to another live worker when the vector store is local files, which
+    several processes would corrupt (the numpy store, or Chroma without CHROMA_SERVER_HOST).
+
+    A worker that crashed leaves a heartbeat behind, so one recent heartbeat is waited out until
+    it expires or the worker proves alive with a new one.
+    """
+    if is_multiprocess_safe():
+        return
+    shared_state = await get_shared_state()
+    started = time.time()
+    while await asyncio.to_thread(shared_state.other_workers, since=started - app_settings.worker_heartbeat_timeout):
+        if await asyncio.to_thread(shared_state.other_workers, since=started):
+            raise RuntimeError(
+                f"Another worker is running, but the {app_settings.vector_store} vector store only supports one process: "
+                "run a single worker, or set CHROMA_SERVER_HOST to use a Chroma server"
+            )
+        await asyncio.sleep(app_settings.worker_heartbeat_interval)
+
+async def sync_with_workers():
+    """Pick up what other workers changed: runtime settings, the collection contents and the active collection"""
+    shared_state = await get_shared_state()
+    # SQLite may wait for another worker's lock, so it is kept off the event loop
+    if await asyncio.to_thread(shared_state.changed):
+        apply_settings(await asyncio.to_thread(shared_state.settings))
+        sync_collection_version()
+    await (await get_migrator()).follow()
+
+async def heartbeat(app: FastAPI):
+    """Report this worker alive, keep in sync while idle, and take over the work of workers that died"""
+    while True:
+        await asyncio.sleep(app_settings.worker_heartbeat_interval)
+        try:
+            await asyncio.to_thread((await get_shared_state()).heartbeat)
+            await sync_with_workers()
+            await app.state.job_queue.adopt_orphans()
+            await app.state.migrator.watch()
+        except Exception as e:
+            logger.error(f"Worker heartbeat failed: {str(e)}")
 
 # Define lifespan first
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
+    await check_single_worker()
+
+    # Settings changed at runtime through /api/settings, shared by every worker
+    apply_settings(await asyncio.to_thread((await get_shared_state()).settings))
+
     print("Initializing database...")
     try:
         await init_db()
@@ -18,12 +116,48 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Error initializing database: {str(e)}")
         raise e
+
+    # Application-scoped services, shared by every request
+    app.state.embedding_service = await get_embedding_service()
+    app.state.ollama_client = await get_ollama_client()
+    app.state.document_service = await get_document_service()
+    app.state.chat_service = await get_chat_service()
+
+    # Resume an interrupted re-embedding, or start one if the embedding model was changed
+    app.state.migrator = await get_migrator()
+    await app.state.migrator.resume()
+
+    # Start background ingestion, resuming jobs queued before a restart
+    app.state.job_queue = await get_job_queue()
+    await app.state.job_queue.start()
+    await (await get_session_manager()).start()
+    heartbeat_task = asyncio.create_task(heartbeat(app))
+
+    # Models load in the background, the readiness probe reports when they are done
+    app.state.warmup = {"embedding_model": "pending", "ollama_model": "pending"}
+    if app.state.chat_service.reranker is not None:
+        app.state.warmup["reranker"] = "pending"
+    warmup_task = asyncio.create_task(warm_up(app))
     yield
-    # Shutdown logic (if any)
+    # Shutdown logic
+    for task in (warmup_task, heartbeat_task):
+        task.cancel()
+    await asyncio.gather(warmup_task, heartbeat_task, return_exceptions=True)
+    await app.state.migrator.stop()
+    await app.state.job_queue.stop()
+    await (await get_session_manager()).stop()
+    await close_ollama_client()
+    close_vector_store()
+    close_shared_state()
 
 # Create FastAPI app with lifespan
 app = FastAPI(title="Document RAG Chat", lifespan=lifespan)
 
+# Per-stage timings in a Server-Timing header on /api responses, and request latency metrics
+app.add_middleware(ServerTimingMiddleware)
+# Settings and collection changes made by other workers are applied before each request
+app.add_middleware(SharedStateMiddleware, refresh=sync_with_workers)
+
 # Mount static files
 static_path = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=static_path), name="static")
@@ -34,17 +168,37 @@ templates = Jinja2Templates(directory="templates")
 # Include routers
 app.include_router(chat.router)
 app.include_router(documents.router)
+app.include_router(embeddings.router)
+app.include_router(search.router)
 app.include_router(settings.router)  # Added settings router
 
 @app.get("/")
 async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-# Health check endpoint
+# Health check endpoints
 @app.get("/health")
-async def health_check():
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving requests"""
     return {"status": "ok"}
 
+@app.get("/health/ready")
+async def health_ready(request: Request):
+    """Readiness: the models are loaded; 503 until warmup has completed"""
+    warmup = request.app.state.warmup
+    ready = all(status == "ready" for status in warmup.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "warmup": warmup}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latencies, token counts, ingestion and cache counters in Prometheus format"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
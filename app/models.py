@@ -15,6 +15,35 @@ class DocumentCreate(DocumentBase):
 class DocumentResponse(DocumentBase):
     chunk_count: int
     created_at: datetime
+    status: Optional[str] = Field(default=None, description="Ingestion outcome: inserted, updated or skipped")
+    chunks_added: int = Field(default=0, description="Chunks embedded and added by this ingestion")
+    chunks_removed: int = Field(default=0, description="Chunks of a previous version removed by this ingestion")
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, completed or failed")
+    document_name: str
+    source: str
+    chunks_done: int = Field(default=0, description="Chunks processed so far")
+    chunks_total: Optional[int] = Field(default=None, description="Total chunks, estimated until the job completes")
+    error: Optional[str] = None
+    result: Optional[DocumentResponse] = None
+    created_at: datetime
+    updated_at: datetime
+
+class BulkDocumentResult(BaseModel):
+    document_name: str
+    status: str = Field(..., description="inserted, updated, skipped or failed")
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
+
+class BulkIngestionResponse(BaseModel):
+    documents: List[BulkDocumentResult]
+    files: int
+    chunks: int = Field(..., description="Chunks produced across all documents")
+    seconds: float
+    files_per_second: float
+    chunks_per_second: float
 
 # ========== CHAT MODELS ==========
 
@@ -35,3 +64,32 @@ class ChatResponse(BaseModel):
 
 class DriveIngestionRequest(BaseModel):
     folder_id: Optional[str] = Field(default=None, description="Optional Google Drive folder ID to ingest")
+
+# ========== EMBEDDING MIGRATION MODELS ==========
+
+class EmbeddingMigrationRequest(BaseModel):
+    embedding_model: Optional[str] = Field(default=None, description="Model to re-embed with; defaults to the configured embedding model")
+
+class EmbeddingMigrationResponse(BaseModel):
+    migration_id: str
+    status: str = Field(..., description="running, completed, failed or cancelled")
+    phase: str = Field(..., description="copy, catch_up, swap or done")
+    source_collection: str
+    target_collection: str
+    source_model: str
+    target_model: str
+    chunks_done: int = Field(default=0, description="Chunks in the new collection")
+    chunks_total: Optional[int] = Field(default=None, description="Chunks in the active collection")
+    running: Optional[bool] = Field(default=None, description="Whether a live worker is running the migration")
+    chunks_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+
+class EmbeddingStatusResponse(BaseModel):
+    active_collection: Optional[str] = None
+    embedding_model: Optional[str] = Field(default=None, description="Model that produced the active collection")
+    configured_model: str = Field(..., description="settings.embedding_model")
+    migration: Optional[EmbeddingMigrationResponse] = Field(default=None, description="The latest migration")
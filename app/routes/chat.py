@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+import json
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
-from app.services.chat_service import get_chat_service, ChatService
+from app.services.chat_service import get_chat_service, retrieval_stats, ChatService
+from app.services.ollama_client import get_ollama_client, OllamaClient, OllamaBusyError
+from app.services.reranker import get_reranker, Reranker
+from app.services.sessions import get_session_manager, SessionManager, SessionNotFoundError
 
 router = APIRouter(
     prefix="/api/chat",
@@ -14,10 +20,16 @@ class ChatRequest(BaseModel):
     history: Optional[List[Dict[str, Any]]] = []
     use_llm: bool = True
     skip_retrieval: bool = False
+    use_cache: bool = True
+    retrieval_mode: Optional[str] = Field(default=None, pattern="^(vector|hybrid)$")
+    session_id: Optional[str] = Field(
+        default=None, description="Server-side session; if omitted, one is started once the LLM answers"
+    )
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]] = []
+    session_id: Optional[str] = Field(default=None, description="The session the turn was recorded in; None if nothing was recorded")
 
 @router.post("/", response_model=ChatResponse)
 async def process_chat(
@@ -30,8 +42,88 @@ async def process_chat(
             chat_request.query, 
             history=chat_request.history,
             use_llm=chat_request.use_llm,
-            skip_retrieval=chat_request.skip_retrieval
+            skip_retrieval=chat_request.skip_retrieval,
+            use_cache=chat_request.use_cache,
+            retrieval_mode=chat_request.retrieval_mode,
+            session_id=chat_request.session_id
         )
         return ChatResponse(**result)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except OllamaBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/stream")
+async def stream_chat(
+    chat_request: ChatRequest,
+    request: Request,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """Stream a chat response as newline-delimited JSON events (sources first, then tokens)"""
+    # Reject up front while we can still send a status code
+    if chat_request.use_llm and chat_service.ollama_client.is_saturated():
+        raise HTTPException(status_code=503, detail="The LLM is busy, please retry shortly")
+    if chat_request.session_id and not await chat_service.sessions.exists(chat_request.session_id):
+        raise HTTPException(status_code=404, detail=f"Session {chat_request.session_id} not found")
+
+    async def event_stream():
+        events = chat_service.stream_response(
+            chat_request.query,
+            history=chat_request.history,
+            use_llm=chat_request.use_llm,
+            skip_retrieval=chat_request.skip_retrieval,
+            use_cache=chat_request.use_cache,
+            retrieval_mode=chat_request.retrieval_mode,
+            session_id=chat_request.session_id
+        )
+        # Closing the event generator cancels the upstream generation
+        async with aclosing(events):
+            async for event in events:
+                if await request.is_disconnected():
+                    break
+                yield json.dumps(event) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@router.get("/status")
+async def get_generation_status(
+    ollama_client: OllamaClient = Depends(get_ollama_client)
+):
+    """Report the generation queue depth and wait times"""
+    return ollama_client.stats()
+
+@router.get("/retrieval-stats")
+async def get_retrieval_stats(
+    reranker: Optional[Reranker] = Depends(get_reranker)
+):
+    """Report retrieval and rerank times separately, and reranker cache usage"""
+    return {
+        **retrieval_stats(),
+        "reranker": {
+            "model": reranker.model_name,
+            **reranker.stats,
+            "cache": reranker.cache.stats()
+        } if reranker else None
+    }
+
+@router.get("/sessions/{session_id}")
+async def get_session(
+    session_id: str,
+    sessions: SessionManager = Depends(get_session_manager)
+):
+    """Return a session's messages and rolling summary"""
+    try:
+        return await sessions.messages(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    sessions: SessionManager = Depends(get_session_manager)
+):
+    if not await sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "success", "message": "Session deleted"}
@@ -1,43 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import os
+import json
+import uuid
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
 from typing import List, Optional
-from app.models import DocumentResponse, DriveIngestionRequest
+from app.config import settings
+from app.models import BulkIngestionResponse, DocumentResponse, DriveIngestionRequest, IngestionJobResponse
 from app.services.document_service import get_document_service, DocumentService
 from app.services.google_drive_service import get_drive_service, GoogleDriveService
-from fastapi.responses import JSONResponse
+from app.services.embeddings_service import get_embedding_service, EmbeddingService
+from app.services.ingestion_jobs import get_job_queue, IngestionJobQueue
+from app.services.lexical_index import get_lexical_index, BM25Index
+from app.services.text_extraction import ARCHIVE_EXTENSIONS, SUPPORTED_EXTENSIONS
+from fastapi.responses import JSONResponse, StreamingResponse
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 @router.get("/", response_model=List[DocumentResponse])
 async def list_documents(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("created_at", pattern="^(created_at|document_name|chunk_count)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
     document_service: DocumentService = Depends(get_document_service)
 ):
+    """List documents one page at a time; the total count is returned in the X-Total-Count header"""
     try:
-        documents = await document_service.list_documents()
+        documents = await document_service.list_documents(
+            limit=limit, offset=offset, sort_by=sort, descending=order == "desc"
+        )
+        response.headers["X-Total-Count"] = str(await document_service.count_documents())
         return documents
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload", response_model=DocumentResponse)
+@router.get("/ingestion-stats")
+async def get_ingestion_stats(
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    lexical_index: BM25Index = Depends(get_lexical_index)
+):
+    """Report embedding throughput, cache usage and lexical index size, to help tune ingestion"""
+    stats = embedding_service.stats
+    cache_stats = embedding_service.cache.stats() if embedding_service.cache else None
+    return {
+        "batch_size": embedding_service.batch_size,
+        "texts_embedded": stats["texts_embedded"],
+        "batches": stats["batches"],
+        "average_chunks_per_second": stats["texts_embedded"] / stats["seconds"] if stats["seconds"] else 0.0,
+        "last_chunks_per_second": stats["last_throughput"],
+        "cache": cache_stats,
+        "lexical_index": lexical_index.stats()
+    }
+
+@router.post("/upload", response_model=IngestionJobResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
-    document_service: DocumentService = Depends(get_document_service)
+    job_queue: IngestionJobQueue = Depends(get_job_queue)
 ):
-    """Upload a document (txt or pdf) and add it to the database"""
+    """Upload a document (txt or pdf) and queue it for ingestion; returns the ingestion job"""
     try:
-        # Save the uploaded file temporarily
-        file_path = f"/tmp/{file.filename}"
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        if extension not in (".txt", ".pdf"):
+            raise HTTPException(status_code=400, detail="Unsupported file type. Only .txt and .pdf are supported.")
+
+        # Stream the upload to a uniquely named spool file, one block at a time
+        os.makedirs(settings.upload_spool_directory, exist_ok=True)
+        file_path = os.path.join(settings.upload_spool_directory, f"{uuid.uuid4().hex}{extension}")
         with open(file_path, "wb") as f:
-            f.write(await file.read())
+            while block := await file.read(settings.upload_block_size):
+                f.write(block)
         
-        response = await document_service.process_uploaded_file(
+        return await job_queue.submit(
             file_path=file_path,
             document_name=file.filename,
             source="uploaded"
         )
-        
-        return response
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk", response_model=BulkIngestionResponse)
+async def bulk_upload_documents(
+    files: List[UploadFile] = File(...),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """
+    Upload many documents (txt, pdf, or zip/tar archives of them) and ingest them together.
+
+    Chunks from all files are embedded in shared batches; the response reports per-document
+    results and throughput.
+    """
+    for file in files:
+        if not (file.filename or "").lower().endswith(SUPPORTED_EXTENSIONS + ARCHIVE_EXTENSIONS):
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.filename}")
+
+    spooled = []
+    try:
+        os.makedirs(settings.upload_spool_directory, exist_ok=True)
+        for file in files:
+            file_path = os.path.join(settings.upload_spool_directory, f"{uuid.uuid4().hex}{os.path.splitext(file.filename)[1].lower()}")
+            spooled.append((file_path, file.filename))
+            with open(file_path, "wb") as f:
+                while block := await file.read(settings.upload_block_size):
+                    f.write(block)
+
+        return await document_service.process_files_bulk(spooled, source="uploaded")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for file_path, _ in spooled:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+@router.get("/jobs", response_model=List[IngestionJobResponse])
+async def list_ingestion_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    job_queue: IngestionJobQueue = Depends(get_job_queue)
+):
+    """List ingestion jobs, most recent first"""
+    return await job_queue.list(limit, offset)
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    job_queue: IngestionJobQueue = Depends(get_job_queue)
+):
+    """Report an ingestion job's status, progress and error"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.post("/drive", response_model=List[DocumentResponse])
 async def ingest_from_drive(
@@ -46,25 +143,33 @@ async def ingest_from_drive(
     document_service: DocumentService = Depends(get_document_service)
 ):
     try:
-        # Fetch files from Drive
-        files = await drive_service.fetch_files(request.folder_id)
-        
         results = []
-        for file in files:
-            # Download and process each file
-            content = await drive_service.download_file(file["id"])
-            if content:
-                document = await document_service.process_document(
-                    content=content,
-                    document_name=file["name"],
-                    source=f"google_drive:{file['id']}"
-                )
-                results.append(document)
+        async for event in drive_service.ingest_folder(request.folder_id, document_service):
+            if event["type"] == "file" and "document" in event:
+                results.append(event["document"])
         
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/drive/stream")
+async def stream_ingest_from_drive(
+    request: DriveIngestionRequest,
+    drive_service: GoogleDriveService = Depends(get_drive_service),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Ingest a Drive folder, streaming per-file progress and failures as newline-delimited JSON"""
+    async def event_stream():
+        events = drive_service.ingest_folder(request.folder_id, document_service)
+        async with aclosing(events):
+            try:
+                async for event in events:
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: str,
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.models import EmbeddingMigrationRequest, EmbeddingStatusResponse
+from app.services.reembedding import get_migrator, EmbeddingMigrator, MigrationError
+
+router = APIRouter(
+    prefix="/api/embeddings",
+    tags=["embeddings"],
+)
+
+@router.get("/migration", response_model=EmbeddingStatusResponse)
+async def get_migration(migrator: EmbeddingMigrator = Depends(get_migrator)):
+    """Report the active collection's embedding model and the progress of the latest re-embedding"""
+    return await migrator.status()
+
+@router.post("/migration", response_model=EmbeddingStatusResponse, status_code=202)
+async def start_migration(
+    request: EmbeddingMigrationRequest,
+    migrator: EmbeddingMigrator = Depends(get_migrator)
+):
+    """Re-embed every chunk with another model in the background, then swap the new collection in"""
+    try:
+        await migrator.start(request.embedding_model)
+    except MigrationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await migrator.status()
+
+@router.delete("/migration")
+async def cancel_migration(migrator: EmbeddingMigrator = Depends(get_migrator)):
+    """Abandon the running re-embedding; the active collection is left as it is"""
+    if not await migrator.cancel():
+        raise HTTPException(status_code=404, detail="No migration is running")
+    return {"status": "cancelled"}
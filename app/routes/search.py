@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+
+from app.config import settings
+from app.services.chat_service import get_chat_service, ChatService
+
+router = APIRouter(
+    prefix="/api/search",
+    tags=["search"],
+)
+
+class SearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
+    top_k: Optional[int] = Field(default=None, ge=1, description="Hits per query; defaults to the retrieval top k")
+
+class SearchHit(BaseModel):
+    id: str
+    text: str
+    score: float
+    distance: float
+    document_id: Optional[str] = None
+    document_name: Optional[str] = None
+    source: Optional[str] = None
+    chunk_id: Optional[int] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    metadata: Dict[str, Any] = {}
+
+class SearchResult(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+
+@router.post("/", response_model=SearchResponse)
+async def search(
+    search_request: SearchRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """Retrieve chunks for many queries at once: one embedding batch and one vector query"""
+    if len(search_request.queries) > settings.search_max_queries:
+        raise HTTPException(status_code=422, detail=f"At most {settings.search_max_queries} queries per request")
+    top_k = search_request.top_k or settings.retrieval_top_k
+    if top_k > settings.search_max_top_k:
+        raise HTTPException(status_code=422, detail=f"top_k must be at most {settings.search_max_top_k}")
+
+    try:
+        results = await chat_service.search(search_request.queries, top_k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return SearchResponse(results=[
+        SearchResult(
+            query=query,
+            hits=[
+                SearchHit(
+                    id=hit["id"],
+                    text=hit["text"] or "",
+                    score=hit["score"],
+                    distance=hit["distance"],
+                    document_id=hit["metadata"].get("document_id"),
+                    document_name=hit["metadata"].get("document_name"),
+                    source=hit["metadata"].get("source"),
+                    chunk_id=hit["metadata"].get("chunk_id"),
+                    page_start=hit["metadata"].get("page_start"),
+                    page_end=hit["metadata"].get("page_end"),
+                    metadata=hit["metadata"]
+                )
+                for hit in hits
+            ]
+        )
+        for query, hits in zip(search_request.queries, results)
+    ])
@@ -1,9 +1,10 @@
 # app/routes/settings.py
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from app.config import settings as app_settings
-import os
+from app.services.shared_state import get_shared_state, apply_settings
 
 router = APIRouter(
     prefix="/api/settings",
@@ -37,30 +38,20 @@ async def get_settings():
 
 @router.post("/", response_model=SettingsResponse)
 async def update_settings(settings_update: SettingsUpdate):
-    """Update settings"""
+    """Update settings, for every worker and across restarts"""
     try:
-        if settings_update.system_prompt is not None:
-            # In a real application, this should modify environment variables or save to a database
-            # For simplicity, we're just updating the settings object in memory
-            app_settings.system_prompt = settings_update.system_prompt
-            os.environ["SYSTEM_PROMPT"] = settings_update.system_prompt
-        
-        if settings_update.llm_model is not None:
-            app_settings.ollama_model = settings_update.llm_model
-            os.environ["OLLAMA_MODEL"] = settings_update.llm_model
+        changes = {
+            "system_prompt": settings_update.system_prompt,
+            "ollama_model": settings_update.llm_model,
+            "temperature": settings_update.temperature,
+            "top_p": settings_update.top_p,
+            "max_tokens": settings_update.max_tokens
+        }
+        changes = {key: value for key, value in changes.items() if value is not None}
 
-         # New parameter updates
-        if settings_update.temperature is not None:
-            app_settings.temperature = settings_update.temperature
-            os.environ["TEMPERATURE"] = str(settings_update.temperature)
-        
-        if settings_update.top_p is not None:
-            app_settings.top_p = settings_update.top_p
-            os.environ["TOP_P"] = str(settings_update.top_p)
-        
-        if settings_update.max_tokens is not None:
-            app_settings.max_tokens = settings_update.max_tokens
-            os.environ["MAX_TOKENS"] = str(settings_update.max_tokens)
+        # Stored in the shared state, which the other workers apply before their next request
+        await asyncio.to_thread((await get_shared_state()).update_settings, changes)
+        apply_settings(changes)
         
         return {
             "system_prompt": app_settings.system_prompt or "",  # Convert None to empty string
@@ -0,0 +1,112 @@
+import math
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+from app.config import settings
+
+class SemanticAnswerCache:
+    """
+    Cache of LLM answers for near-identical questions over the same context.
+
+    Entries are grouped by an exact key (retrieved chunk IDs, model, generation settings, history).
+    Within a group, a cached answer is reused when the cosine similarity between the new query
+    embedding and the cached one is at least `similarity_threshold`.
+    Entries are evicted least recently used first, and can be invalidated per document.
+    """
+
+    def __init__(self, max_entries: int, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # entry id -> (exact key, normalized embedding, answer, document ids)
+        self._groups: Dict[Hashable, Set[int]] = {}
+        self._by_document: Dict[str, Set[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def lookup(self, key: Hashable, embedding: List[float]) -> Optional[str]:
+        """Return a cached answer for this key and a similar enough query, if any"""
+        query = self._normalize(embedding)
+
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in self._groups.get(key, ()):
+                cached_embedding = self._entries[entry_id][1]
+                score = sum(a * b for a, b in zip(query, cached_embedding))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def store(self, key: Hashable, embedding: List[float], answer: str, document_ids: Iterable[str]):
+        # An empty answer would be served to every similar question
+        if not answer.strip():
+            return
+        document_ids = set(document_ids)
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (key, self._normalize(embedding), answer, document_ids)
+            self._groups.setdefault(key, set()).add(entry_id)
+            for document_id in document_ids:
+                self._by_document.setdefault(document_id, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+
+    def invalidate_documents(self, document_ids: Iterable[str]):
+        """Drop every answer that used a chunk from one of these documents"""
+        with self._lock:
+            for document_id in document_ids:
+                for entry_id in list(self._by_document.get(document_id, ())):
+                    self._remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._by_document.clear()
+
+    def _remove(self, entry_id: int):
+        key, _, _, document_ids = self._entries.pop(entry_id)
+
+        group = self._groups.get(key)
+        if group is not None:
+            group.discard(entry_id)
+            if not group:
+                del self._groups[key]
+
+        for document_id in document_ids:
+            entries = self._by_document.get(document_id)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._by_document[document_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+answer_cache = SemanticAnswerCache(
+    max_entries=settings.answer_cache_max_entries,
+    similarity_threshold=settings.answer_cache_similarity
+)
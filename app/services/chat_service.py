@@ -1,51 +1,128 @@
+import re
+import json
+import time
+import asyncio
 import logging
-import httpx
-from typing import List, Dict, Any, Optional
-from chromadb.errors import InvalidCollectionException
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.config import settings
-from app.database import get_client
+from app.database import get_collection_version
 from app.services.embeddings_service import get_embedding_service
+from app.services.cache import LRUCache, SingleFlight
+from app.services.ollama_client import get_ollama_client, OllamaClient, OllamaBusyError
+from app.services.answer_cache import answer_cache
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion, BM25Index
+from app.services.reranker import get_reranker, Reranker
+from app.services.context_builder import build_context, count_tokens
+from app.services.metrics import (
+    observe_stage, timed, count_cache_lookups, PROMPT_TOKENS, TIME_TO_FIRST_TOKEN_SECONDS,
+    GENERATION_TOKENS_PER_SECOND
+)
+from app.services.sessions import get_session_manager, SessionManager
+from app.services.vector_store import get_vector_store, VectorStore
 
 logger = logging.getLogger(__name__)
 
+# Shared across requests: query embeddings, retrieval results, and in-flight retrievals
+_query_embedding_cache = LRUCache(maxsize=settings.query_cache_size, ttl=settings.query_cache_ttl)
+_retrieval_cache = LRUCache(maxsize=settings.query_cache_size, ttl=settings.query_cache_ttl)
+_retrieval_flight = SingleFlight()
+
+# Time spent retrieving and reranking, reported separately
+_retrieval_stats = {
+    "queries": 0,
+    "retrieval_seconds": 0.0,
+    "rerank_seconds": 0.0
+}
+
+def clean_query(query: str) -> str:
+    """Collapse whitespace in a query; this is the text that is embedded and searched"""
+    return re.sub(r"\s+", " ", query).strip()
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups, so variants differing in case or spacing share an entry"""
+    return clean_query(query).lower()
+
+class GenerationError(Exception):
+    """Raised when the LLM fails to produce an answer; the message is shown to the user"""
+
 class ChatService:
-    def __init__(self, chroma_client, embedding_service):
-        self.client = chroma_client
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedding_service,
+        ollama_client: OllamaClient,
+        lexical_index: BM25Index,
+        sessions: SessionManager,
+        reranker: Optional[Reranker] = None
+    ):
+        self.vector_store = vector_store
         self.embedding_service = embedding_service
-        self.collection_name = settings.collection_name
-        
-        # Get or create the collection
-        try:
-            self.collection = self.client.get_collection(name=self.collection_name)
-        except InvalidCollectionException:
-            self.collection = self.client.create_collection(name=self.collection_name)
+        self.ollama_client = ollama_client
+        self.lexical_index = lexical_index
+        self.sessions = sessions
+        self.reranker = reranker
     
     async def get_response(self, 
                         query: str, 
                         history: List[Dict[str, Any]] = None, 
                         use_llm: bool = True, 
-                        skip_retrieval: bool = False) -> Dict[str, Any]:
+                        skip_retrieval: bool = False,
+                        use_cache: bool = True,
+                        retrieval_mode: Optional[str] = None,
+                        session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate a response to a user query based on document retrieval and/or LLM generation.
         
         Args:
             query: The user's query string
-            history: Optional chat history for context
+            history: Chat history used to seed a new session, ignored when session_id is given
             use_llm: Whether to use the LLM for response generation
             skip_retrieval: Whether to skip document retrieval step
+            use_cache: Whether a cached answer to a similar question may be returned
+            retrieval_mode: "vector" or "hybrid"; defaults to the configured retrieval mode
+            session_id: Server-side session holding the history; if None, a new one is created
+                once an LLM answer is recorded
             
         Returns:
-            Dictionary containing the answer and source information
+            Dictionary containing the answer, source information and session ID (None if no
+            session was given and nothing was recorded)
         """
-        if history is None:
-            history = []
-            
+        history = await self._session_history(session_id, history)
+        result = await self._answer(query, history, use_llm, skip_retrieval, use_cache, retrieval_mode)
+
+        # Only LLM answers become part of the conversation
+        if result.pop("generated", False):
+            session_id = await self._record_turn(session_id, history, query, result["answer"])
+        return {**result, "session_id": session_id}
+
+    async def _session_history(self, session_id: Optional[str], history: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """The history for the prompt: the session's, or the one sent by the client without a session"""
+        if session_id is None:
+            return list(history or [])
+        return await self.sessions.history(session_id)
+
+    async def _record_turn(self, session_id: Optional[str], history: List[Dict[str, Any]], query: str, answer: str) -> str:
+        """Record a turn, starting a session seeded with `history` if there is none yet; returns the session ID"""
+        if session_id is None:
+            session_id = await self.sessions.start_session(history)
+        await self.sessions.record_turn(session_id, query, answer)
+        return session_id
+
+    async def _answer(self,
+                      query: str,
+                      history: List[Dict[str, Any]],
+                      use_llm: bool,
+                      skip_retrieval: bool,
+                      use_cache: bool,
+                      retrieval_mode: Optional[str]) -> Dict[str, Any]:
+        """Answer a query given its history; "generated" is set when the LLM produced the answer"""
         sources = []
         context = ""
+        passages = []
         
         # Perform retrieval if not skipping
         if not skip_retrieval:
-            sources, context = await self._retrieve_relevant_documents(query)
+            sources, context, passages = await self._retrieve_relevant_documents(query, retrieval_mode)
             
             # If no context found and retrieval was attempted
             if not context:
@@ -58,50 +135,313 @@ class ChatService:
         
         # If not using LLM, just return the retrieved documents
         if not use_llm:
-            return self._format_document_answer(sources, context)
+            return self._format_document_answer(sources, passages)
             
+        # Reuse the answer to a similar question over the same chunks, if we have one
+        use_cache = use_cache and settings.answer_cache_enabled
+        if use_cache:
+            embedding_service = self.embedding_service
+            cache_key = self._answer_cache_key(sources, history, embedding_service.model_name)
+            query_embedding = await self._get_query_embedding(clean_query(query), embedding_service)
+            cached_answer = answer_cache.lookup(cache_key, query_embedding)
+            count_cache_lookups("answer", int(cached_answer is not None), int(cached_answer is None))
+            if cached_answer is not None:
+                return {
+                    "answer": cached_answer,
+                    "sources": sources,
+                    "generated": True
+                }
+
         # If using LLM, get response from model
-        answer = await self._get_llm_response(query, context, history)
-        
+        try:
+            answer = await self._get_llm_response(query, context, history)
+        except GenerationError as e:
+            return {
+                "answer": str(e),
+                "sources": sources
+            }
+
+        if use_cache:
+            answer_cache.store(cache_key, query_embedding, answer, {source["document_id"] for source in sources})
+
         return {
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "generated": True
         }
-    
-    async def _retrieve_relevant_documents(self, query: str) -> tuple:
-        """Retrieve relevant documents from the vector store"""
-        # Get query embedding
-        query_embedding = await self.embedding_service.get_embeddings(query)
-        
-        # Query the collection for similar chunks
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=5,  # Get top 5 most relevant chunks
-            include=["documents", "metadatas", "distances"]
+
+    def _answer_cache_key(self, sources: List[Dict[str, Any]], history: List[Dict[str, Any]], embedding_model: str) -> tuple:
+        """Everything besides the query that determines the LLM answer, and the model of the query embedding"""
+        return (
+            tuple(source["id"] for source in sources),
+            embedding_model,
+            settings.ollama_model,
+            settings.system_prompt,
+            settings.temperature,
+            settings.top_p,
+            settings.max_tokens,
+            tuple((msg.get("role"), msg.get("content")) for msg in history)
         )
-        
-        # Process the results to extract context and sources
+    
+    async def _retrieve_relevant_documents(
+        self, query: str, mode: Optional[str] = None, timings: Optional[Dict[str, float]] = None
+    ) -> tuple:
+        """
+        Retrieve relevant documents from the vector store, optionally fused with lexical matches
+        and reranked. Retrieval and rerank times in ms are recorded in `timings`, if given.
+
+        Returns the sources, the context for the prompt, and the text of each passage (sources
+        refer to them by their 1-based "passage" number).
+        """
+        start = time.perf_counter()
+        timings = timings if timings is not None else {}
+        timings["rerank_ms"] = 0.0
+        query = clean_query(query)
+        mode = mode or settings.retrieval_mode
+
+        # Results are keyed by collection version, so any ingest or delete invalidates them
+        key = (normalize_query(query), mode, self.reranker is not None, get_collection_version())
+        cached = _retrieval_cache.get(key)
+        count_cache_lookups("retrieval", int(cached is not None), int(cached is None))
+        if cached is None:
+            # Concurrent identical queries share a single embedding and vector query
+            cached = await _retrieval_flight.do(key, lambda: self._query_collection(query, mode, key, timings))
+
+        timings["retrieval_ms"] = (time.perf_counter() - start) * 1000 - timings["rerank_ms"]
+        _retrieval_stats["queries"] += 1
+        _retrieval_stats["retrieval_seconds"] += timings["retrieval_ms"] / 1000
+        _retrieval_stats["rerank_seconds"] += timings["rerank_ms"] / 1000
+
+        sources, context, passages = cached
+        return [dict(source) for source in sources], context, passages
+
+    async def _get_query_embedding(self, query: str, embedding_service=None) -> List[float]:
+        """Embed a cleaned query, using the in-memory query embedding cache keyed by its normalized form"""
+        # Keyed by model, so an embedding computed across a model swap never matches the new collection
+        embedding_service = embedding_service or self.embedding_service
+        key = (embedding_service.model_name, normalize_query(query))
+        query_embedding = _query_embedding_cache.get(key)
+        count_cache_lookups("query_embedding", int(query_embedding is not None), int(query_embedding is None))
+        if query_embedding is None:
+            query_embedding = await embedding_service.get_embeddings(query, query=True)
+            _query_embedding_cache.set(key, query_embedding)
+        return query_embedding
+
+    async def search(self, queries: List[str], top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve the top_k chunks of each query, without building a context or calling the LLM.
+
+        Queries missing from the query embedding cache are embedded in one batch, and all of them
+        are looked up with a single multi-vector query. Vector retrieval only: no lexical fusion
+        or reranking. Returns one list of hits (id, text, metadata, score, distance) per query.
+        """
+        normalized = [normalize_query(query) for query in queries]
+        # Each normalized query is embedded from the first text that normalizes to it
+        unique = {}
+        for query, key in zip(queries, normalized):
+            unique.setdefault(key, clean_query(query))
+
+        embedding_service = self.embedding_service
+        model = embedding_service.model_name
+        embeddings = {key: _query_embedding_cache.get((model, key)) for key in unique}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        count_cache_lookups("query_embedding", len(unique) - len(missing), len(missing))
+        if missing:
+            batch = await embedding_service.get_embeddings_batch([unique[key] for key in missing], query=True)
+            for key, embedding in zip(missing, batch):
+                _query_embedding_cache.set((model, key), embedding)
+                embeddings[key] = embedding
+
+        # Up to search_max_queries x search_max_top_k hits: keep the query off the event loop
+        vector_store = self.vector_store
+        with timed("vector_query"):
+            results = await asyncio.get_running_loop().run_in_executor(None, lambda: vector_store.query(
+                query_embeddings=[embeddings[key] for key in unique],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"]
+            ))
+
+        hits = {
+            query: [
+                {
+                    "id": chunk_key,
+                    "text": text,
+                    "metadata": metadata,
+                    "score": 1 - distance,  # the relevance used by chat retrieval
+                    "distance": distance
+                }
+                for chunk_key, text, metadata, distance in zip(ids, documents, metadatas, distances)
+            ]
+            for query, ids, documents, metadatas, distances in zip(
+                unique, results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        }
+        return [hits[query] for query in normalized]
+
+    async def _query_collection(
+        self, query: str, mode: str, cache_key: tuple, timings: Dict[str, float]
+    ) -> tuple:
+        """Embed the query, run the search and assemble the context, caching the result under cache_key"""
+        query_embedding = await self._get_query_embedding(query)
+
+        # With a reranker, retrieve a wider candidate set and let it pick the best few
+        top_k = settings.rerank_candidates if self.reranker else settings.retrieval_top_k
+
+        if mode == "hybrid":
+            hits = await self._hybrid_search(query, query_embedding, top_k)
+        else:
+            # Query the collection for similar chunks, off the event loop as in search()
+            vector_store = self.vector_store
+            with timed("vector_query"):
+                results = await asyncio.get_running_loop().run_in_executor(None, lambda: vector_store.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    include=["documents", "metadatas", "distances", "embeddings"]
+                ))
+            hits = []
+            if results and results["documents"] and len(results["documents"][0]) > 0:
+                hits = [
+                    {
+                        "id": chunk_key,
+                        "text": doc,
+                        "metadata": metadata,
+                        "relevance": 1 - distance,  # Convert distance to relevance score
+                        "embedding": embedding
+                    }
+                    for chunk_key, doc, metadata, distance, embedding in zip(
+                        results["ids"][0], results["documents"][0], results["metadatas"][0],
+                        results["distances"][0], results["embeddings"][0]
+                    )
+                ]
+        for hit in hits:
+            hit["score"] = hit["relevance"]
+
+        if self.reranker and hits:
+            start = time.perf_counter()
+            scores = await self.reranker.score(query, [(hit["id"], hit["text"]) for hit in hits])
+            for hit, score in zip(hits, scores):
+                hit["score"] = hit["rerank_score"] = score
+            hits = sorted(hits, key=lambda hit: hit["score"], reverse=True)[:settings.rerank_keep]
+            timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+            observe_stage("rerank", timings["rerank_ms"] / 1000)
+            logger.info(f"Reranked {len(scores)} candidates in {timings['rerank_ms']:.1f} ms, kept {len(hits)}")
+
+        # Merge overlapping chunks, drop near-duplicates and fit the token budget
+        with timed("context"):
+            passages, tokens_before, tokens_after = build_context(
+                hits,
+                token_budget=settings.context_token_budget,
+                max_overlap=settings.chunk_overlap,
+                mmr_lambda=settings.mmr_lambda,
+                duplicate_similarity=settings.context_duplicate_similarity
+            )
+        if hits:
+            logger.info(
+                f"Context: {len(hits)} chunks, ~{tokens_before} tokens -> {len(passages)} passages, "
+                f"~{tokens_after} tokens (budget {settings.context_token_budget})"
+            )
+
+        # Process the passages to extract context and sources
         context = ""
         sources = []
-        
-        if results and results["documents"] and len(results["documents"][0]) > 0:
-            for i, (doc, metadata, distance) in enumerate(zip(
-                results["documents"][0], results["metadatas"][0], results["distances"][0]
-            )):
-                # Add document to context
-                context += f"\nChunk {i+1}:\n{doc}\n"
-                
-                # Add source info
+        for i, passage in enumerate(passages):
+            # Add passage to context
+            context += f"\nChunk {i+1}:\n{passage['text']}\n"
+
+            # Add source info for every chunk in the passage
+            for hit in passage["hits"]:
+                metadata = hit["metadata"]
                 sources.append({
+                    "id": hit["id"],
+                    "document_id": metadata.get("document_id"),
                     "document_name": metadata.get("document_name", "Unknown"),
                     "source": metadata.get("source", "Unknown"),
                     "chunk_id": metadata.get("chunk_id", i),
-                    "relevance": 1 - distance  # Convert distance to relevance score
+                    "page_start": metadata.get("page_start"),
+                    "page_end": metadata.get("page_end"),
+                    "relevance": hit["relevance"],
+                    "passage": i + 1
                 })
-                
-        return sources, context
-    
-    def _format_document_answer(self, sources, context) -> Dict[str, Any]:
+                if "rerank_score" in hit:
+                    sources[-1]["rerank_score"] = hit["rerank_score"]
+
+        result = (sources, context, [passage["text"] for passage in passages])
+        _retrieval_cache.set(cache_key, result)
+        return result
+
+    async def _hybrid_search(self, query: str, query_embedding: List[float], top_k: int) -> list:
+        """
+        Fuse BM25 and vector rankings with reciprocal rank fusion.
+
+        Returns hits (dicts with id, text, metadata, relevance and embedding), where relevance is the
+        fused score scaled so a chunk ranked first by both retrievers scores 1.
+        """
+        candidates = max(settings.hybrid_candidates, top_k)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        def search_lexical():
+            # Timed on its own, as it overlaps with the vector query
+            started = time.perf_counter()
+            return self.lexical_index.search(query, candidates), time.perf_counter() - started
+
+        # Both run on the executor, concurrently
+        vector_store = self.vector_store
+        lexical = loop.run_in_executor(None, search_lexical)
+        with timed("vector_query"):
+            results = await loop.run_in_executor(None, lambda: vector_store.query(
+                query_embeddings=[query_embedding],
+                n_results=candidates,
+                include=["documents", "metadatas", "embeddings"]
+            ))
+        vector_ranking = results["ids"][0] if results and results["ids"] else []
+        lexical_results, lexical_seconds = await lexical
+        observe_stage("lexical_query", lexical_seconds)
+        lexical_ranking = [chunk_key for chunk_key, _ in lexical_results]
+
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=settings.rrf_k)[:top_k]
+
+        # Chunks found only by BM25 still need their text, metadata and embedding
+        chunks = {}
+        if vector_ranking:
+            chunks = {
+                chunk_key: (doc, metadata, embedding)
+                for chunk_key, doc, metadata, embedding in zip(
+                    vector_ranking, results["documents"][0], results["metadatas"][0], results["embeddings"][0]
+                )
+            }
+        missing = [chunk_key for chunk_key, _ in fused if chunk_key not in chunks]
+        if missing:
+            with timed("vector_query"):
+                found = await loop.run_in_executor(
+                    None, lambda: vector_store.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+                )
+            chunks.update({
+                chunk_key: (doc, metadata, embedding)
+                for chunk_key, doc, metadata, embedding in zip(
+                    found["ids"], found["documents"], found["metadatas"], found["embeddings"]
+                )
+            })
+
+        logger.info(
+            f"Hybrid retrieval in {(time.perf_counter() - start) * 1000:.1f} ms: "
+            f"{len(vector_ranking)} vector and {len(lexical_ranking)} lexical candidates"
+        )
+
+        best = 2.0 / (settings.rrf_k + 1)
+        return [
+            {
+                "id": chunk_key,
+                "text": chunks[chunk_key][0],
+                "metadata": chunks[chunk_key][1],
+                "relevance": score / best,
+                "embedding": chunks[chunk_key][2]
+            }
+            for chunk_key, score in fused
+            if chunk_key in chunks
+        ]
+
+    def _format_document_answer(self, sources: List[Dict[str, Any]], passages: List[str]) -> Dict[str, Any]:
         """Format retrieved documents as a readable answer"""
         if not sources:
             return {
@@ -110,11 +450,15 @@ class ChatService:
             }
             
         doc_answer = "Here are the most relevant documents for your query:\n\n"
-        for i, source in enumerate(sources):
-            doc_answer += f"Document {i+1}: {source['document_name']}\n"
+        shown = set()
+        for source in sources:
+            # Chunks merged into one passage are shown once
+            if source["passage"] in shown:
+                continue
+            shown.add(source["passage"])
+            doc_answer += f"Document {len(shown)}: {source['document_name']}\n"
             
-            # Extract corresponding content
-            chunk_content = context.split(f"Chunk {i+1}:\n")[1].split("\n\nChunk")[0]
+            chunk_content = passages[source["passage"] - 1]
             
             # Truncate if too long for display
             if len(chunk_content) > 500:
@@ -127,8 +471,14 @@ class ChatService:
             "sources": sources
         }
     
-    async def _get_llm_response(self, query: str, context: str, history: List[Dict[str, Any]]) -> str:
-        """Get response from the LLM"""
+    def _build_prompt(self, query: str, context: str, history: List[Dict[str, Any]]) -> str:
+        """Build the LLM prompt from the system prompt, history, context and question"""
+        with timed("prompt_build"):
+            prompt = self._render_prompt(query, context, history)
+        PROMPT_TOKENS.observe(count_tokens(prompt))
+        return prompt
+
+    def _render_prompt(self, query: str, context: str, history: List[Dict[str, Any]]) -> str:
         system_prompt = settings.system_prompt or """
         You are a helpful assistant that answers questions based on the provided documents.
         If the documents contain the information, use it to provide accurate answers.
@@ -144,6 +494,9 @@ class ChatService:
             for msg in history:
                 role = msg.get("role", "unknown")
                 content = msg.get("content", "")
+                if role == "summary":
+                    history_text += f"Summary of the earlier conversation: {content}\n"
+                    continue
                 history_text += f"{role.capitalize()}: {content}\n"
             history_text += "\n"
         
@@ -173,33 +526,188 @@ class ChatService:
             
             Answer:
             """
-        
+
+        return prompt
+
+    def _observe_generation(self, result: Dict[str, Any]):
+        """Record the generation speed from the statistics in Ollama's final response"""
+        eval_count = result.get("eval_count")
+        eval_duration = result.get("eval_duration")  # in nanoseconds
+        if eval_count and eval_duration:
+            GENERATION_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9))
+
+    def _generation_payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        """Request body for Ollama's /api/generate"""
+        return {
+            "model": settings.ollama_model,
+            "prompt": prompt,
+            "stream": stream,
+            "temperature": settings.temperature,
+            "top_p": settings.top_p,
+            "num_predict": settings.max_tokens,  # Ollama uses num_predict for max_tokens
+            "keep_alive": settings.ollama_keep_alive
+        }
+
+    async def _get_llm_response(self, query: str, context: str, history: List[Dict[str, Any]]) -> str:
+        """Get response from the LLM, raising GenerationError if it fails"""
+        prompt = self._build_prompt(query, context, history)
+
         # Send to Ollama for response generation
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.ollama_base_url}/api/generate",
-                    json={
-                        "model": settings.ollama_model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "temperature": settings.temperature,
-                        "top_p": settings.top_p,
-                        "num_predict": settings.max_tokens  # Ollama uses num_predict for max_tokens
-                    },
-                    timeout=240.0  # Increased timeout for LLM processing
-                )
-                
-                if response.status_code == 200:
-                    return response.json().get("response", "")
-                else:
-                    logger.error(f"Error from Ollama API: {response.status_code}, {response.text}")
-                    return "Sorry, there was an error generating a response."
+            with timed("llm_generate"):
+                response = await self.ollama_client.generate(self._generation_payload(prompt, stream=False))
+
+            if response.status_code == 200:
+                result = response.json()
+                self._observe_generation(result)
+                return result.get("response", "")
+            else:
+                logger.error(f"Error from Ollama API: {response.status_code}, {response.text}")
+                raise GenerationError("Sorry, there was an error generating a response.")
+        except (OllamaBusyError, GenerationError):
+            raise
         except Exception as e:
             logger.error(f"Error calling Ollama API: {str(e)}")
-            return f"Error: {str(e)}"
+            raise GenerationError(f"Error: {str(e)}")
+
+    async def stream_response(self,
+                              query: str,
+                              history: List[Dict[str, Any]] = None,
+                              use_llm: bool = True,
+                              skip_retrieval: bool = False,
+                              use_cache: bool = True,
+                              retrieval_mode: Optional[str] = None,
+                              session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a response as events: the retrieved sources first, then LLM tokens as Ollama produces them.
+
+        Yields dictionaries with a "type" of "sources", "token", "error" or "done". The sources
+        event also carries the session ID given, and the retrieval and rerank times in ms; the
+        done event carries the session ID the turn was recorded in, which is new if none was given.
+        Closing the generator (e.g. when the client disconnects) closes the upstream
+        connection, which makes Ollama stop generating.
+        """
+        start = time.perf_counter()
+        history = await self._session_history(session_id, history)
+
+        # Without the LLM there is nothing to stream, send the whole answer at once
+        if not use_llm:
+            result = await self._answer(
+                query, history, use_llm=False, skip_retrieval=skip_retrieval, use_cache=use_cache,
+                retrieval_mode=retrieval_mode
+            )
+            yield {"type": "sources", "sources": result["sources"], "session_id": session_id}
+            yield {"type": "token", "content": result["answer"]}
+            yield {"type": "done"}
+            return
+
+        sources = []
+        context = ""
+        timings = {}
+        if not skip_retrieval:
+            sources, context, _ = await self._retrieve_relevant_documents(query, retrieval_mode, timings)
+        yield {"type": "sources", "sources": sources, "session_id": session_id, **timings}
+
+        use_cache = use_cache and settings.answer_cache_enabled
+        if use_cache:
+            embedding_service = self.embedding_service
+            cache_key = self._answer_cache_key(sources, history, embedding_service.model_name)
+            query_embedding = await self._get_query_embedding(clean_query(query), embedding_service)
+            cached_answer = answer_cache.lookup(cache_key, query_embedding)
+            count_cache_lookups("answer", int(cached_answer is not None), int(cached_answer is None))
+            if cached_answer is not None:
+                session_id = await self._record_turn(session_id, history, query, cached_answer)
+                yield {"type": "token", "content": cached_answer}
+                yield {"type": "done", "session_id": session_id, "time_to_first_token_ms": (time.perf_counter() - start) * 1000}
+                return
+
+        prompt = self._build_prompt(query, context, history)
+        generation_start = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        tokens = []
+        completed = False
+
+        try:
+            async with self.ollama_client.stream_generate(self._generation_payload(prompt, stream=True)) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    logger.error(f"Error from Ollama API: {response.status_code}, {response.text}")
+                    yield {"type": "error", "detail": "Sorry, there was an error generating a response."}
+                    return
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token_at - start)
+                            logger.info(f"Time to first token: {(first_token_at - start) * 1000:.0f} ms")
+                        token_count += 1
+                        tokens.append(token)
+                        yield {"type": "token", "content": token}
+
+                    if chunk.get("done"):
+                        self._observe_generation(chunk)
+                        completed = True
+                        break
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info(f"Client disconnected, cancelled generation after {token_count} tokens")
+            raise
+        except OllamaBusyError as e:
+            yield {"type": "error", "detail": str(e)}
+            return
+        except Exception as e:
+            logger.error(f"Error streaming from Ollama API: {str(e)}")
+            yield {"type": "error", "detail": f"Error: {str(e)}"}
+            return
+
+        observe_stage("llm_generate", time.perf_counter() - generation_start)
+        elapsed = time.perf_counter() - start
+        ttft_ms = (first_token_at - start) * 1000 if first_token_at is not None else None
+        logger.info(f"Streamed {token_count} tokens in {elapsed:.2f}s")
+
+        answer = "".join(tokens)
+        session_id = await self._record_turn(session_id, history, query, answer)
+        # Only a complete answer is reused; a stream that ended early holds part of one
+        if not completed:
+            logger.warning(f"Ollama stream ended after {token_count} tokens without completing, not caching the answer")
+        elif use_cache:
+            answer_cache.store(cache_key, query_embedding, answer, {source["document_id"] for source in sources})
+        yield {"type": "done", "session_id": session_id, "time_to_first_token_ms": ttft_ms}
+
+def retrieval_stats() -> Dict[str, Any]:
+    """Average retrieval and rerank times per query"""
+    queries = _retrieval_stats["queries"]
+    return {
+        "queries": queries,
+        "average_retrieval_ms": _retrieval_stats["retrieval_seconds"] / queries * 1000 if queries else 0.0,
+        "average_rerank_ms": _retrieval_stats["rerank_seconds"] / queries * 1000 if queries else 0.0,
+        "retrieval_cache": _retrieval_cache.stats()
+    }
+
+def clear_query_caches():
+    """Drop cached query embeddings and retrievals, e.g. when the embedding model changes"""
+    _query_embedding_cache.clear()
+    _retrieval_cache.clear()
+
+# Global chat service, created once at startup
+_chat_service = None
 
 async def get_chat_service():
-    client = await get_client()
+    global _chat_service
+    if _chat_service is not None:
+        return _chat_service
+
+    vector_store = await get_vector_store()
     embedding_service = await get_embedding_service()
-    return ChatService(client, embedding_service)
\ No newline at end of file
+    ollama_client = await get_ollama_client()
+    lexical_index = await get_lexical_index()
+    sessions = await get_session_manager()
+    reranker = await get_reranker()
+    _chat_service = ChatService(vector_store, embedding_service, ollama_client, lexical_index, sessions, reranker)
+    return _chat_service
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import re
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Collection states
+ACTIVE = "active"
+BUILDING = "building"
+RETIRED = "retired"
+
+# Migration states
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Global registry
+_registry = None
+
+def versioned_collection_name(base: str, embedding_model: str) -> str:
+    """A new collection name for vectors of `embedding_model`, valid for Chroma (3-63 characters of [a-zA-Z0-9._-])"""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", embedding_model.split("/")[-1]).strip("-").lower()[:24] or "model"
+    return f"{base[:28]}-{slug}-{uuid.uuid4().hex[:8]}"
+
+class CollectionRegistry:
+    """
+    Records which embedding model produced the vectors of each collection, which collection is
+    active, and the state of re-embedding migrations between them.
+
+    Kept in SQLite next to the vector store, so the active collection and migration progress
+    survive a restart or a crash.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._data_version = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collections (
+                    name TEXT PRIMARY KEY,
+                    embedding_model TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS migrations (
+                    migration_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    source_collection TEXT NOT NULL,
+                    target_collection TEXT NOT NULL,
+                    source_model TEXT NOT NULL,
+                    target_model TEXT NOT NULL,
+                    phase TEXT NOT NULL DEFAULT 'copy',
+                    scanned INTEGER NOT NULL DEFAULT 0,
+                    chunks_done INTEGER NOT NULL DEFAULT 0,
+                    chunks_total INTEGER,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    completed_at TEXT,
+                    worker TEXT
+                )
+                """
+            )
+            # Documents written while a migration runs, replayed into the shadow collection before the swap
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, document_id TEXT NOT NULL)"
+            )
+            # Registries created before migrations were assigned to a worker
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(migrations)")}
+            if "worker" not in columns:
+                self._conn.execute("ALTER TABLE migrations ADD COLUMN worker TEXT")
+
+    def changed(self) -> bool:
+        """Whether another process has written to the registry since the last call"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def active(self) -> Optional[Dict[str, Any]]:
+        """The collection queries and ingestion use, or None before the first start"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM collections WHERE status = ?", (ACTIVE,)).fetchone()
+        return dict(row) if row else None
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM collections WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM collections ORDER BY created_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def register(self, name: str, embedding_model: str, status: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO collections (name, embedding_model, status, created_at) VALUES (?, ?, ?, ?)",
+                (name, embedding_model, status, datetime.now().isoformat())
+            )
+
+    def remove(self, name: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+
+    def create_migration(
+        self, source: Dict[str, Any], target_collection: str, target_model: str, worker: str
+    ) -> Optional[Dict[str, Any]]:
+        """Record a migration run by `worker` and its shadow collection; None if another migration is running"""
+        migration_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            # Taking the write lock first, so two workers cannot both start one
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._conn.execute("SELECT 1 FROM migrations WHERE status = ?", (RUNNING,)).fetchone():
+                return None
+            self._conn.execute("DELETE FROM changes")
+            self._conn.execute(
+                "INSERT INTO collections (name, embedding_model, status, created_at) VALUES (?, ?, ?, ?)",
+                (target_collection, target_model, BUILDING, now)
+            )
+            self._conn.execute(
+                """
+                INSERT INTO migrations (
+                    migration_id, status, source_collection, target_collection, source_model, target_model,
+                    created_at, updated_at, worker
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (migration_id, RUNNING, source["name"], target_collection, source["embedding_model"], target_model, now, now, worker)
+            )
+        return self.get_migration(migration_id)
+
+    def claim_migration(self, migration_id: str, previous_worker: Optional[str], worker: str) -> bool:
+        """Take over a running migration from a worker that is gone, unless another worker did first"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE migrations SET worker = ?, updated_at = ? WHERE migration_id = ? AND status = ? AND worker IS ?",
+                (worker, datetime.now().isoformat(), migration_id, RUNNING, previous_worker)
+            )
+            return cursor.rowcount == 1
+
+    def update_migration(self, migration_id: str, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE migrations SET {assignments} WHERE migration_id = ?", [*fields.values(), migration_id])
+
+    def complete_migration(self, migration_id: str) -> Dict[str, Any]:
+        """Make the shadow collection active and retire the source, in one transaction"""
+        migration = self.get_migration(migration_id)
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE collections SET status = ? WHERE name = ?", (RETIRED, migration["source_collection"])
+            )
+            self._conn.execute(
+                "UPDATE collections SET status = ? WHERE name = ?", (ACTIVE, migration["target_collection"])
+            )
+            self._conn.execute(
+                "UPDATE migrations SET status = ?, phase = ?, updated_at = ?, completed_at = ? WHERE migration_id = ?",
+                (COMPLETED, "done", now, now, migration_id)
+            )
+            self._conn.execute("DELETE FROM changes")
+        return self.get_migration(migration_id)
+
+    def log_changes(self, document_ids: List[str]):
+        """Record documents whose chunks were just written, if a migration is running (otherwise its copy sees them)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO changes (document_id) SELECT ? WHERE EXISTS (SELECT 1 FROM migrations WHERE status = ?)",
+                [(document_id, RUNNING) for document_id in document_ids]
+            )
+
+    def change_cursor(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, cursor: int) -> Tuple[List[str], int]:
+        """Documents written after `cursor`, and the cursor to pass next time"""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, document_id FROM changes WHERE seq > ? ORDER BY seq", (cursor,)).fetchall()
+        if not rows:
+            return [], cursor
+        return list(dict.fromkeys(row["document_id"] for row in rows)), rows[-1]["seq"]
+
+    def get_migration(self, migration_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM migrations WHERE migration_id = ?", (migration_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_migration(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM migrations ORDER BY created_at DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def running_migration(self) -> Optional[Dict[str, Any]]:
+        """The migration interrupted by a restart or still in progress, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM migrations WHERE status = ? ORDER BY created_at DESC LIMIT 1", (RUNNING,)
+            ).fetchone()
+        return dict(row) if row else None
+
+async def get_collection_registry() -> CollectionRegistry:
+    """Get or open the collection registry"""
+    global _registry
+    if _registry is None:
+        _registry = CollectionRegistry(os.path.join(settings.chroma_persist_directory, "collections.db"))
+    return _registry
@@ -0,0 +1,136 @@
+import re
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Words and punctuation marks, a close enough stand-in for LLM tokens on English text
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of LLM tokens in a text"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def _join_overlapping(first: str, second: str, max_overlap: int) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share"""
+    for size in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+def merge_adjacent(hits: List[Dict[str, Any]], max_overlap: int) -> List[Dict[str, Any]]:
+    """
+    Merge hits that are consecutive chunks of the same document into passages.
+
+    Each hit is a dict with "text", "metadata", "score" (higher is better) and "embedding". A passage
+    keeps the best score and embedding of its chunks, and the list of hits it was built from.
+    """
+    by_document: Dict[Any, List[Dict[str, Any]]] = {}
+    for hit in hits:
+        by_document.setdefault(hit["metadata"].get("document_id"), []).append(hit)
+
+    passages = []
+    for document_hits in by_document.values():
+        document_hits.sort(key=lambda hit: hit["metadata"].get("chunk_id", 0))
+        passage = None
+        for hit in document_hits:
+            chunk_id = hit["metadata"].get("chunk_id")
+            if passage is not None and chunk_id is not None and chunk_id == passage["last_chunk_id"] + 1:
+                passage["text"] = _join_overlapping(passage["text"], hit["text"], max_overlap)
+                passage["hits"].append(hit)
+                passage["last_chunk_id"] = chunk_id
+                if hit["score"] > passage["score"]:
+                    passage["score"] = hit["score"]
+                    passage["embedding"] = hit["embedding"]
+                continue
+
+            passage = {
+                "text": hit["text"],
+                "score": hit["score"],
+                "embedding": hit["embedding"],
+                "hits": [hit],
+                "last_chunk_id": chunk_id if chunk_id is not None else -2
+            }
+            passages.append(passage)
+
+    passages.sort(key=lambda passage: passage["score"], reverse=True)
+    return passages
+
+def select_mmr(
+    passages: List[Dict[str, Any]], mmr_lambda: float, duplicate_similarity: float
+) -> List[Dict[str, Any]]:
+    """
+    Order passages by maximal marginal relevance, dropping near-duplicates.
+
+    Relevance is the passage score scaled to [0, 1], so the ranking from retrieval (or reranking)
+    is kept; it is traded off against embedding similarity to the passages already selected.
+    A passage at least `duplicate_similarity` similar to a selected one is dropped.
+    Without embeddings, passages are kept in score order.
+    """
+    if any(passage["embedding"] is None for passage in passages):
+        return list(passages)
+
+    scores = [passage["score"] for passage in passages]
+    low, spread = min(scores, default=0.0), (max(scores, default=0.0) - min(scores, default=0.0)) or 1.0
+    remaining = [(passage, (passage["score"] - low) / spread) for passage in passages]
+    selected: List[Dict[str, Any]] = []
+
+    while remaining:
+        best_index, best_score = None, -math.inf
+        for index, (passage, relevance) in enumerate(remaining):
+            redundancy = max((_cosine(passage["embedding"], other["embedding"]) for other in selected), default=0.0)
+            if redundancy >= duplicate_similarity:
+                continue
+            score = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+            if score > best_score:
+                best_index, best_score = index, score
+
+        if best_index is None:
+            break  # Everything left duplicates a selected passage
+        selected.append(remaining.pop(best_index)[0])
+
+    return selected
+
+def fill_budget(passages: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """
+    Take passages in order while they fit in the token budget.
+
+    Passages that do not fit are skipped in favor of later, shorter ones; if not even the first
+    one fits, it is truncated so the context is never empty.
+    """
+    chosen = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(passage["text"])
+        if used + tokens <= token_budget:
+            chosen.append(passage)
+            used += tokens
+        elif not chosen:
+            words = _TOKEN_PATTERN.finditer(passage["text"])
+            cut = [match.end() for _, match in zip(range(token_budget), words)]
+            chosen.append({**passage, "text": (passage["text"][:cut[-1]] + "...") if cut else ""})
+            used = token_budget
+    return chosen
+
+def build_context(
+    hits: List[Dict[str, Any]],
+    token_budget: int,
+    max_overlap: int,
+    mmr_lambda: float,
+    duplicate_similarity: float
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Compact retrieved hits into passages that fit the token budget.
+
+    Returns the passages in prompt order, and the token counts of the hits before and of the
+    passages after compaction.
+    """
+    tokens_before = sum(count_tokens(hit["text"]) for hit in hits)
+    passages = merge_adjacent(hits, max_overlap)
+    passages = select_mmr(passages, mmr_lambda, duplicate_similarity)
+    passages = fill_budget(passages, token_budget)
+    tokens_after = sum(count_tokens(passage["text"]) for passage in passages)
+    return passages, tokens_before, tokens_after
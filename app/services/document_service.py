@@ -1,162 +1,616 @@
+import os
+import math
 import uuid
+import time
+import asyncio
+import hashlib
 import logging
+import functools
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from chromadb.errors import InvalidCollectionException
-import fitz 
+from itertools import islice
+from collections import deque
+from typing import Awaitable, Callable, Iterable, List, Dict, Any, Optional, Tuple
 from app.config import settings
 from app.models import DocumentResponse, DocumentCreate
-from app.database import get_client
+from app.database import bump_collection_version
+from app.catalog import get_catalog, DocumentCatalog
 from app.services.embeddings_service import get_embedding_service, EmbeddingService
+from app.services.answer_cache import answer_cache
+from app.services.lexical_index import get_lexical_index, BM25Index
+from app.services.vector_store import get_vector_store, VectorStore
+from app.services.shared_state import get_shared_state, SharedState
+from app.services.metrics import observe_stage, timed, source_label, CHUNKS_INGESTED
+from app.services.text_extraction import (
+    Page, extract_item, get_bulk_pool, hash_content, iter_bulk_items, iter_pdf_pages, iter_text_file, pdf_page_count, split_pages
+)
 
 logger = logging.getLogger(__name__)
 
+# How often a held back write checks whether the write gate has reopened
+_GATE_POLL_SECONDS = 0.1
+
+# Namespace of the IDs of new documents, derived from their name, source and content
+_DOCUMENT_NAMESPACE = uuid.UUID("5b0c7a52-2f4e-4c1e-9a36-8d3f1e6b7c21")
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """hash_content of a file's bytes, without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _PendingDocument:
+    """A document whose chunks are being written"""
+
+    def __init__(
+        self,
+        document_id: str,
+        document_name: str,
+        source: str,
+        content_hash: str,
+        created_at: datetime,
+        previous: Optional[Dict[str, Any]],
+        existing: Dict[str, List[str]]
+    ):
+        self.document_id = document_id
+        self.document_name = document_name
+        self.source = source
+        self.content_hash = content_hash
+        self.created_at = created_at
+        self.previous = previous
+        self.existing = existing  # chunk hash -> IDs of chunks kept from the previous version
+        self.chunk_count = 0
+        self.kept_count = 0
+        self.last_page = None
+        self.added_ids: List[str] = []
+
+    def chunk_metadata(self, chunk_hash: str, page_start: Optional[int], page_end: Optional[int]) -> Dict[str, Any]:
+        metadata = {
+            "document_id": self.document_id,
+            "document_name": self.document_name,
+            "chunk_id": self.chunk_count,
+            "chunk_hash": chunk_hash,
+            "content_hash": self.content_hash,
+            "source": self.source,
+            "created_at": self.created_at.isoformat()
+        }
+        if page_start is not None:
+            metadata["page_start"] = page_start
+            metadata["page_end"] = page_end
+            self.last_page = page_end
+        self.chunk_count += 1
+        return metadata
+
+class _ChunkWriter:
+    """
+    Buffers chunks from one or more documents and writes them in large batches.
+
+    Chunks whose text is unchanged from the previous version of their document are only
+    renumbered; new chunks are embedded together in one batched call on flush. Vector store
+    writes run in the executor.
+    """
+
+    def __init__(self, vector_store: VectorStore, embedding_service: EmbeddingService, lexical_index: BM25Index):
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.lexical_index = lexical_index
+        self._new = []   # (document, chunk ID, text, metadata)
+        self._kept = []  # (document, chunk ID, metadata)
+
+    def __len__(self) -> int:
+        return len(self._new) + len(self._kept)
+
+    def add(self, document: _PendingDocument, chunk: str, page_start: Optional[int], page_end: Optional[int]):
+        chunk_hash = hash_text(chunk)
+        metadata = document.chunk_metadata(chunk_hash, page_start, page_end)
+
+        reusable = document.existing.get(chunk_hash)
+        if reusable:
+            self._kept.append((document, reusable.pop(), metadata))
+        else:
+            self._new.append((document, f"{document.document_id}_{uuid.uuid4().hex}", chunk, metadata))
+
+    async def flush(self):
+        new, self._new = self._new, []
+        kept, self._kept = self._kept, []
+        loop = asyncio.get_running_loop()
+
+        if new:
+            # Embed everything buffered at once, then write it in as few calls as Chroma allows
+            embeddings = await self.embedding_service.get_embeddings_batch([chunk for _, _, chunk, _ in new])
+            step = settings.chroma_add_batch_size
+            for i in range(0, len(new), step):
+                batch = new[i:i + step]
+                with timed("vector_store_add"):
+                    await loop.run_in_executor(None, lambda: self.vector_store.add(
+                        ids=[chunk_key for _, chunk_key, _, _ in batch],
+                        embeddings=embeddings[i:i + step],
+                        metadatas=[metadata for _, _, _, metadata in batch],
+                        documents=[chunk for _, _, chunk, _ in batch]
+                    ))
+                for document, chunk_key, _, _ in batch:
+                    document.added_ids.append(chunk_key)
+                    CHUNKS_INGESTED.labels(source_label(document.source)).inc()
+
+                # Tokenizing is CPU bound, keep it off the event loop
+                with timed("lexical_index_add"):
+                    await loop.run_in_executor(
+                        None, self.lexical_index.add_chunks,
+                        [(chunk_key, document.document_id, chunk) for document, chunk_key, chunk, _ in batch]
+                    )
+
+        if kept:
+            await loop.run_in_executor(None, lambda: self.vector_store.update(
+                ids=[chunk_key for _, chunk_key, _ in kept],
+                metadatas=[metadata for _, _, metadata in kept]
+            ))
+            for document, _, _ in kept:
+                document.kept_count += 1
+
+def _writes(method):
+    """Run a DocumentService method that writes to the vector store under its write gate"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        async with self._writing():
+            return await method(self, *args, **kwargs)
+    return wrapper
+
 class DocumentService:
-    def __init__(self, chroma_client, embedding_service: EmbeddingService):
-        self.client = chroma_client
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedding_service: EmbeddingService,
+        catalog: DocumentCatalog,
+        lexical_index: BM25Index,
+        shared_state: SharedState
+    ):
+        self.vector_store = vector_store
         self.embedding_service = embedding_service
-        self.collection_name = settings.collection_name
-        
-        # Get or create collection
+        self.catalog = catalog
+        self.lexical_index = lexical_index
+
+        # Writes to the vector store pass through a gate shared by all workers, which a collection
+        # swap closes (see writes_paused) so no document is half written to the old collection
+        self.shared_state = shared_state
+        # Called once a write may proceed, to switch to a collection another worker swapped in
+        self.before_write: Optional[Callable[[], Awaitable[None]]] = None
+        # Called with the IDs of documents whose chunks were written, before the write gate is released
+        self.after_write: Optional[Callable[[List[str]], None]] = None
+
+        # Text splitter for chunking, created on first use so langchain is only imported when needed
+        self._text_splitter = None
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=settings.chunk_size,
+                chunk_overlap=settings.chunk_overlap,
+                length_function=len,
+                add_start_index=True  # used to map chunks back to pages
+            )
+        return self._text_splitter
+
+    @asynccontextmanager
+    async def _writing(self):
+        # The gate's SQLite calls may wait for another worker's lock, so they run off the event loop
+        while not await asyncio.to_thread(self.shared_state.begin_write):
+            await asyncio.sleep(_GATE_POLL_SECONDS)
         try:
-            self.collection = self.client.get_collection(name=self.collection_name)
-        except InvalidCollectionException:
-            self.collection = self.client.create_collection(name=self.collection_name)
-        
-        # Text splitter for chunking
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-            length_function=len
-        )
+            if self.before_write is not None:
+                await self.before_write()
+            yield
+        finally:
+            await asyncio.to_thread(self.shared_state.end_write)
+
+    @asynccontextmanager
+    async def writes_paused(self):
+        """Hold back new writes in every worker and wait for those in progress, e.g. while swapping the active collection"""
+        await asyncio.to_thread(self.shared_state.pause_writes)
+        try:
+            while await asyncio.to_thread(self.shared_state.active_writes):
+                await asyncio.sleep(_GATE_POLL_SECONDS)
+            yield
+        finally:
+            await asyncio.to_thread(self.shared_state.resume_writes)
     
     async def process_document(
-        self, content: str, document_name: str, source: str
+        self, content: str, document_name: str, source: str, content_hash: Optional[str] = None
     ) -> DocumentResponse:
-        document_id = str(uuid.uuid4())
-        
-        # Split the document into chunks
-        chunks = self.text_splitter.split_text(content)
-        
-        # Create embeddings and metadata for each chunk
-        chunk_ids = []
-        embeddings = []
-        metadatas = []
-        documents = []
-        
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{document_id}_{i}"
-            chunk_ids.append(chunk_id)
-            
-            # Get embedding
-            embedding = await self.embedding_service.get_embeddings(chunk)
-            embeddings.append(embedding)
-            
-            # Create metadata
-            metadata = {
-                "document_id": document_id,
-                "document_name": document_name,
-                "chunk_id": i,
-                "source": source,
-                "created_at": datetime.now().isoformat()
-            }
-            metadatas.append(metadata)
-            
-            # Add the document text
-            documents.append(chunk)
-        
-        # Add all chunks to the collection at once
-        self.collection.add(
-            ids=chunk_ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-            
-        # Return document info
-        return DocumentResponse(
+        """
+        Chunk, embed and store a document.
+
+        Content that is already stored is skipped. When a previous version of the document exists
+        (same name and source), only chunks whose text changed are embedded and replaced.
+        """
+        # Callers with the raw bytes pass their hash_content; the UTF-8 encoding of the text
+        # stands in otherwise, which is the same for a UTF-8 file
+        content_hash = content_hash or hash_content(content.encode("utf-8"))
+        return await self._ingest([(None, content)], document_name, source, content_hash)
+
+    def _begin(self, document_name: str, source: str, content_hash: str):
+        """
+        Start ingesting a document.
+
+        Returns a skipped DocumentResponse for content that is already stored, otherwise a
+        _PendingDocument indexing the chunks of any previous version by text hash.
+        """
+        # Exact re-upload, nothing to do
+        duplicate = self.catalog.find_by_hash(content_hash)
+        if duplicate:
+            logger.info(f"Skipping {document_name}, identical to document {duplicate['document_id']}")
+            return DocumentResponse(**duplicate, status="skipped")
+
+        previous = self.catalog.find_previous_version(document_name, source)
+        # A new document's ID is derived from its content, so rerunning an ingestion that crashed
+        # midway (e.g. an interrupted job) finds the chunks it left behind under the same ID
+        if previous:
+            document_id = previous["document_id"]
+        else:
+            document_id = str(uuid.uuid5(_DOCUMENT_NAMESPACE, f"{source}\n{document_name}\n{content_hash}"))
+
+        # Index the chunks stored under that ID by text hash, so unchanged ones are kept and the
+        # rest (gone from the previous version, or left over by a crash) are removed on finish
+        existing = {}
+        result = self.vector_store.get(where={"document_id": document_id}, include=["metadatas"])
+        for chunk_key, metadata in zip(result["ids"], result["metadatas"]):
+            existing.setdefault(metadata.get("chunk_hash"), []).append(chunk_key)
+        if existing and not previous:
+            logger.info(f"Found {len(result['ids'])} chunks of {document_name} left by an interrupted ingestion")
+
+        return _PendingDocument(
             document_id=document_id,
             document_name=document_name,
             source=source,
-            chunk_count=len(chunks),
-            created_at=datetime.now()
+            content_hash=content_hash,
+            created_at=previous["created_at"] if previous else datetime.now(),
+            previous=previous,
+            existing=existing
         )
-    
-    async def list_documents(self) -> List[DocumentResponse]:
-        # Query all items in the collection
-        result = self.collection.get()
-        
-        # Group by document_id to get unique documents
-        document_map = {}
-        
-        if result and result['metadatas']:
-            for metadata in result['metadatas']:
-                doc_id = metadata.get('document_id')
-                if doc_id and doc_id not in document_map:
-                    document_map[doc_id] = {
-                        'document_name': metadata.get('document_name', 'Unknown'),
-                        'source': metadata.get('source', 'Unknown'),
-                        'chunks': 1
-                    }
-                elif doc_id:
-                    document_map[doc_id]['chunks'] += 1
-        
-        # Convert to DocumentResponse objects
-        documents = []
-        for doc_id, doc_info in document_map.items():
-            documents.append(
-                DocumentResponse(
-                    document_id=doc_id,
-                    document_name=doc_info['document_name'],
-                    source=doc_info['source'],
-                    chunk_count=doc_info['chunks'],
-                    created_at=datetime.now()  # We don't have creation time stored
-                )
+
+    def _written(self, document_ids: List[str]):
+        if self.after_write is not None and document_ids:
+            self.after_write(document_ids)
+
+    def _finish(self, document: _PendingDocument) -> DocumentResponse:
+        """Drop chunks of the previous version that are gone and record the document in the catalog"""
+        removed_ids = [chunk_key for chunk_keys in document.existing.values() for chunk_key in chunk_keys]
+        if removed_ids:
+            self.vector_store.delete(ids=removed_ids)
+            self.lexical_index.remove_chunks(removed_ids)
+        self._written([document.document_id])
+
+        self.catalog.add_document(
+            document.document_id,
+            document.document_name,
+            document.source,
+            document.chunk_count,
+            document.created_at,
+            document.content_hash
+        )
+
+        if document.previous:
+            answer_cache.invalidate_documents([document.document_id])
+            logger.info(
+                f"Updated {document.document_name}: {document.kept_count} chunks unchanged, "
+                f"{len(document.added_ids)} added, {len(removed_ids)} removed"
             )
-            
-        return documents
+
+        return DocumentResponse(
+            document_id=document.document_id,
+            document_name=document.document_name,
+            source=document.source,
+            chunk_count=document.chunk_count,
+            created_at=document.created_at,
+            status="updated" if document.previous else "inserted",
+            chunks_added=len(document.added_ids),
+            chunks_removed=len(removed_ids)
+        )
+
+    def _rollback(self, document: _PendingDocument):
+        """Undo the chunks added while ingesting a document"""
+        if document.added_ids:
+            self.vector_store.delete(ids=document.added_ids)
+            self.lexical_index.remove_chunks(document.added_ids)
+        # Kept chunks may have been renumbered already
+        self._written([document.document_id])
+
+    @_writes
+    async def _ingest(
+        self,
+        pages: Iterable[Page],
+        document_name: str,
+        source: str,
+        content_hash: str,
+        progress: Optional[Callable[[int, Optional[int]], Awaitable[None]]] = None,
+        expected_chunks: Optional[int] = None,
+        expected_pages: Optional[int] = None
+    ) -> DocumentResponse:
+        """
+        Ingest a stream of pages.
+
+        Pages are split incrementally and chunks are embedded and written a window at a time,
+        so memory use does not grow with the size of the document.
+        `progress` is awaited after each window with the chunks processed so far and an estimate
+        of the total, based on `expected_chunks` or on how many of `expected_pages` were read.
+        Catalog and vector store calls run in the executor, as in _write_group.
+        """
+        loop = asyncio.get_running_loop()
+        document = await loop.run_in_executor(None, self._begin, document_name, source, content_hash)
+        if isinstance(document, DocumentResponse):
+            return document
+
+        chunks = split_pages(pages, self.text_splitter, window=settings.chunk_size * 8)
+        writer = _ChunkWriter(self.vector_store, self.embedding_service, self.lexical_index)
+        start = time.perf_counter()
+
+        try:
+            while True:
+                # Extraction and splitting are CPU bound, so pull each window off the event loop
+                with timed("extract_split"):
+                    window = await loop.run_in_executor(None, lambda: list(islice(chunks, settings.ingest_window)))
+                if not window:
+                    break
+
+                for chunk, page_start, page_end in window:
+                    writer.add(document, chunk, page_start, page_end)
+                await writer.flush()
+
+                if progress is not None:
+                    estimate = expected_chunks
+                    if expected_pages and document.last_page:
+                        estimate = round(document.chunk_count * expected_pages / document.last_page)
+                    await progress(document.chunk_count, max(estimate, document.chunk_count) if estimate else None)
+
+            response = await loop.run_in_executor(None, self._finish, document)
+        except BaseException:
+            # Undo the chunks added by this ingestion, including when it is cancelled
+            await loop.run_in_executor(None, self._rollback, document)
+            raise
+
+        elapsed = time.perf_counter() - start
+        observe_stage("ingest_document", elapsed)
+        if document.added_ids:
+            logger.info(
+                f"Embedded {len(document.added_ids)} chunks of {document_name} in {elapsed:.2f}s "
+                f"({len(document.added_ids) / max(elapsed, 1e-9):.1f} chunks/s, "
+                f"batch size {self.embedding_service.batch_size})"
+            )
+
+        if progress is not None:
+            await progress(document.chunk_count, document.chunk_count)
+        bump_collection_version()
+
+        return response
+
+    async def process_files_bulk(self, files: List[Tuple[str, str]], source: str) -> Dict[str, Any]:
+        """
+        Ingest many files at once. `files` holds (path, name) pairs; .zip and .tar archives are expanded.
+
+        Files are read and their text extracted in parallel on a process pool, a bounded number
+        ahead of the documents being written, so memory does not grow with the size of the batch. Chunks from
+        different documents are packed into full embedding batches and written to Chroma in large
+        calls, a group of documents at a time (see _write_group).
+        Returns per-document results along with files/s and chunks/s.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        items = await loop.run_in_executor(None, lambda: list(iter_bulk_items(files)))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        seen_hashes: Dict[str, int] = {}
+        group: List[Tuple[int, str, str, list]] = []  # extracted documents waiting to be written
+        group_chunks = 0
+        chunk_total = 0
+
+        pool = get_bulk_pool()
+        in_flight = deque()
+        submitted = 0
+
+        def submit_next():
+            nonlocal submitted
+            if submitted < len(items):
+                in_flight.append(loop.run_in_executor(pool, extract_item, *items[submitted]))
+                submitted += 1
+
+        for _ in range(settings.bulk_extract_workers * 2):
+            submit_next()
+
+        for index in range(len(items)):
+            try:
+                with timed("extract"):
+                    name, content_hash, pages, error = await in_flight.popleft()
+            except Exception as e:
+                # The worker process died, e.g. out of memory on a huge PDF
+                logger.error(f"Error extracting {items[index][0]}: {str(e)}")
+                name, error = items[index][0], str(e)
+            submit_next()
+
+            if error is not None:
+                results[index] = {"document_name": name, "status": "failed", "error": error}
+                continue
+
+            # The same file twice in one batch
+            if content_hash in seen_hashes:
+                results[index] = {"document_name": name, "status": "skipped", "duplicate_of": seen_hashes[content_hash]}
+                continue
+            seen_hashes[content_hash] = index
+
+            # Splitting is CPU bound, keep it off the event loop
+            with timed("extract_split"):
+                chunks = await loop.run_in_executor(
+                    None, lambda: list(split_pages(pages, self.text_splitter, window=settings.chunk_size * 8))
+                )
+            group.append((index, name, content_hash, chunks))
+            group_chunks += len(chunks)
+
+            if group_chunks >= settings.bulk_batch_size:
+                chunk_total += await self._write_group(group, source, results)
+                group, group_chunks = [], 0
+
+        if group:
+            chunk_total += await self._write_group(group, source, results)
+
+        # Resolve duplicates within the batch to the document they duplicate
+        for result in results:
+            duplicate_of = result.pop("duplicate_of", None)
+            if duplicate_of is not None:
+                result["document"] = results[duplicate_of].get("document")
+
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        logger.info(
+            f"Bulk ingested {len(results)} files ({chunk_total} chunks) in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.1f} files/s, {chunk_total / elapsed:.1f} chunks/s)"
+        )
+        return {
+            "documents": results,
+            "files": len(results),
+            "chunks": chunk_total,
+            "seconds": elapsed,
+            "files_per_second": len(results) / elapsed,
+            "chunks_per_second": chunk_total / elapsed
+        }
+
+    @_writes
+    async def _write_group(
+        self, group: List[Tuple[int, str, str, list]], source: str, results: List[Optional[Dict[str, Any]]]
+    ) -> int:
+        """
+        Embed and write a group of split documents under the write gate, filling in their results.
+
+        The group is undone as a whole if it fails, including when it is cancelled; groups
+        written before it stay ingested, and uploading the batch again skips them. On an error
+        its documents are reported as failed and the batch goes on with the next group.
+        Returns the number of chunks written.
+        """
+        loop = asyncio.get_running_loop()
+        writer = _ChunkWriter(self.vector_store, self.embedding_service, self.lexical_index)
+        pending: List[Tuple[int, _PendingDocument]] = []
+
+        try:
+            for index, name, content_hash, chunks in group:
+                document = await loop.run_in_executor(None, self._begin, name, source, content_hash)
+                if isinstance(document, DocumentResponse):
+                    results[index] = {"document_name": name, "status": "skipped", "document": document}
+                    continue
+
+                pending.append((index, document))
+                for chunk, page_start, page_end in chunks:
+                    writer.add(document, chunk, page_start, page_end)
+            await writer.flush()
+        except Exception as e:
+            logger.error(f"Error writing a group of {len(group)} documents: {str(e)}")
+            for _, document in pending:
+                await loop.run_in_executor(None, self._rollback, document)
+            for index, name, _, _ in group:
+                if results[index] is None:
+                    results[index] = {"document_name": name, "status": "failed", "error": str(e)}
+            return 0
+        except BaseException:
+            for _, document in pending:
+                await loop.run_in_executor(None, self._rollback, document)
+            raise
+
+        written = 0
+        for index, document in pending:
+            try:
+                response = await loop.run_in_executor(None, self._finish, document)
+            except Exception as e:
+                logger.error(f"Error finishing {document.document_name}: {str(e)}")
+                await loop.run_in_executor(None, self._rollback, document)
+                results[index] = {"document_name": document.document_name, "status": "failed", "error": str(e)}
+                continue
+            results[index] = {"document_name": document.document_name, "status": response.status, "document": response}
+            written += document.chunk_count
+        if pending:
+            bump_collection_version()
+        return written
+
+    async def list_documents(
+        self, limit: int = 100, offset: int = 0, sort_by: str = "created_at", descending: bool = True
+    ) -> List[DocumentResponse]:
+        """List documents from the catalog, one page at a time"""
+        documents = await asyncio.to_thread(self.catalog.list_documents, limit, offset, sort_by, descending)
+        return [DocumentResponse(**document) for document in documents]
+
+    async def count_documents(self) -> int:
+        return await asyncio.to_thread(self.catalog.count)
     
+    @_writes
     async def delete_document(self, document_id: str) -> bool:
-        try:
+        def delete() -> bool:
             # Get all items that match this document_id
-            result = self.collection.get(
-                where={"document_id": document_id}
+            result = self.vector_store.get(
+                where={"document_id": document_id},
+                include=[]
             )
             
             # If we found items, delete them by ID
             if result and result['ids']:
-                self.collection.delete(ids=result['ids'])
-                return True
-            return False
+                self.vector_store.delete(ids=result['ids'])
+            self.lexical_index.remove_document(document_id)
+            self._written([document_id])
+            return self.catalog.delete_document(document_id) or bool(result and result['ids'])
+
+        try:
+            deleted = await asyncio.get_running_loop().run_in_executor(None, delete)
+            if deleted:
+                bump_collection_version()
+                answer_cache.invalidate_documents([document_id])
+            return deleted
         except Exception as e:
             logger.error(f"Error deleting document {document_id}: {str(e)}")
             return False
     
     async def process_uploaded_file(
-        self, file_path: str, document_name: str, source: str
+        self,
+        file_path: str,
+        document_name: str,
+        source: str,
+        progress: Optional[Callable[[int, Optional[int]], Awaitable[None]]] = None
     ) -> DocumentResponse:
-        """Process an uploaded file (txt or pdf)"""
+        """Process an uploaded file (txt or pdf), optionally reporting progress as (chunks done, estimated total)"""
+        loop = asyncio.get_running_loop()
+
+        # Hash the raw file, so exact re-uploads are skipped before any extraction
+        content_hash = await loop.run_in_executor(None, hash_file, file_path)
+
         # Detect file extension
         if document_name.lower().endswith(".pdf"):
-            text = self._extract_text_from_pdf(file_path)
+            page_count = await loop.run_in_executor(None, pdf_page_count, file_path)
+            return await self._ingest(
+                iter_pdf_pages(file_path), document_name, source, content_hash,
+                progress=progress, expected_pages=page_count
+            )
         elif document_name.lower().endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
+            # Roughly one chunk per (chunk size - overlap) characters
+            step = max(settings.chunk_size - settings.chunk_overlap, 1)
+            expected_chunks = math.ceil(os.path.getsize(file_path) / step)
+            return await self._ingest(
+                iter_text_file(file_path), document_name, source, content_hash,
+                progress=progress, expected_chunks=expected_chunks
+            )
         else:
             raise ValueError("Unsupported file type. Only .txt and .pdf are supported.")
-        
-        return await self.process_document(text, document_name, source)
-    
-    def _extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF"""
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+
+# Global document service, created once at startup
+_document_service = None
 
 async def get_document_service():
-    client = await get_client()
+    global _document_service
+    if _document_service is not None:
+        return _document_service
+
+    vector_store = await get_vector_store()
     embedding_service = await get_embedding_service()
-    return DocumentService(client, embedding_service)
\ No newline at end of file
+    catalog = await get_catalog()
+    lexical_index = await get_lexical_index()
+    shared_state = await get_shared_state()
+    _document_service = DocumentService(vector_store, embedding_service, catalog, lexical_index, shared_state)
+    return _document_service
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from typing import List, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Backends selectable with settings.embedding_backend
+BACKENDS = ("huggingface", "onnx", "onnx-int8")
+
+class EmbeddingBackend:
+    """
+    Turns texts into embedding vectors. Implementations load their model on first use and
+    must be safe to call from several threads.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        """Load the model, if not loaded yet"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        raise NotImplementedError
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+class HuggingFaceBackend(EmbeddingBackend):
+    """sentence-transformers on PyTorch in fp32, through langchain"""
+
+    name = "huggingface"
+
+    def _load(self):
+        # Imported here: langchain and torch take seconds to import
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        self.model = HuggingFaceEmbeddings(model_name=f"sentence-transformers/{self.model_name}")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.load()
+        return self.model.embed_documents(texts)
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    The same sentence-transformers model run with ONNX Runtime, optionally with int8 weights.
+
+    The ONNX export and tokenizer are downloaded from the model's Hugging Face repository. The
+    int8 variant is produced once with dynamic quantization and kept in settings.onnx_model_directory.
+    Pooling (attention-masked mean) and L2 normalization match the sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False):
+        super().__init__(model_name)
+        self.quantized = quantized
+        self.name = "onnx-int8" if quantized else "onnx"
+
+    def _model_path(self) -> str:
+        from huggingface_hub import hf_hub_download
+
+        model_path = hf_hub_download(f"sentence-transformers/{self.model_name}", "onnx/model.onnx")
+        if not self.quantized:
+            return model_path
+
+        quantized_path = os.path.join(settings.onnx_model_directory, f"{self.model_name}-int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            os.makedirs(settings.onnx_model_directory, exist_ok=True)
+            logger.info(f"Quantizing {self.model_name} to int8 into {quantized_path}")
+            # Write under a temporary name, so an interrupted run never leaves a partial model
+            partial_path = quantized_path + ".partial"
+            quantize_dynamic(model_path, partial_path, weight_type=QuantType.QInt8)
+            os.replace(partial_path, quantized_path)
+        return quantized_path
+
+    def _load(self):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+            from huggingface_hub import hf_hub_download
+        except ImportError as e:
+            raise RuntimeError(f"The {self.name} embedding backend needs onnxruntime and tokenizers: {str(e)}")
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(f"sentence-transformers/{self.model_name}", "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=settings.embedding_max_tokens)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if settings.onnx_threads:
+            options.intra_op_num_threads = settings.onnx_threads
+        self.session = onnxruntime.InferenceSession(
+            self._model_path(), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        self.load()
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean over the real tokens, then unit length
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+class RemoteBackend(EmbeddingBackend):
+    """
+    Embeds through the shared embedding server (app/embedding_server.py), which holds the model
+    once for all workers. `name` is the backend the server runs, so embeddings are cached under
+    the same key as when the model runs in-process.
+    """
+
+    def __init__(self, name: str, model_name: str, url: str):
+        super().__init__(model_name)
+        self.name = name
+        self.url = url.rstrip("/")
+
+    def _load(self):
+        import httpx
+        self.client = httpx.Client(base_url=self.url, timeout=settings.embedding_server_timeout)
+        # Has the server load the model, so the first request is fast
+        self.client.post("/load", json={"model": self.model_name, "backend": self.name}).raise_for_status()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        self.load()
+        response = self.client.post("/embed", json={"model": self.model_name, "backend": self.name, "texts": texts})
+        response.raise_for_status()
+        # Raw float32 rows, much smaller and faster to decode than JSON numbers
+        dimension = int(response.headers["x-embedding-dimension"])
+        return np.frombuffer(response.content, dtype=np.float32).reshape(len(texts), dimension).tolist()
+
+def create_backend(name: str, model_name: str, server_url: Optional[str] = None) -> EmbeddingBackend:
+    """Create the embedding backend selected by name (see BACKENDS), run by the embedding server at `server_url` if given"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name}, expected one of {', '.join(BACKENDS)}")
+    if server_url:
+        return RemoteBackend(name, model_name, server_url)
+    if name == "huggingface":
+        return HuggingFaceBackend(model_name)
+    if name == "onnx":
+        return OnnxBackend(model_name)
+    return OnnxBackend(model_name, quantized=True)
@@ -0,0 +1,153 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import List, Dict
+
+logger = logging.getLogger(__name__)
+
+# Lookups buffered before their last_used times are written, if no put writes them first
+_TOUCH_BUFFER = 1000
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (embedding model, sha256 of the text).
+
+    Entries are stored as float32 blobs in SQLite so they survive restarts.
+    When the cache grows past `max_entries`, the least recently used entries are evicted.
+
+    To keep lookups and writes cheap, the entry count is tracked as an upper bound (entries
+    are only counted exactly once it passes `max_entries`), and last_used times of lookups are
+    buffered and written along with the next put.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[tuple, float] = {}  # (model, text hash) -> time of the last lookup
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given texts, keyed by text hash; hits and misses count distinct texts"""
+        hashes = list({self.hash_text(text) for text in texts})
+        found = {}
+
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                for text_hash in found:
+                    self._touched[(model, text_hash)] = now
+                if len(self._touched) >= _TOUCH_BUFFER:
+                    self._write_touched()
+                    self._conn.commit()
+
+            # Over distinct texts, as the embedding cache metric counts them
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for the given texts and evict old entries if over the size bound"""
+        now = time.time()
+        rows = [
+            (model, self.hash_text(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._write_touched()
+            # Replaced rows are counted too, so this only overestimates
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _write_touched(self):
+        """Write the buffered last_used times; the caller holds the lock and commits"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(used, model, text_hash) for (model, text_hash), used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # Exact count, also picking up entries other processes added
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._count = count
+        excess = count - self.max_entries
+        if excess > 0:
+            # Evict a little more than needed so we don't evict on every insert
+            excess += self.max_entries // 10
+            self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (excess,)
+            )
+            self._count = max(count - excess, 0)
+            logger.info(f"Evicted {excess} entries from the embedding cache")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": size,
+            "max_entries": self.max_entries
+        }
+
+    def close(self):
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
@@ -1,7 +1,13 @@
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_backends import create_backend
+from app.services.collection_registry import get_collection_registry
+from app.services.metrics import observe_stage, count_cache_lookups
 
 logger = logging.getLogger(__name__)
 
@@ -9,23 +15,137 @@ logger = logging.getLogger(__name__)
 _embedding_service = None
 
 class EmbeddingService:
-    def __init__(self):
-        # Initialize the embedding model
-        self.model = HuggingFaceEmbeddings(model_name=f"sentence-transformers/{settings.embedding_model}")
-    
-    async def get_embeddings(self, text: str) -> List[float]:
+    def __init__(self, model_name: Optional[str] = None):
+        # The backend loads its model on first use, or ahead of time by warmup()
+        self.model_name = model_name or settings.embedding_model
+        self.backend = create_backend(settings.embedding_backend, self.model_name, settings.embedding_server_url)
+        # Backends produce slightly different vectors, so they are cached separately
+        # (the original PyTorch backend keeps the plain model name, so existing caches stay valid)
+        self.cache_key = self.model_name if self.backend.name == "huggingface" else f"{self.model_name}:{self.backend.name}"
+        self.batch_size = settings.embedding_batch_size
+
+        # Persistent cache so unchanged chunks are never re-embedded
+        self.cache = None
+        if settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(
+                path=settings.embedding_cache_path,
+                max_entries=settings.embedding_cache_max_entries
+            )
+
+        # The model runs in worker threads so encoding never blocks the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.embedding_workers,
+            thread_name_prefix="embedding"
+        )
+        # Queries get a lane of their own, so a chat query is not queued behind ingestion batches
+        self._query_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-query")
+        # Cache lookups get their own thread, so a query's lookup does not wait behind ingestion batches
+        self._cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+
+        # Throughput counters, used to tune the batch size
+        self.stats = {
+            "texts_embedded": 0,
+            "batches": 0,
+            "seconds": 0.0,
+            "last_throughput": 0.0
+        }
+
+    def _load_model(self):
+        start = time.perf_counter()
+        self.backend.load()
+        logger.info(
+            f"Loaded embedding model {self.model_name} ({self.backend.name} backend) in {time.perf_counter() - start:.1f}s"
+        )
+
+    async def warmup(self):
+        """Load the model and run one encoding, bypassing the cache, so the first request is fast"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._load_model)
+        await loop.run_in_executor(self._executor, self.backend.embed, ["warmup"])
+
+    async def get_embeddings(self, text: str, query: bool = False) -> List[float]:
         """Get embeddings for a text string"""
+        embeddings = await self.get_embeddings_batch([text], query=query)
+        return embeddings[0]
+
+    async def get_embeddings_batch(
+        self, texts: List[str], batch_size: Optional[int] = None, query: bool = False
+    ) -> List[List[float]]:
+        """
+        Get embeddings for a list of texts, in the same order as the input.
+
+        Texts are encoded in batches of `batch_size` (defaults to settings.embedding_batch_size)
+        on the embedding thread pool, or on the query thread if `query` is set. Texts already in
+        the embedding cache are not re-embedded.
+        """
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+
+        if self.cache is None:
+            return await self._embed(texts, batch_size, query)
+
+        # Only embed texts that are not cached yet, and each distinct text once
+        cached = await loop.run_in_executor(self._cache_executor, self.cache.get_many, self.cache_key, texts)
+        unique = list(dict.fromkeys(texts))
+        missing = [text for text in unique if EmbeddingCache.hash_text(text) not in cached]
+        hits = len(unique) - len(missing)
+
+        if missing:
+            vectors = await self._embed(missing, batch_size, query)
+            await loop.run_in_executor(self._cache_executor, self.cache.put_many, self.cache_key, missing, vectors)
+            for text, vector in zip(missing, vectors):
+                cached[EmbeddingCache.hash_text(text)] = vector
+
+        count_cache_lookups("embedding", hits, len(missing))
+        logger.debug(
+            f"Embedding cache: {hits} hits, {len(missing)} misses "
+            f"(total {self.cache.hits} hits, {self.cache.misses} misses)"
+        )
+        return [cached[EmbeddingCache.hash_text(text)] for text in texts]
+
+    async def _embed(self, texts: List[str], batch_size: Optional[int] = None, query: bool = False) -> List[List[float]]:
+        """Run the embedding model over texts in batches on the embedding (or query) thread pool"""
+        batch_size = batch_size or self.batch_size
+        executor = self._query_executor if query else self._executor
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
         try:
-            # HuggingFaceEmbeddings returns list of list, we need the first item
-            embeddings = self.model.embed_documents([text])
-            return embeddings[0]
+            batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, self.backend.embed, batch)
+                for batch in batches
+            ])
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
 
+        elapsed = time.perf_counter() - start
+        observe_stage("embed", elapsed)
+        self.stats["texts_embedded"] += len(texts)
+        self.stats["batches"] += len(batches)
+        self.stats["seconds"] += elapsed
+        self.stats["last_throughput"] = len(texts) / elapsed if elapsed > 0 else 0.0
+
+        return [embedding for batch_result in results for embedding in batch_result]
+
+    def close(self):
+        """Stop the embedding threads, once the service has been replaced"""
+        self._executor.shutdown(wait=False)
+        self._query_executor.shutdown(wait=False)
+        self._cache_executor.shutdown(wait=False)
+
 async def get_embedding_service():
-    """Get or create the embedding service"""
+    """Get or create the embedding service, for the model that produced the active collection"""
     global _embedding_service
     if _embedding_service is None:
-        _embedding_service = EmbeddingService()
-    return _embedding_service
\ No newline at end of file
+        active = (await get_collection_registry()).active()
+        _embedding_service = EmbeddingService(active["embedding_model"] if active else None)
+    return _embedding_service
+
+def set_embedding_service(embedding_service: EmbeddingService):
+    """Replace the embedding service, once a re-embedding migration has swapped the active collection"""
+    global _embedding_service
+    _embedding_service = embedding_service
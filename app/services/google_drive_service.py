@@ -1,36 +1,62 @@
 import os
+import json
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Tuple
 from app.config import settings
+from app.services.metrics import timed
+from app.services.text_extraction import hash_content
 
 logger = logging.getLogger(__name__)
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# Only fetch text files, documents, etc.
+SUPPORTED_MIME_TYPES = [
+    "text/plain",
+    "application/pdf",
+    "application/vnd.google-apps.document",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword"
+]
+
 class GoogleDriveService:
-    def __init__(self):
+    def __init__(self, service_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            service_factory: Optional callable returning a Drive v3 service object. Defaults to
+                building an authenticated googleapiclient service; tests can pass a local fake.
+        """
         self.credentials = None
-        self.service = None
-        self._init_credentials()
-        
+        self.max_workers = settings.drive_download_workers
+
+        # googleapiclient services are not thread-safe, so each worker thread builds its own
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="drive")
+
+        if service_factory is None:
+            from googleapiclient.discovery import build
+            self._init_credentials()
+            service_factory = lambda: build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+        self._service_factory = service_factory
+
     def _init_credentials(self):
         """Initialize Google Drive credentials"""
+        # The Google client libraries are only imported once Drive is used
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+
         creds = None
-        
+
         # Check if token file exists
         if os.path.exists(settings.google_token_file):
-            creds = Credentials.from_authorized_user_info(
-                json.load(open(settings.google_token_file))
-            )
-            
+            with open(settings.google_token_file) as token:
+                creds = Credentials.from_authorized_user_info(json.load(token))
+
         # If credentials don't exist or are invalid, get new ones
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
@@ -40,82 +66,160 @@ class GoogleDriveService:
                     settings.google_credentials_file, SCOPES
                 )
                 creds = flow.run_local_server(port=0)
-                
+
             # Save credentials for next run
             os.makedirs(os.path.dirname(settings.google_token_file), exist_ok=True)
             with open(settings.google_token_file, 'w') as token:
                 token.write(creds.to_json())
-                
+
         self.credentials = creds
-        self.service = build('drive', 'v3', credentials=creds)
-    
-    async def fetch_files(self, folder_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Fetch files from Google Drive folder"""
-        try:
-            query = "'me' in owners"
-            
-            # If folder ID is provided, filter by that folder
-            if folder_id:
-                query += f" and '{folder_id}' in parents"
-                
-            # Only fetch text files, documents, etc.
-            mime_types = [
-                "text/plain",
-                "application/pdf",
-                "application/vnd.google-apps.document",
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                "application/msword"
-            ]
-            
-            mime_type_query = " or ".join([f"mimeType='{mime}'" for mime in mime_types])
-            query += f" and ({mime_type_query})"
-            
+
+    @property
+    def service(self):
+        """The Drive service for the current thread"""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._service_factory()
+        return service
+
+    async def _run(self, fn, *args):
+        """Run a blocking Drive call on the download pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _list_files(self, folder_id: Optional[str]) -> List[Dict[str, Any]]:
+        query = "'me' in owners"
+
+        # If folder ID is provided, filter by that folder
+        if folder_id:
+            query += f" and '{folder_id}' in parents"
+
+        mime_type_query = " or ".join([f"mimeType='{mime}'" for mime in SUPPORTED_MIME_TYPES])
+        query += f" and ({mime_type_query})"
+
+        # Follow nextPageToken until every page has been read
+        files = []
+        page_token = None
+        while True:
             results = self.service.files().list(
                 q=query,
-                pageSize=50,
+                pageSize=settings.drive_page_size,
+                pageToken=page_token,
                 fields="nextPageToken, files(id, name, mimeType)"
             ).execute()
-            
-            return results.get('files', [])
+
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+
+    async def fetch_files(self, folder_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fetch files from Google Drive folder"""
+        try:
+            return await self._run(self._list_files, folder_id)
         except Exception as e:
             logger.error(f"Error fetching files from Drive: {str(e)}")
             return []
-    
-    async def download_file(self, file_id: str) -> Optional[str]:
+
+    def _download_text(self, file_id: str, mime_type: Optional[str] = None) -> Tuple[str, str]:
+        """Return a file's text and the hash_content of its bytes, as for uploads"""
+        if mime_type is None:
+            # Get file metadata to check mime type
+            mime_type = self.service.files().get(fileId=file_id, fields="mimeType").execute().get('mimeType')
+
+        # For Google Docs, export as plain text
+        if mime_type == 'application/vnd.google-apps.document':
+            response = self.service.files().export(
+                fileId=file_id,
+                mimeType='text/plain'
+            ).execute()
+            return response.decode('utf-8'), hash_content(response)
+
+        # For other files, download directly
+        content = self.service.files().get_media(fileId=file_id).execute()
+        return content.decode('utf-8', errors='replace'), hash_content(content)
+
+    async def download_file(self, file_id: str, mime_type: Optional[str] = None) -> Optional[str]:
         """Download a file from Google Drive and return its content as text"""
         try:
-            # Get file metadata to check mime type
-            file_metadata = self.service.files().get(fileId=file_id).execute()
-            mime_type = file_metadata.get('mimeType')
-            
-            # For Google Docs, export as plain text
-            if mime_type == 'application/vnd.google-apps.document':
-                response = self.service.files().export(
-                    fileId=file_id,
-                    mimeType='text/plain'
-                ).execute()
-                
-                return response.decode('utf-8')
-            else:
-                # For other files, download directly
-                request = self.service.files().get_media(fileId=file_id)
-                file = io.BytesIO()
-                downloader = MediaIoBaseDownload(file, request)
-                
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                
-                file.seek(0)
-                return file.read().decode('utf-8', errors='replace')
+            text, _ = await self._run(self._download_text, file_id, mime_type)
+            return text
         except Exception as e:
             logger.error(f"Error downloading file {file_id}: {str(e)}")
             return None
 
+    async def ingest_folder(self, folder_id: Optional[str], document_service) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Download and ingest every supported file in a folder, yielding progress events.
+
+        Files are downloaded by a bounded pool of workers off the event loop. Each file is chunked
+        and embedded as soon as it arrives, while later downloads are still in progress.
+        Yields a "listing" event, then one "file" event per file (ingested or failed), then "done".
+        """
+        with timed("drive_list"):
+            files = await self._run(self._list_files, folder_id)
+        yield {"type": "listing", "total": len(files)}
+
+        pending = asyncio.Queue()
+        for file in files:
+            pending.put_nowait(file)
+
+        # Bounded, so downloads cannot run far ahead of ingestion
+        downloaded = asyncio.Queue(maxsize=self.max_workers * 2)
+
+        async def download_worker():
+            while True:
+                try:
+                    file = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    with timed("drive_download"):
+                        content, content_hash = await self._run(self._download_text, file["id"], file.get("mimeType"))
+                    await downloaded.put((file, content, content_hash, None))
+                except Exception as e:
+                    await downloaded.put((file, None, None, e))
+
+        workers = [asyncio.create_task(download_worker()) for _ in range(min(self.max_workers, len(files)))]
+        ingested = 0
+        failed = 0
+
+        try:
+            for index in range(1, len(files) + 1):
+                file, content, content_hash, error = await downloaded.get()
+                progress = {"type": "file", "index": index, "total": len(files), "file_id": file["id"], "name": file["name"]}
+
+                if error is not None:
+                    failed += 1
+                    logger.error(f"Error downloading file {file['id']}: {str(error)}")
+                    yield {**progress, "status": "failed", "error": f"Download failed: {str(error)}"}
+                    continue
+
+                try:
+                    document = await document_service.process_document(
+                        content=content,
+                        document_name=file["name"],
+                        source=f"google_drive:{file['id']}",
+                        content_hash=content_hash
+                    )
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Error ingesting file {file['id']}: {str(e)}")
+                    yield {**progress, "status": "failed", "error": f"Ingestion failed: {str(e)}"}
+                    continue
+
+                ingested += 1
+                yield {**progress, "status": document.status, "document": document.model_dump(mode="json")}
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        yield {"type": "done", "total": len(files), "ingested": ingested, "failed": failed}
+
 _drive_service = None
 
 async def get_drive_service():
     global _drive_service
     if _drive_service is None:
         _drive_service = GoogleDriveService()
-    return _drive_service
\ No newline at end of file
+    return _drive_service
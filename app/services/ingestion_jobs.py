@@ -0,0 +1,247 @@
+import os
+import json
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from app.services.document_service import get_document_service
+from app.services.shared_state import get_shared_state, SharedState
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Global job queue
+_job_queue = None
+
+class IngestionJobStore:
+    """SQLite persistence for ingestion jobs, so queued jobs survive a restart"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    document_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    chunks_done INTEGER NOT NULL DEFAULT 0,
+                    chunks_total INTEGER,
+                    error TEXT,
+                    result TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    worker TEXT
+                )
+                """
+            )
+            # Job stores created before jobs were assigned to a worker
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "worker" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN worker TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def create(self, job_id: str, document_name: str, source: str, file_path: str, worker: str):
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (job_id, status, document_name, source, file_path, created_at, updated_at, worker)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, QUEUED, document_name, source, file_path, now, now, worker)
+            )
+
+    def claim(self, job_id: str, worker: str) -> bool:
+        """Mark a queued job of this worker running; False if it was taken over or is not queued"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ? AND worker = ?",
+                (RUNNING, datetime.now().isoformat(), job_id, QUEUED, worker)
+            )
+            return cursor.rowcount == 1
+
+    def adopt(self, job_id: str, previous_worker: Optional[str], worker: str) -> bool:
+        """Re-queue an unfinished job for this worker, unless another worker adopted it first"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, chunks_done = 0, worker = ?, updated_at = ?
+                WHERE job_id = ? AND status IN (?, ?) AND worker IS ?
+                """,
+                (QUEUED, worker, datetime.now().isoformat(), job_id, QUEUED, RUNNING, previous_worker)
+            )
+            return cursor.rowcount == 1
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or interrupted while running, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["created_at"] = datetime.fromisoformat(job["created_at"])
+        job["updated_at"] = datetime.fromisoformat(job["updated_at"])
+        return job
+
+class IngestionJobQueue:
+    """
+    Persistent background queue for file ingestion.
+
+    Uploaded files are spooled to disk and recorded as jobs; a fixed number of worker tasks
+    process them with the document service and record progress as they go. The job store is
+    SQLite, so its calls run in a worker thread rather than on the event loop.
+
+    Each job belongs to the worker process that queued it. Jobs left unfinished by a process
+    that is gone (a restart or a crash) are taken over by a live one, see adopt_orphans.
+    """
+
+    def __init__(
+        self,
+        store: IngestionJobStore,
+        document_service_factory: Callable[[], Awaitable[Any]],
+        workers: int,
+        shared_state: SharedState
+    ):
+        self.store = store
+        self.document_service_factory = document_service_factory
+        self.worker_count = workers
+        self.shared_state = shared_state
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the workers, re-queuing jobs left over from a previous run"""
+        await self.adopt_orphans()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def adopt_orphans(self):
+        """Queue here the unfinished jobs of worker processes that are no longer alive"""
+        # Called on every heartbeat, so the SQLite calls run in a worker thread
+        for job in await asyncio.to_thread(self.store.unfinished):
+            if await asyncio.to_thread(self.shared_state.alive, job["worker"]):
+                continue
+            if await asyncio.to_thread(self.store.adopt, job["job_id"], job["worker"], self.shared_state.worker_id):
+                if job["status"] == RUNNING:
+                    logger.info(f"Re-queuing interrupted ingestion job {job['job_id']}")
+                self._queue.put_nowait(job["job_id"])
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, file_path: str, document_name: str, source: str) -> Dict[str, Any]:
+        """Record a job for a spooled file and queue it"""
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create, job_id, document_name, source, file_path, self.shared_state.worker_id)
+        self._queue.put_nowait(job_id)
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.list, limit, offset)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or not await asyncio.to_thread(self.store.claim, job_id, self.shared_state.worker_id):
+            return
+
+        async def progress(chunks_done: int, chunks_total: Optional[int]):
+            await asyncio.to_thread(self.store.update, job_id, chunks_done=chunks_done, chunks_total=chunks_total)
+
+        try:
+            document_service = await self.document_service_factory()
+            document = await document_service.process_uploaded_file(
+                file_path=job["file_path"],
+                document_name=job["document_name"],
+                source=job["source"],
+                progress=progress
+            )
+        except asyncio.CancelledError:
+            # Shutting down: the job stays "running" and is re-queued on the next start
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self.store.update, job_id, status=FAILED, error=str(e))
+        else:
+            await asyncio.to_thread(
+                self.store.update,
+                job_id,
+                status=COMPLETED,
+                chunks_done=document.chunk_count,
+                chunks_total=document.chunk_count,
+                result=document.model_dump_json()
+            )
+            logger.info(f"Ingestion job {job_id} completed: {document.document_name} ({document.status})")
+
+        # The spooled file is only needed until the job has finished
+        try:
+            await asyncio.to_thread(os.remove, job["file_path"])
+        except OSError:
+            pass
+
+async def get_job_queue() -> IngestionJobQueue:
+    """Get or create the ingestion job queue"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = IngestionJobQueue(
+            store=IngestionJobStore(os.path.join(settings.chroma_persist_directory, "jobs.db")),
+            document_service_factory=get_document_service,
+            workers=settings.ingestion_workers,
+            shared_state=await get_shared_state()
+        )
+    return _job_queue
@@ -0,0 +1,329 @@
+import os
+import re
+import json
+import math
+import heapq
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and identifiers such as "ERR-4012", "v2.1" or "part_no"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+# Common English words, left out of the index: they match most chunks, so their long posting
+# lists would be scanned on nearly every query for little ranking value
+_STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has
+have he her his how i if in into is it its just may more most my no not of on or our she should so
+some such than that the their them then there these they this those to was we were what when where
+which while who why will with would you your
+""".split())
+
+# Chunk keys per statement when reading stored term counts, below SQLite's variable limit
+_REMOVE_BATCH = 500
+
+# Global index
+_lexical_index = None
+
+# Changes kept in the change log for other processes to replay; one further behind reloads the index
+_LOG_ENTRIES = 100000
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase and split text into terms, dropping stopwords.
+
+    Compound identifiers are kept whole and also split into their parts, so "ERR-4012" matches
+    queries for "err-4012" as well as "4012".
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token not in _STOPWORDS:
+            terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_.]", token) if part and part not in _STOPWORDS)
+    return terms
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunk text, persisted to SQLite.
+
+    Postings are kept in memory and rebuilt from the stored term counts on startup; chunks are
+    added and removed incrementally as documents are ingested and deleted.
+
+    Every change is also appended to a change log, so several worker processes sharing the
+    database keep identical indexes: before reading or writing, each replays the changes the
+    others logged since (detected cheaply with SQLite's data_version).
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> chunk key -> term frequency
+        self._lengths: Dict[str, int] = {}  # chunk key -> number of terms
+        self._documents: Dict[str, set] = {}  # document id -> chunk keys
+        self._chunk_documents: Dict[str, str] = {}  # chunk key -> document id
+        self._total_length = 0
+        self._seq = 0  # last change log entry applied
+        self._data_version = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_key TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    terms TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks (document_id)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    chunk_key TEXT,
+                    document_id TEXT,
+                    terms TEXT
+                )
+                """
+            )
+
+        self._load()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        """Index every stored chunk, as of the latest logged change"""
+        self._postings.clear()
+        self._lengths.clear()
+        self._documents.clear()
+        self._chunk_documents.clear()
+        self._total_length = 0
+
+        # In one read transaction, so the chunks and the log position agree
+        started = not self._conn.in_transaction
+        if started:
+            self._conn.execute("BEGIN")
+        try:
+            self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            for chunk_key, document_id, terms in self._conn.execute("SELECT chunk_key, document_id, terms FROM chunks"):
+                self._index(chunk_key, document_id, json.loads(terms))
+        finally:
+            if started:
+                self._conn.commit()
+
+    def _sync(self):
+        """Replay the changes other processes logged since the last call; the caller holds the lock"""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+
+        rows = self._conn.execute(
+            "SELECT seq, op, chunk_key, document_id, terms FROM changes WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        if not rows:
+            return
+        # Further behind than the log goes, or the index was rebuilt
+        if rows[0][0] != self._seq + 1 or any(op == "reload" for _, op, _, _, _ in rows):
+            self._load()
+            return
+        for _, op, chunk_key, document_id, terms in rows:
+            if op == "add":
+                self._index(chunk_key, document_id, json.loads(terms))
+            else:
+                self._unindex(chunk_key, json.loads(terms))
+        self._seq = rows[-1][0]
+
+    @contextmanager
+    def _writing(self):
+        """
+        Hold the lock and SQLite's write lock, with the changes of other processes replayed first.
+
+        If the transaction rolls back, the index is reloaded from disk, as the in-memory postings
+        were already changed for the batch.
+        """
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    self._sync()
+                    yield
+                    self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+                    self._conn.execute("DELETE FROM changes WHERE seq <= ?", (self._seq - _LOG_ENTRIES,))
+            except BaseException:
+                try:
+                    self._load()
+                    self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                except Exception as e:
+                    logger.error(f"Could not reload the lexical index after a failed write: {str(e)}")
+                raise
+
+    def _index(self, chunk_key: str, document_id: str, term_counts: Dict[str, int]):
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[chunk_key] = count
+        length = sum(term_counts.values())
+        self._lengths[chunk_key] = length
+        self._total_length += length
+        self._documents.setdefault(document_id, set()).add(chunk_key)
+        self._chunk_documents[chunk_key] = document_id
+
+    def add_chunks(self, chunks: Iterable[Tuple[str, str, str]]):
+        """Index (chunk key, document id, text) triples"""
+        chunks = [(chunk_key, document_id, dict(Counter(tokenize(text)))) for chunk_key, document_id, text in chunks]
+
+        with self._writing():
+            # Re-indexed chunks replace their previous entry
+            self._remove([chunk_key for chunk_key, _, _ in chunks if chunk_key in self._lengths])
+
+            for chunk_key, document_id, term_counts in chunks:
+                self._index(chunk_key, document_id, term_counts)
+            rows = [(chunk_key, document_id, json.dumps(term_counts)) for chunk_key, document_id, term_counts in chunks]
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (chunk_key, document_id, terms) VALUES (?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO changes (op, chunk_key, document_id, terms) VALUES ('add', ?, ?, ?)", rows)
+
+    def remove_chunks(self, chunk_keys: Iterable[str]):
+        with self._writing():
+            self._remove([chunk_key for chunk_key in chunk_keys if chunk_key in self._lengths])
+
+    def remove_document(self, document_id: str):
+        with self._writing():
+            self._remove(list(self._documents.get(document_id, ())))
+
+    def _unindex(self, chunk_key: str, term_counts: Dict[str, int]):
+        for term in term_counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_key, None)
+                if not postings:
+                    del self._postings[term]
+
+        self._total_length -= self._lengths.pop(chunk_key, 0)
+        document_id = self._chunk_documents.pop(chunk_key, None)
+        document_chunks = self._documents.get(document_id)
+        if document_chunks is not None:
+            document_chunks.discard(chunk_key)
+            if not document_chunks:
+                del self._documents[document_id]
+
+    def _remove(self, chunk_keys: List[str]):
+        """Remove indexed chunks; the caller is inside _writing()"""
+        if not chunk_keys:
+            return
+
+        # The stored term counts tell which postings hold each chunk
+        stored = {}
+        for start in range(0, len(chunk_keys), _REMOVE_BATCH):
+            batch = chunk_keys[start:start + _REMOVE_BATCH]
+            stored.update(self._conn.execute(
+                f"SELECT chunk_key, terms FROM chunks WHERE chunk_key IN ({', '.join('?' * len(batch))})", batch
+            ))
+
+        removed = []
+        for chunk_key in chunk_keys:
+            terms = stored.get(chunk_key, "{}")
+            removed.append((chunk_key, self._chunk_documents.get(chunk_key), terms))
+            self._unindex(chunk_key, json.loads(terms))
+
+        self._conn.executemany("DELETE FROM chunks WHERE chunk_key = ?", [(chunk_key,) for chunk_key in chunk_keys])
+        self._conn.executemany("INSERT INTO changes (op, chunk_key, document_id, terms) VALUES ('remove', ?, ?, ?)", removed)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return the k best (chunk key, BM25 score) pairs for the query"""
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+
+        with self._lock:
+            self._sync()
+            chunk_count = len(self._lengths)
+            if chunk_count == 0:
+                return []
+            average_length = self._total_length / chunk_count
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_key, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_key] / average_length)
+                    scores[chunk_key] = scores.get(chunk_key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._lengths)
+
+    def rebuild(self, vector_store, page_size: int = 5000) -> int:
+        """Reindex every chunk in the vector store, one page at a time"""
+        with self._writing():
+            self._postings.clear()
+            self._lengths.clear()
+            self._documents.clear()
+            self._chunk_documents.clear()
+            self._total_length = 0
+            self._conn.execute("DELETE FROM chunks")
+            # Other processes reload instead of replaying what came before
+            self._conn.execute("DELETE FROM changes")
+            self._conn.execute("INSERT INTO changes (op) VALUES ('reload')")
+
+        offset = 0
+        while True:
+            page = vector_store.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page or not page["ids"]:
+                break
+
+            self.add_chunks(
+                (chunk_key, (metadata or {}).get("document_id", ""), text or "")
+                for chunk_key, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+            offset += len(page["ids"])
+
+        logger.info(f"Rebuilt lexical index with {offset} chunks")
+        return offset
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._sync()
+            return {
+                "chunks": len(self._lengths),
+                "documents": len(self._documents),
+                "terms": len(self._postings),
+                "postings": sum(len(postings) for postings in self._postings.values())
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked lists of chunk keys, best first: each list contributes 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_key in enumerate(ranking, start=1):
+            scores[chunk_key] = scores.get(chunk_key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+async def get_lexical_index() -> BM25Index:
+    """Get or create the lexical index"""
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = BM25Index(os.path.join(settings.chroma_persist_directory, "lexical_index.db"))
+    return _lexical_index
@@ -0,0 +1,135 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Prometheus metrics, served by /metrics
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of chat and ingestion requests",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_duration_seconds",
+    "Time to answer HTTP requests, until the response body is sent",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Tokens in the prompts sent to the LLM",
+    buckets=(64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192)
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "rag_time_to_first_token_seconds",
+    "Time from receiving a streamed chat request to its first LLM token",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+)
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "rag_generation_tokens_per_second",
+    "LLM generation speed, as reported by Ollama",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+)
+CHUNKS_INGESTED = Counter(
+    "rag_chunks_ingested_total",
+    "Chunks embedded and stored, by source (upload, bulk, google_drive...)",
+    ["source"]
+)
+CACHE_LOOKUPS = Counter(
+    "rag_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+
+# Stage durations of the current request in ms, reported in its Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+def observe_stage(stage: str, seconds: float):
+    """Record time spent in a stage, in the histogram and in the current request's timings"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def count_cache_lookups(cache: str, hits: int, misses: int):
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+def source_label(source: str) -> str:
+    """The kind of a document source, e.g. "google_drive" for "google_drive:<file id>" """
+    return source.split(":", 1)[0]
+
+def render_metrics() -> tuple:
+    """
+    The metrics in Prometheus text format, and their content type.
+
+    With several workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory: every worker then
+    records its metrics there and each scrape reports the sum over all of them.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header to API responses, and timing every request.
+
+    Stages recorded with observe_stage() while a request is handled are listed in its header,
+    along with the total. For streamed responses the header is sent before the body, so it
+    only covers the stages completed before streaming started.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        status = 500
+        add_header = scope["path"].startswith(self.path_prefix)
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if add_header:
+                    entries = [f"{stage};dur={ms:.1f}" for stage, ms in timings.items()]
+                    entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # The route template, not the path, keeps the number of label values bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
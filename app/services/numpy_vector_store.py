@@ -0,0 +1,430 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.services.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Rows per matrix product in exact search, and per block when decoding
+_BLOCK_ROWS = 16384
+
+# SQLite's limit on bound parameters is 999 in older builds
+_SQL_BATCH = 900
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store: embeddings in memory-mapped NumPy arrays, text and metadata in SQLite.
+
+    Each chunk has a slot, its row in the arrays; slots of deleted chunks are reused. Embeddings
+    are stored as float32, float16 or int8 with one scale per vector.
+
+    Search is exact, with matrix products over the memory-mapped arrays decoded to float32 one
+    block of rows at a time, until the store holds settings.vector_hnsw_threshold chunks; from
+    then on it goes through an HNSW graph (hnswlib, from the chroma-hnswlib package) built from
+    the arrays and saved on close. `index` set to "flat" or "hnsw" forces either. The HNSW graph
+    is float32, so there float16 and int8 storage shrink the files and page cache, not the graph.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float16", index: str = "auto"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {dtype}, expected one of {', '.join(DTYPES)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index_mode = index
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(os.path.join(directory, "chunks.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    slot INTEGER PRIMARY KEY,
+                    chunk_key TEXT NOT NULL UNIQUE,
+                    document_id TEXT,
+                    document TEXT,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks (document_id)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        info = dict(self._conn.execute("SELECT key, value FROM info").fetchall())
+        # The arrays keep the type they were created with
+        self.dtype = info.get("dtype", dtype)
+        if self.dtype != dtype:
+            logger.warning(f"Vector store {directory} holds {self.dtype} vectors, ignoring the {dtype} setting")
+        self.dimension = int(info["dimension"]) if "dimension" in info else None
+        # Incremented on every change, to tell whether a saved HNSW graph is current
+        self._generation = int(info.get("generation", 0))
+        self._hnsw_generation = int(info.get("hnsw_generation", -1))
+
+        self._slots: Dict[str, int] = dict(self._conn.execute("SELECT chunk_key, slot FROM chunks").fetchall())
+        self._size = max(self._slots.values(), default=-1) + 1
+        used = set(self._slots.values())
+        self._free = [slot for slot in range(self._size - 1, -1, -1) if slot not in used]
+
+        self._vectors = None
+        self._scales = None
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        if self.dimension is not None:
+            self._open_arrays()
+
+        self._hnsw = None
+        self._hnsw_deleted = set()
+
+    # Arrays
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open_arrays(self, capacity: int = 1024):
+        for name, shape, dtype in self._array_specs(capacity):
+            if not os.path.exists(self._path(name)):
+                np.lib.format.open_memmap(self._path(name), mode="w+", dtype=dtype, shape=shape).flush()
+
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+        if self.dtype == "int8":
+            self._scales = np.load(self._path("scales.npy"), mmap_mode="r+")
+
+        capacity = self._vectors.shape[0]
+        self._live = np.zeros(capacity, dtype=bool)
+        self._live[list(self._slots.values())] = True
+        # Squared norms, for L2 distances from dot products
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        for start in range(0, self._size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, self._size)
+            self._norms[start:end] = np.square(self._decode(slice(start, end))).sum(axis=1)
+
+    def _array_specs(self, capacity: int) -> List[Tuple[str, tuple, Any]]:
+        specs = [("vectors.npy", (capacity, self.dimension), DTYPES[self.dtype])]
+        if self.dtype == "int8":
+            specs.append(("scales.npy", (capacity,), np.float32))
+        return specs
+
+    def _grow(self, required: int):
+        """Copy the arrays into larger files, at least doubling their capacity"""
+        capacity = max(required, self._vectors.shape[0] * 2)
+        for name, shape, dtype in self._array_specs(capacity):
+            current = np.load(self._path(name), mmap_mode="r")
+            grown = np.lib.format.open_memmap(self._path(name + ".partial"), mode="w+", dtype=dtype, shape=shape)
+            grown[:len(current)] = current
+            grown.flush()
+            del grown, current
+            os.replace(self._path(name + ".partial"), self._path(name))
+
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+        if self.dtype == "int8":
+            self._scales = np.load(self._path("scales.npy"), mmap_mode="r+")
+        self._live = np.concatenate([self._live, np.zeros(capacity - len(self._live), dtype=bool)])
+        self._norms = np.concatenate([self._norms, np.zeros(capacity - len(self._norms), dtype=np.float32)])
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+        logger.info(f"Grew vector store {self.directory} to {capacity} slots")
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype != "int8":
+            return vectors.astype(DTYPES[self.dtype]), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _decode(self, rows) -> np.ndarray:
+        """The stored vectors of the given slots, as float32"""
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors = vectors * self._scales[rows][:, None]
+        return vectors
+
+    # Writes
+
+    def _bump_generation(self):
+        self._generation += 1
+        self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('generation', ?)", (str(self._generation),))
+
+    def add(self, ids, embeddings, metadatas, documents):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                        [("dimension", str(self.dimension)), ("dtype", self.dtype)]
+                    )
+                self._open_arrays()
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {self.dimension}")
+
+            slots = []
+            for chunk_key in ids:
+                slot = self._slots.get(chunk_key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        slot = self._size
+                        self._size += 1
+                    self._slots[chunk_key] = slot
+                slots.append(slot)
+            if self._size > self._vectors.shape[0]:
+                self._grow(self._size)
+
+            rows = np.array(slots)
+            stored, scales = self._encode(vectors)
+            self._vectors[rows] = stored
+            self._vectors.flush()
+            if scales is not None:
+                self._scales[rows] = scales
+                self._scales.flush()
+            decoded = self._decode(rows)
+            self._norms[rows] = np.square(decoded).sum(axis=1)
+            self._live[rows] = True
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (slot, chunk_key, document_id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (slot, chunk_key, (metadata or {}).get("document_id"), document, json.dumps(metadata or {}))
+                        for slot, chunk_key, metadata, document in zip(slots, ids, metadatas, documents)
+                    ]
+                )
+                self._bump_generation()
+
+            if self._hnsw is not None:
+                for slot in self._hnsw_deleted.intersection(slots):
+                    self._hnsw.unmark_deleted(slot)
+                    self._hnsw_deleted.discard(slot)
+                self._hnsw.add_items(decoded, rows)
+
+    def update(self, ids, metadatas):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ?, document_id = ? WHERE chunk_key = ?",
+                [
+                    (json.dumps(metadata or {}), (metadata or {}).get("document_id"), chunk_key)
+                    for chunk_key, metadata in zip(ids, metadatas)
+                ]
+            )
+
+    def delete(self, ids):
+        with self._lock:
+            slots = [self._slots.pop(chunk_key) for chunk_key in dict.fromkeys(ids) if chunk_key in self._slots]
+            if not slots:
+                return
+            self._free.extend(slots)
+            self._live[slots] = False
+
+            with self._conn:
+                for start in range(0, len(slots), _SQL_BATCH):
+                    batch = slots[start:start + _SQL_BATCH]
+                    self._conn.execute(f"DELETE FROM chunks WHERE slot IN ({','.join('?' * len(batch))})", batch)
+                self._bump_generation()
+
+            if self._hnsw is not None:
+                for slot in slots:
+                    self._hnsw.mark_deleted(slot)
+                    self._hnsw_deleted.add(slot)
+
+    # Reads
+
+    @staticmethod
+    def _where_clause(where: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for field, value in (where or {}).items():
+            if field.startswith("$") or isinstance(value, dict):
+                raise ValueError("Only equality filters on metadata fields are supported")
+            if field == "document_id":
+                clauses.append("document_id = ?")
+            else:
+                clauses.append("json_extract(metadata, ?) = ?")
+                params.append(f'$."{field}"')
+            params.append(value)
+        return clauses, params
+
+    def _result(self, rows: List[tuple], include: Sequence[str]) -> Dict[str, Any]:
+        """Build a get() result from (slot, chunk_key, document, metadata) rows"""
+        return {
+            "ids": [row[1] for row in rows],
+            "documents": [row[2] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[3]) for row in rows] if "metadatas" in include else None,
+            "embeddings": (
+                self._decode(np.array([row[0] for row in rows], dtype=np.int64)).tolist() if rows else []
+            ) if "embeddings" in include else None
+        }
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        clauses, params = self._where_clause(where)
+        with self._lock:
+            if ids is None:
+                sql = "SELECT slot, chunk_key, document, metadata FROM chunks"
+                if clauses:
+                    sql += " WHERE " + " AND ".join(clauses)
+                sql += " ORDER BY slot LIMIT ? OFFSET ?"
+                rows = self._conn.execute(sql, params + [-1 if limit is None else limit, offset or 0]).fetchall()
+            else:
+                found = {}
+                for start in range(0, len(ids), _SQL_BATCH):
+                    batch = ids[start:start + _SQL_BATCH]
+                    sql = (
+                        "SELECT slot, chunk_key, document, metadata FROM chunks "
+                        f"WHERE chunk_key IN ({','.join('?' * len(batch))})"
+                    )
+                    if clauses:
+                        sql += " AND " + " AND ".join(clauses)
+                    found.update((row[1], row) for row in self._conn.execute(sql, list(batch) + params))
+                # In the order asked for
+                rows = [found[chunk_key] for chunk_key in dict.fromkeys(ids) if chunk_key in found]
+                rows = rows[offset or 0:][:limit] if limit is not None else rows[offset or 0:]
+            return self._result(rows, include)
+
+    def count(self) -> int:
+        return len(self._slots)
+
+    def query(self, query_embeddings, n_results, include=("documents", "metadatas", "distances")):
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        with self._lock:
+            k = min(n_results, len(self._slots))
+            if k == 0:
+                empty = [[] for _ in range(len(queries))]
+                return {
+                    "ids": empty, "documents": empty if "documents" in include else None,
+                    "metadatas": empty if "metadatas" in include else None,
+                    "embeddings": empty if "embeddings" in include else None,
+                    "distances": empty if "distances" in include else None
+                }
+
+            if self._use_hnsw():
+                slots, distances = self._hnsw_search(queries, k)
+            else:
+                slots, distances = self._flat_search(queries, k)
+
+            wanted = sorted({int(slot) for slot in slots.ravel()})
+            rows = {}
+            for start in range(0, len(wanted), _SQL_BATCH):
+                batch = wanted[start:start + _SQL_BATCH]
+                rows.update(
+                    (row[0], row) for row in self._conn.execute(
+                        f"SELECT slot, chunk_key, document, metadata FROM chunks WHERE slot IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                )
+
+            results = {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "distances": []}
+            for query_slots, query_distances in zip(slots, distances):
+                hits = [(rows[int(slot)], float(distance)) for slot, distance in zip(query_slots, query_distances) if int(slot) in rows]
+                found = self._result([row for row, _ in hits], include)
+                for field in ("ids", "documents", "metadatas", "embeddings"):
+                    results[field].append(found[field])
+                results["distances"].append([distance for _, distance in hits])
+
+            for field in ("documents", "metadatas", "embeddings", "distances"):
+                if field not in include:
+                    results[field] = None
+            return results
+
+    def _flat_search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact k nearest live slots by squared L2 distance, one block of rows at a time"""
+        query_norms = np.square(queries).sum(axis=1)[:, None]
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_slots = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, self._size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, self._size)
+            # Straight from the memory map: only float16 and int8 blocks are converted, one at a time
+            dots = queries @ self._decode(slice(start, end)).T
+            distances = query_norms + self._norms[start:end][None, :] - 2 * dots
+            distances[:, ~self._live[start:end]] = np.inf
+
+            candidates = np.concatenate([best_distances, distances], axis=1)
+            candidate_slots = np.concatenate(
+                [best_slots, np.broadcast_to(np.arange(start, end), distances.shape)], axis=1
+            )
+            keep = min(k, candidates.shape[1])
+            top = np.argpartition(candidates, keep - 1, axis=1)[:, :keep]
+            best_distances = np.take_along_axis(candidates, top, axis=1)
+            best_slots = np.take_along_axis(candidate_slots, top, axis=1)
+
+        order = np.argsort(best_distances, axis=1)
+        best_distances = np.maximum(np.take_along_axis(best_distances, order, axis=1), 0.0)
+        return np.take_along_axis(best_slots, order, axis=1), best_distances
+
+    # HNSW graph
+
+    def _use_hnsw(self) -> bool:
+        if self.index_mode == "flat":
+            return False
+        if self._hnsw is not None:
+            return True
+        if self.index_mode == "auto" and len(self._slots) < settings.vector_hnsw_threshold:
+            return False
+
+        try:
+            import hnswlib
+        except ImportError:
+            if self.index_mode == "hnsw":
+                raise RuntimeError("The HNSW vector index needs hnswlib (pip install chroma-hnswlib)")
+            logger.warning("hnswlib is not installed, using exact search")
+            self.index_mode = "flat"
+            return False
+
+        self._hnsw = self._load_hnsw(hnswlib)
+        return True
+
+    def _load_hnsw(self, hnswlib):
+        """Load the saved graph if it matches the arrays, otherwise build it"""
+        path = self._path("hnsw.bin")
+        capacity = self._vectors.shape[0]
+        index = hnswlib.Index(space="l2", dim=self.dimension)
+
+        if os.path.exists(path) and self._hnsw_generation == self._generation:
+            try:
+                index.load_index(path, max_elements=capacity)
+                self._hnsw_deleted = set(index.get_ids_list()) - set(self._slots.values())
+                index.set_ef(settings.hnsw_ef_search)
+                return index
+            except Exception as e:
+                logger.warning(f"Could not load the HNSW graph, rebuilding it: {str(e)}")
+                index = hnswlib.Index(space="l2", dim=self.dimension)
+
+        logger.info(f"Building the HNSW graph of {len(self._slots)} vectors")
+        index.init_index(max_elements=capacity, ef_construction=settings.hnsw_ef_construction, M=settings.hnsw_m)
+        slots = np.array(sorted(self._slots.values()), dtype=np.int64)
+        for start in range(0, len(slots), _BLOCK_ROWS):
+            batch = slots[start:start + _BLOCK_ROWS]
+            index.add_items(self._decode(batch), batch)
+        self._hnsw_deleted = set()
+        index.set_ef(settings.hnsw_ef_search)
+        return index
+
+    def _hnsw_search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        self._hnsw.set_ef(max(settings.hnsw_ef_search, k))
+        try:
+            return self._hnsw.knn_query(queries, k=k)
+        except RuntimeError:
+            # The graph can fail to reach k live elements after many deletions
+            return self._flat_search(queries, k)
+
+    def close(self):
+        with self._lock:
+            if self._hnsw is not None and self._hnsw_generation != self._generation:
+                self._hnsw.save_index(self._path("hnsw.bin.partial"))
+                os.replace(self._path("hnsw.bin.partial"), self._path("hnsw.bin"))
+                self._hnsw_generation = self._generation
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO info (key, value) VALUES ('hnsw_generation', ?)", (str(self._generation),)
+                    )
+            self._conn.close()
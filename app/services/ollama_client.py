@@ -0,0 +1,198 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import httpx
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.config import settings
+from app.services.metrics import observe_stage
+from app.services.shared_state import get_shared_state, SharedState
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# How often a generation waiting for a slot held by another worker checks again
+_SLOT_POLL_SECONDS = 0.05
+
+# Global Ollama client
+_ollama_client = None
+
+class OllamaBusyError(Exception):
+    """Raised when the generation queue is full"""
+
+class OllamaClient:
+    """
+    Application-scoped client for Ollama.
+
+    Connections are kept alive between calls. At most `max_concurrency` generations run at once;
+    up to `max_queue` more wait in a priority queue, and anything beyond that is rejected
+    immediately with OllamaBusyError.
+
+    With `shared_state`, the limit holds across every worker: a generation that got a slot here
+    also takes one of the `max_concurrency` slots in the shared state, waiting while other
+    workers hold them all. The priority order only applies within a worker.
+    """
+
+    def __init__(
+        self, base_url: str, max_concurrency: int, max_queue: int, timeout: float, shared_state: Optional[SharedState] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.shared_state = shared_state
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_concurrency + 2,
+                max_keepalive_connections=max_concurrency + 2,
+                keepalive_expiry=300.0
+            )
+        )
+
+        self._active = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+
+        # Queue reporting
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def is_saturated(self) -> bool:
+        """True if a new generation would be rejected right now"""
+        return self._active >= self.max_concurrency and len(self._waiters) >= self.max_queue
+
+    async def _acquire(self, priority: int) -> float:
+        """Wait for a generation slot, returning the time spent waiting"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OllamaBusyError(
+                f"Too many generations in progress ({self._active} running, {len(self._waiters)} queued)"
+            )
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._sequence), future]
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on
+                self._release()
+            elif entry in self._waiters:
+                # Unless _release already popped it and skipped it as cancelled
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+        return time.perf_counter() - start
+
+    def _release(self):
+        # Hand the slot directly to the highest priority waiter
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _acquire_shared(self) -> Optional[int]:
+        """Wait for one of the generation slots shared by all workers"""
+        if self.shared_state is None:
+            return None
+        while True:
+            slot_id = await asyncio.to_thread(self.shared_state.acquire_slot, "ollama_generation", self.max_concurrency)
+            if slot_id is not None:
+                return slot_id
+            await asyncio.sleep(_SLOT_POLL_SECONDS)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one of the generation slots for the duration of the block"""
+        start = time.perf_counter()
+        await self._acquire(priority)
+        slot_id = None
+        try:
+            slot_id = await self._acquire_shared()
+            wait = time.perf_counter() - start
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            observe_stage("llm_queue", wait)
+            if wait > 0.001:
+                logger.info(f"Waited {wait * 1000:.0f} ms for an Ollama generation slot")
+            yield
+        finally:
+            if slot_id is not None:
+                await asyncio.to_thread(self.shared_state.release_slot, slot_id)
+            self.completed += 1
+            self._release()
+
+    async def generate(self, payload: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE) -> httpx.Response:
+        """Run a non-streaming /api/generate call"""
+        async with self.slot(priority):
+            return await self._client.post("/api/generate", json=payload)
+
+    async def warmup(self, model: str, keep_alive: str):
+        """
+        Load a model into Ollama's memory and keep it there for `keep_alive`.
+
+        A generate call without a prompt only loads the model. It does not take a generation slot.
+        """
+        response = await self._client.post("/api/generate", json={"model": model, "keep_alive": keep_alive})
+        response.raise_for_status()
+
+    @asynccontextmanager
+    async def stream_generate(
+        self, payload: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[httpx.Response]:
+        """Run a streaming /api/generate call, holding the slot until the stream is closed"""
+        async with self.slot(priority):
+            async with self._client.stream("POST", "/api/generate", json=payload) as response:
+                yield response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_wait_ms": self.total_wait / self.completed * 1000 if self.completed else 0.0,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+    async def aclose(self):
+        await self._client.aclose()
+
+async def get_ollama_client() -> OllamaClient:
+    """Get or create the Ollama client"""
+    global _ollama_client
+    if _ollama_client is None:
+        _ollama_client = OllamaClient(
+            base_url=settings.ollama_base_url,
+            max_concurrency=settings.ollama_max_concurrency,
+            max_queue=settings.ollama_max_queue,
+            timeout=settings.ollama_timeout,
+            shared_state=await get_shared_state()
+        )
+    return _ollama_client
+
+async def close_ollama_client():
+    """Close the Ollama client's connections"""
+    global _ollama_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
@@ -0,0 +1,426 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from app.database import bump_collection_version
+from app.services.answer_cache import answer_cache
+from app.services.chat_service import get_chat_service, clear_query_caches
+from app.services.document_service import get_document_service
+from app.services.embeddings_service import EmbeddingService, set_embedding_service
+from app.services.collection_registry import (
+    get_collection_registry, versioned_collection_name, CollectionRegistry, BUILDING, RETIRED, RUNNING, FAILED, CANCELLED
+)
+from app.services.shared_state import get_shared_state, SharedState
+from app.services.vector_store import get_vector_store, set_vector_store, open_vector_store, drop_vector_store, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Global migrator
+_migrator = None
+
+# Seconds the previous collection and model stay open after a swap
+_RETIRE_DELAY = 60.0
+
+class MigrationError(Exception):
+    """Raised when a migration cannot be started; the message is shown to the user"""
+
+class _MigrationCancelled(Exception):
+    """The migration was cancelled, possibly from another worker"""
+
+class EmbeddingMigrator:
+    """
+    Re-embeds the active collection with another embedding model, without downtime.
+
+    Chunk texts are read from the active collection a page at a time, embedded with the new
+    model and written to a shadow collection, while queries and ingestion keep using the active
+    one. The job only works `settings.reembed_duty_cycle` of the time so live traffic keeps its
+    latency. Once the copy is done, writes made in the meantime are caught up, then ingestion is
+    paused in every worker while the documents written since then (logged in the registry) are
+    replayed, and the shadow collection is swapped in.
+
+    Every vector store and registry call runs in a worker thread, so the event loop keeps
+    serving requests while a page is read or written.
+
+    Progress is recorded in the collection registry after every page. A migration belongs to
+    the worker that started it; if that worker is gone (a restart or a crash), another one takes
+    it over where it stopped (see watch). The other workers switch to the new collection on
+    their next request (see follow).
+    """
+
+    def __init__(
+        self,
+        registry: CollectionRegistry,
+        shared_state: SharedState,
+        document_service_factory: Callable[[], Awaitable[Any]],
+        chat_service_factory: Callable[[], Awaitable[Any]]
+    ):
+        self.registry = registry
+        self.shared_state = shared_state
+        self.document_service_factory = document_service_factory
+        self.chat_service_factory = chat_service_factory
+        self._task: Optional[asyncio.Task] = None
+        self._chunks_per_second = 0.0
+        self._active_name: Optional[str] = None
+        self._follow_lock = asyncio.Lock()
+
+    async def status(self) -> Dict[str, Any]:
+        """The active collection and the progress of the latest migration"""
+        active = await asyncio.to_thread(self.registry.active)
+        migration = await asyncio.to_thread(self.registry.latest_migration)
+        if migration is not None and migration["status"] == RUNNING:
+            migration["running"] = await asyncio.to_thread(self.shared_state.alive, migration["worker"])
+            if self._running():
+                migration["chunks_per_second"] = self._chunks_per_second
+                remaining = (migration["chunks_total"] or 0) - migration["chunks_done"]
+                if migration["phase"] == "copy" and self._chunks_per_second > 0 and remaining > 0:
+                    migration["eta_seconds"] = remaining / self._chunks_per_second
+        return {
+            "active_collection": active["name"] if active else None,
+            "embedding_model": active["embedding_model"] if active else None,
+            "configured_model": settings.embedding_model,
+            "migration": migration
+        }
+
+    async def start(self, embedding_model: Optional[str] = None) -> Dict[str, Any]:
+        """Start re-embedding the active collection with `embedding_model` (defaults to settings.embedding_model)"""
+        embedding_model = embedding_model or settings.embedding_model
+
+        await get_vector_store()  # registers the collection on first start
+        active = await asyncio.to_thread(self.registry.active)
+        if active["embedding_model"] == embedding_model:
+            raise MigrationError(f"The active collection already holds {embedding_model} embeddings")
+
+        migration = await asyncio.to_thread(
+            self.registry.create_migration,
+            active,
+            versioned_collection_name(settings.collection_name, embedding_model),
+            embedding_model,
+            self.shared_state.worker_id
+        )
+        if migration is None:
+            raise MigrationError("A migration is already running")
+        logger.info(
+            f"Re-embedding {active['name']} ({active['embedding_model']}) into "
+            f"{migration['target_collection']} ({embedding_model})"
+        )
+        self._task = asyncio.create_task(self._run(migration["migration_id"]))
+        return migration
+
+    async def resume(self):
+        """
+        On startup: take over a migration interrupted by a restart, and drop collections left
+        behind by finished ones.
+
+        With settings.reembed_auto_start, a migration is started when settings.embedding_model
+        differs from the model of the active collection.
+        """
+        await get_vector_store()
+        active = self.registry.active()
+        self._active_name = active["name"]
+
+        if self.registry.running_migration() is not None:
+            await self.watch()
+            return
+
+        for collection in self.registry.list():
+            if collection["status"] == BUILDING or (collection["status"] == RETIRED and not settings.reembed_keep_previous):
+                self._drop(collection["name"])
+
+        if settings.reembed_auto_start and active["embedding_model"] != settings.embedding_model:
+            try:
+                await self.start(settings.embedding_model)
+            except MigrationError:
+                # Another worker started it first
+                pass
+
+    async def watch(self):
+        """Take over the running migration if the worker running it is gone; called periodically by every worker"""
+        if self._running():
+            return
+        migration = await asyncio.to_thread(self.registry.running_migration)
+        if migration is None or await asyncio.to_thread(self.shared_state.alive, migration["worker"]):
+            return
+        if await asyncio.to_thread(
+            self.registry.claim_migration, migration["migration_id"], migration["worker"], self.shared_state.worker_id
+        ):
+            logger.info(f"Resuming re-embedding into {migration['target_collection']} ({migration['phase']} phase)")
+            self._task = asyncio.create_task(self._run(migration["migration_id"]))
+
+    async def follow(self):
+        """Switch to the collection another worker swapped in, if any; cheap when nothing changed"""
+        if self._active_name is None or not await asyncio.to_thread(self.registry.changed):
+            return
+        async with self._follow_lock:
+            active = await asyncio.to_thread(self.registry.active)
+            if active is None or active["name"] == self._active_name:
+                return
+            logger.info(f"Switching to collection {active['name']} ({active['embedding_model']}), swapped in by another worker")
+            await self._activate(active["name"], active["embedding_model"], open_vector_store(active["name"]), EmbeddingService(active["embedding_model"]))
+
+    async def stop(self):
+        """Stop for shutdown; the migration stays running and is taken over on the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def cancel(self) -> bool:
+        """Abandon the running migration and its shadow collection"""
+        migration = await asyncio.to_thread(self.registry.running_migration)
+        if migration is None:
+            return False
+        await asyncio.to_thread(self.registry.update_migration, migration["migration_id"], status=CANCELLED)
+        if self._running():
+            await self.stop()
+            await asyncio.to_thread(self._drop, migration["target_collection"])
+        elif not await asyncio.to_thread(self.shared_state.alive, migration["worker"]):
+            await asyncio.to_thread(self._drop, migration["target_collection"])
+        # Otherwise the worker running it stops and drops it after the current page
+        logger.info(f"Cancelled re-embedding into {migration['target_collection']}")
+        return True
+
+    def _running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _drop(self, name: str):
+        try:
+            drop_vector_store(name)
+        except Exception as e:
+            logger.warning(f"Could not drop collection {name}: {str(e)}")
+        self.registry.remove(name)
+
+    async def _check(self, migration_id: str):
+        if (await asyncio.to_thread(self.registry.get_migration, migration_id))["status"] != RUNNING:
+            raise _MigrationCancelled()
+
+    async def _run(self, migration_id: str):
+        migration = await asyncio.to_thread(self.registry.get_migration, migration_id)
+        source = await get_vector_store()
+        target = await asyncio.to_thread(open_vector_store, migration["target_collection"])
+        embedding_service = EmbeddingService(migration["target_model"])
+
+        try:
+            if (await asyncio.to_thread(self.registry.active))["name"] != migration["source_collection"]:
+                raise RuntimeError(f"The active collection is no longer {migration['source_collection']}")
+            # Load the new model up front, so the first queries after the swap are fast
+            await embedding_service.warmup()
+
+            if migration["phase"] == "copy":
+                await self._copy(migration, source, target, embedding_service)
+                await asyncio.to_thread(self.registry.update_migration, migration_id, phase="catch_up")
+
+            # Catch up with ingestion and deletions made during the copy, then, with writes held back,
+            # replay the documents written since the catch-up started, so the shadow collection is
+            # complete when it is swapped in without blocking ingestion for a full scan
+            cursor = await asyncio.to_thread(self.registry.change_cursor)
+            await self._reconcile(migration_id, source, target, embedding_service)
+            cursor = await self._replay(migration_id, cursor, source, target, embedding_service)
+            document_service = await self.document_service_factory()
+            async with document_service.writes_paused():
+                await asyncio.to_thread(self.registry.update_migration, migration_id, phase="swap")
+                await self._replay(migration_id, cursor, source, target, embedding_service)
+                await self._check(migration_id)
+                await asyncio.to_thread(self.registry.complete_migration, migration_id)
+                await self._activate(migration["target_collection"], migration["target_model"], target, embedding_service)
+        except asyncio.CancelledError:
+            target.close()
+            embedding_service.close()
+            raise
+        except _MigrationCancelled:
+            await asyncio.to_thread(target.close)
+            embedding_service.close()
+            await asyncio.to_thread(self._drop, migration["target_collection"])
+            return
+        except Exception as e:
+            logger.error(f"Re-embedding into {migration['target_collection']} failed: {str(e)}")
+            await asyncio.to_thread(self.registry.update_migration, migration_id, status=FAILED, error=str(e))
+            await asyncio.to_thread(target.close)
+            embedding_service.close()
+            await asyncio.to_thread(self._drop, migration["target_collection"])
+            return
+
+        if not settings.reembed_keep_previous:
+            # Once the other workers have had time to switch
+            self._later(self._drop, migration["source_collection"])
+        logger.info(
+            f"Re-embedding complete: {migration['target_collection']} ({migration['target_model']}) is now active"
+        )
+
+    async def _copy(self, migration: Dict[str, Any], source: VectorStore, target: VectorStore, embedding_service: EmbeddingService):
+        """Embed every chunk of the source into the target, a page at a time from where the last run stopped"""
+        migration_id = migration["migration_id"]
+        offset = migration["scanned"]
+        while True:
+            start = time.perf_counter()
+            page = await asyncio.to_thread(
+                source.get, limit=settings.reembed_batch_size, offset=offset, include=["documents", "metadatas"]
+            )
+            if not page["ids"]:
+                break
+            await self._check(migration_id)
+            await self._embed_into(target, embedding_service, page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+            await asyncio.to_thread(lambda: self.registry.update_migration(
+                migration_id, scanned=offset, chunks_done=target.count(), chunks_total=source.count()
+            ))
+            elapsed = await self._throttle(time.perf_counter() - start)
+            self._chunks_per_second = len(page["ids"]) / max(elapsed, 1e-9)
+
+    async def _reconcile(self, migration_id: str, source: VectorStore, target: VectorStore, embedding_service: EmbeddingService):
+        """Add chunks missing from the target, update changed metadata, and delete chunks gone from the source"""
+        added = updated = removed = 0
+
+        offset = 0
+        while True:
+            start = time.perf_counter()
+            page = await asyncio.to_thread(source.get, limit=settings.reembed_batch_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            await self._check(migration_id)
+
+            copied = await asyncio.to_thread(target.get, ids=page["ids"], include=["metadatas"])
+            copied_metadata = dict(zip(copied["ids"], copied["metadatas"]))
+            missing = [chunk_key for chunk_key in page["ids"] if chunk_key not in copied_metadata]
+            changed = [
+                (chunk_key, metadata) for chunk_key, metadata in zip(page["ids"], page["metadatas"])
+                if chunk_key in copied_metadata and copied_metadata[chunk_key] != metadata
+            ]
+            if missing:
+                found = await asyncio.to_thread(source.get, ids=missing, include=["documents", "metadatas"])
+                await self._embed_into(target, embedding_service, found["ids"], found["documents"], found["metadatas"])
+                added += len(found["ids"])
+            if changed:
+                await asyncio.to_thread(
+                    target.update, ids=[chunk_key for chunk_key, _ in changed], metadatas=[metadata for _, metadata in changed]
+                )
+                updated += len(changed)
+            await self._throttle(time.perf_counter() - start)
+
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(target.get, limit=settings.reembed_batch_size, offset=offset, include=[])
+            if not page["ids"]:
+                break
+            present = set((await asyncio.to_thread(source.get, ids=page["ids"], include=[]))["ids"])
+            gone = [chunk_key for chunk_key in page["ids"] if chunk_key not in present]
+            if gone:
+                await asyncio.to_thread(target.delete, ids=gone)
+                removed += len(gone)
+            offset += len(page["ids"]) - len(gone)
+
+        await asyncio.to_thread(lambda: self.registry.update_migration(
+            migration_id, chunks_done=target.count(), chunks_total=source.count()
+        ))
+        logger.info(f"Re-embedding catch-up: {added} chunks added, {updated} updated, {removed} removed")
+
+    async def _replay(
+        self, migration_id: str, cursor: int, source: VectorStore, target: VectorStore, embedding_service: EmbeddingService
+    ) -> int:
+        """Bring the documents written after `cursor` up to date in the target; returns the new cursor"""
+        document_ids, cursor = await asyncio.to_thread(self.registry.changes_since, cursor)
+        for document_id in document_ids:
+            await self._check(migration_id)
+            current = await asyncio.to_thread(source.get, where={"document_id": document_id}, include=["metadatas"])
+            copied = await asyncio.to_thread(target.get, where={"document_id": document_id}, include=["metadatas"])
+            copied_metadata = dict(zip(copied["ids"], copied["metadatas"]))
+            current_ids = set(current["ids"])
+
+            missing = [chunk_key for chunk_key in current["ids"] if chunk_key not in copied_metadata]
+            changed = [
+                (chunk_key, metadata) for chunk_key, metadata in zip(current["ids"], current["metadatas"])
+                if chunk_key in copied_metadata and copied_metadata[chunk_key] != metadata
+            ]
+            gone = [chunk_key for chunk_key in copied["ids"] if chunk_key not in current_ids]
+            if missing:
+                found = await asyncio.to_thread(source.get, ids=missing, include=["documents", "metadatas"])
+                await self._embed_into(target, embedding_service, found["ids"], found["documents"], found["metadatas"])
+            if changed:
+                await asyncio.to_thread(
+                    target.update, ids=[chunk_key for chunk_key, _ in changed], metadatas=[metadata for _, metadata in changed]
+                )
+            if gone:
+                await asyncio.to_thread(target.delete, ids=gone)
+        if document_ids:
+            logger.info(f"Re-embedding catch-up: replayed {len(document_ids)} documents written meanwhile")
+        return cursor
+
+    def _later(self, fn: Callable, *args):
+        """Run fn after _RETIRE_DELAY, in a worker thread as closing and dropping collections touches the disk"""
+        loop = asyncio.get_running_loop()
+        loop.call_later(_RETIRE_DELAY, lambda: loop.run_in_executor(None, fn, *args))
+
+    async def _embed_into(
+        self,
+        target: VectorStore,
+        embedding_service: EmbeddingService,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Embed and add the chunks the target does not hold yet (after a resume, part of a page may be there)"""
+        present = set((await asyncio.to_thread(target.get, ids=ids, include=[]))["ids"])
+        todo = [i for i, chunk_key in enumerate(ids) if chunk_key not in present]
+        if not todo:
+            return
+        embeddings = await embedding_service.get_embeddings_batch([documents[i] or "" for i in todo])
+        for start in range(0, len(todo), settings.chroma_add_batch_size):
+            batch = todo[start:start + settings.chroma_add_batch_size]
+            await asyncio.to_thread(
+                target.add,
+                ids=[ids[i] for i in batch],
+                embeddings=embeddings[start:start + len(batch)],
+                metadatas=[metadatas[i] for i in batch],
+                documents=[documents[i] for i in batch]
+            )
+
+    async def _throttle(self, busy: float) -> float:
+        """Sleep so the job works at most settings.reembed_duty_cycle of the time; returns the time including the sleep"""
+        duty_cycle = min(max(settings.reembed_duty_cycle, 0.01), 1.0)
+        pause = busy * (1 - duty_cycle) / duty_cycle
+        if pause > 0:
+            await asyncio.sleep(pause)
+        return busy + pause
+
+    async def _activate(self, name: str, embedding_model: str, vector_store: VectorStore, embedding_service: EmbeddingService):
+        """Make a collection and its model the ones this worker's services use"""
+        document_service = await self.document_service_factory()
+        chat_service = await self.chat_service_factory()
+        previous_store, previous_embedding_service = document_service.vector_store, document_service.embedding_service
+
+        for service in (document_service, chat_service):
+            service.vector_store = vector_store
+            service.embedding_service = embedding_service
+        set_vector_store(vector_store)
+        set_embedding_service(embedding_service)
+        settings.embedding_model = embedding_model
+        self._active_name = name
+
+        # Cached query embeddings and answers belong to the previous model
+        clear_query_caches()
+        answer_cache.clear()
+        bump_collection_version()
+
+        # Requests that started before the swap may still hold the previous store and model
+        def retire():
+            previous_store.close()
+            previous_embedding_service.close()
+        self._later(retire)
+
+async def get_migrator() -> EmbeddingMigrator:
+    """Get or create the re-embedding migrator"""
+    global _migrator
+    if _migrator is None:
+        _migrator = EmbeddingMigrator(
+            registry=await get_collection_registry(),
+            shared_state=await get_shared_state(),
+            document_service_factory=get_document_service,
+            chat_service_factory=get_chat_service
+        )
+        # Ingestion checks for a collection swapped in by another worker before writing, and logs
+        # the documents it wrote for the catch-up of a running migration
+        document_service = await get_document_service()
+        document_service.before_write = _migrator.follow
+        document_service.after_write = _migrator.registry.log_changes
+    return _migrator
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Global reranker
+_reranker = None
+
+class Reranker:
+    """
+    CPU cross-encoder that scores (query, chunk) pairs, to keep only the best retrieved chunks.
+
+    All candidates of a query are scored in one batched pass on a dedicated thread, and scores
+    are cached per (query, chunk) pair.
+    """
+
+    def __init__(self):
+        self.model_name = settings.rerank_model
+        self.model = None  # loaded on first use, or ahead of time by warmup()
+        self.batch_size = settings.rerank_batch_size
+        self.cache = LRUCache(maxsize=settings.rerank_cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+        self.stats = {
+            "queries": 0,
+            "pairs_scored": 0,
+            "seconds": 0.0
+        }
+
+    def _load_model(self):
+        # Only ever called on the single reranker thread
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name, device="cpu")
+        return self.model
+
+    async def warmup(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor, lambda: self._load_model().predict([("warmup", "warmup")], show_progress_bar=False)
+        )
+
+    async def score(self, query: str, chunks: List[Tuple[str, str]]) -> List[float]:
+        """Score (chunk key, text) pairs against the query, in the same order as the input"""
+        scores: List[Optional[float]] = [self.cache.get((query, chunk_key)) for chunk_key, _ in chunks]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            predicted = await loop.run_in_executor(
+                self._executor,
+                lambda: self._load_model().predict(
+                    [(query, chunks[i][1]) for i in missing], batch_size=self.batch_size, show_progress_bar=False
+                )
+            )
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self.cache.set((query, chunks[i][0]), scores[i])
+
+            self.stats["pairs_scored"] += len(missing)
+            self.stats["seconds"] += time.perf_counter() - start
+
+        self.stats["queries"] += 1
+        return scores
+
+async def get_reranker() -> Optional[Reranker]:
+    """Get or create the reranker; None when reranking is disabled"""
+    global _reranker
+    if not settings.rerank_enabled:
+        return None
+    if _reranker is None:
+        _reranker = Reranker()
+    return _reranker
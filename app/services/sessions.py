@@ -0,0 +1,273 @@
+import os
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.context_builder import count_tokens
+from app.services.ollama_client import get_ollama_client, OllamaClient, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Global session manager
+_session_manager = None
+
+# How often sessions past settings.session_ttl_days are deleted
+_PURGE_INTERVAL_SECONDS = 3600
+
+class SessionNotFoundError(Exception):
+    """Raised for an unknown or expired session ID"""
+
+class SessionStore:
+    """SQLite persistence for chat sessions: their messages and rolling summary"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summarized_upto INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, message_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+
+    def create(self) -> str:
+        session_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)",
+                (session_id, now, now)
+            )
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, message["role"], message["content"], count_tokens(message["content"]), now)
+                    for message in messages
+                ]
+            )
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (now, session_id))
+
+    def messages(self, session_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """Messages of a session with an ID greater than `after`, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM messages WHERE session_id = ? AND message_id > ? ORDER BY message_id",
+                (session_id, after)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_summary(self, session_id: str, summary: str, summarized_upto: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summarized_upto = ? WHERE session_id = ?",
+                (summary, summarized_upto, session_id)
+            )
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            cursor = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return cursor.rowcount > 0
+
+    def purge(self, older_than: datetime) -> int:
+        """Delete sessions not used since `older_than`"""
+        cutoff = older_than.isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                (cutoff,)
+            )
+            return self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+class SessionManager:
+    """
+    Server-side chat history with bounded prompt size.
+
+    Each turn's prompt gets the session's rolling summary plus the turns not summarized yet.
+    Once those turns go past `settings.session_history_tokens`, the older ones are folded into
+    the summary by a background generation, leaving the most recent turns verbatim.
+
+    The store is SQLite, so its calls run in a worker thread rather than on the event loop.
+    """
+
+    def __init__(self, store: SessionStore, ollama_client: OllamaClient):
+        self.store = store
+        self.ollama_client = ollama_client
+        self._summarizing: Dict[str, asyncio.Task] = {}
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Delete expired sessions in the background, now and every hour"""
+        if self._purge_task is None:
+            self._purge_task = asyncio.create_task(self._purge_periodically())
+
+    async def _purge_periodically(self):
+        while True:
+            try:
+                cutoff = datetime.now() - timedelta(days=settings.session_ttl_days)
+                purged = await asyncio.to_thread(self.store.purge, cutoff)
+                if purged:
+                    logger.info(f"Deleted {purged} sessions unused for {settings.session_ttl_days} days")
+            except Exception as e:
+                logger.error(f"Error purging sessions: {str(e)}")
+            await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
+
+    async def start_session(self, history: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Create a session, optionally seeded with history sent by the client"""
+        session_id = await asyncio.to_thread(self.store.create)
+        if history:
+            await asyncio.to_thread(self.store.append, session_id, [
+                {"role": message.get("role", "user"), "content": message.get("content", "")} for message in history
+            ])
+        return session_id
+
+    async def exists(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.store.get, session_id) is not None
+
+    async def history(self, session_id: str) -> List[Dict[str, str]]:
+        """The history to put in the prompt: the rolling summary, then the unsummarized turns"""
+        session = await asyncio.to_thread(self.store.get, session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Session {session_id} not found")
+
+        history = []
+        if session["summary"]:
+            history.append({"role": "summary", "content": session["summary"]})
+        history.extend(
+            {"role": message["role"], "content": message["content"]}
+            for message in await asyncio.to_thread(self.store.messages, session_id, session["summarized_upto"])
+        )
+        return history
+
+    async def record_turn(self, session_id: str, query: str, answer: str):
+        """Store a question and its answer, and compact the history in the background if needed"""
+        await asyncio.to_thread(self.store.append, session_id, [
+            {"role": "user", "content": query},
+            {"role": "assistant", "content": answer}
+        ])
+
+        session = await asyncio.to_thread(self.store.get, session_id)
+        pending = await asyncio.to_thread(self.store.messages, session_id, session["summarized_upto"])
+        if sum(message["tokens"] for message in pending) > settings.session_history_tokens:
+            task = self._summarizing.get(session_id)
+            if task is None or task.done():
+                self._summarizing[session_id] = asyncio.create_task(self._summarize(session_id))
+
+    async def messages(self, session_id: str) -> Dict[str, Any]:
+        session = await asyncio.to_thread(self.store.get, session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Session {session_id} not found")
+        return {**session, "messages": await asyncio.to_thread(self.store.messages, session_id)}
+
+    async def delete(self, session_id: str) -> bool:
+        task = self._summarizing.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        return await asyncio.to_thread(self.store.delete, session_id)
+
+    async def _summarize(self, session_id: str):
+        """Fold all but the most recent turns into the rolling summary"""
+        try:
+            session = await asyncio.to_thread(self.store.get, session_id)
+            pending = await asyncio.to_thread(self.store.messages, session_id, session["summarized_upto"])
+            older = pending[:-settings.session_keep_messages] if settings.session_keep_messages else pending
+            if not older:
+                return
+
+            conversation = "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in older)
+            prompt = (
+                "Summarize the following conversation between a user and an assistant in a few sentences. "
+                "Keep names, facts, numbers and open questions; drop pleasantries.\n\n"
+                + (f"Summary of the conversation so far:\n{session['summary']}\n\n" if session["summary"] else "")
+                + f"Conversation:\n{conversation}\n\nSummary:"
+            )
+            payload = {
+                "model": settings.ollama_model,
+                "prompt": prompt,
+                "stream": False,
+                "temperature": 0.2,
+                "num_predict": settings.session_summary_tokens,
+                "keep_alive": settings.ollama_keep_alive
+            }
+
+            # Background priority: interactive chats always get the LLM first
+            response = await self.ollama_client.generate(payload, priority=PRIORITY_BACKGROUND)
+            if response.status_code != 200:
+                logger.error(f"Error summarizing session {session_id}: {response.status_code}, {response.text}")
+                return
+
+            summary = response.json().get("response", "").strip()
+            await asyncio.to_thread(self.store.set_summary, session_id, summary, older[-1]["message_id"])
+            logger.info(
+                f"Summarized {len(older)} messages of session {session_id} "
+                f"(~{sum(message['tokens'] for message in older)} tokens -> ~{count_tokens(summary)})"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The turns stay unsummarized and are retried after the next turn
+            logger.error(f"Error summarizing session {session_id}: {str(e)}")
+        finally:
+            if self._summarizing.get(session_id) is asyncio.current_task():
+                del self._summarizing[session_id]
+
+    async def stop(self):
+        tasks = list(self._summarizing.values())
+        if self._purge_task is not None:
+            tasks.append(self._purge_task)
+            self._purge_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._summarizing.clear()
+
+async def get_session_manager() -> SessionManager:
+    """Get or create the session manager"""
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager(
+            store=SessionStore(os.path.join(settings.chroma_persist_directory, "sessions.db")),
+            ollama_client=await get_ollama_client()
+        )
+    return _session_manager
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Settings that can be changed at runtime through /api/settings, and so are shared by every worker
+SHARED_SETTINGS = ("system_prompt", "ollama_model", "temperature", "top_p", "max_tokens")
+
+# Global shared state
+_shared_state = None
+
+class SharedState:
+    """
+    State shared by the worker processes of one deployment, through SQLite next to the data.
+
+    - settings changed at runtime, applied by every worker before its next request
+    - named counters, such as the collection version that keys the query caches
+    - live workers, identified by a random id and a heartbeat, so the work of a worker that died
+      (an ingestion job, a migration) can be taken over by another one
+    - a write gate: ingestion holds it while writing, and a collection swap closes it and waits
+      until no worker is writing
+    - slots limiting how many of an operation run at once across workers, such as LLM generations
+
+    Other workers' changes are detected with SQLite's data_version, which costs one pragma, and
+    then by comparing the counters, so heartbeats alone do not count as a change. The methods
+    block on SQLite's locks, so async code calls them in a worker thread.
+    """
+
+    def __init__(self, path: str, heartbeat_timeout: float):
+        self._lock = threading.Lock()
+        self.worker_id = uuid.uuid4().hex
+        self.heartbeat_timeout = heartbeat_timeout
+        self._data_version = None
+        self._counters = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Transactions are managed explicitly, so the write gate can take the write lock up front
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL, writes INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS write_gate (id INTEGER PRIMARY KEY CHECK (id = 0), paused_by TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots (slot_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, worker_id TEXT NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO write_gate (id, paused_by) VALUES (0, NULL)")
+        self.heartbeat()
+
+    def changed(self) -> bool:
+        """Whether settings or counters changed since the last call"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            # Settings changes bump a counter too
+            counters = self._conn.execute("SELECT name, value FROM counters ORDER BY name").fetchall()
+            changed, self._counters = counters != self._counters, counters
+        return changed
+
+    def settings(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM settings").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def update_settings(self, values: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in values.items()]
+            )
+            self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('settings_version', 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+            )
+            self._conn.execute("COMMIT")
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def increment(self, name: str) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1", (name,)
+            )
+            value = self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+            self._conn.execute("COMMIT")
+        return value
+
+    def heartbeat(self):
+        """Mark this worker alive, and forget workers that stopped long ago"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT INTO workers (worker_id, heartbeat) VALUES (?, ?) ON CONFLICT (worker_id) DO UPDATE SET heartbeat = ?",
+                (self.worker_id, now, now)
+            )
+            self._conn.execute("DELETE FROM workers WHERE heartbeat < ?", (now - 100 * self.heartbeat_timeout,))
+            # Slots still held by workers that died
+            self._conn.execute(
+                "DELETE FROM slots WHERE worker_id NOT IN (SELECT worker_id FROM workers WHERE heartbeat >= ?)",
+                (now - self.heartbeat_timeout,)
+            )
+            self._conn.execute("COMMIT")
+
+    def alive(self, worker_id: Optional[str]) -> bool:
+        if worker_id is None:
+            return False
+        if worker_id == self.worker_id:
+            return True
+        with self._lock:
+            return self._alive_locked(worker_id)
+
+    def other_workers(self, since: float) -> int:
+        """Workers other than this one that sent a heartbeat at or after `since` (a time.time())"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE worker_id != ? AND heartbeat >= ?", (self.worker_id, since)
+            ).fetchone()
+        return row[0]
+
+    def acquire_slot(self, name: str, limit: int) -> Optional[int]:
+        """Take one of `limit` slots called `name` shared by every worker; None while live workers hold them all"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            held = self._conn.execute(
+                """
+                SELECT COUNT(*) FROM slots JOIN workers ON workers.worker_id = slots.worker_id
+                WHERE slots.name = ? AND workers.heartbeat >= ?
+                """,
+                (name, time.time() - self.heartbeat_timeout)
+            ).fetchone()[0]
+            if held >= limit:
+                self._conn.execute("ROLLBACK")
+                return None
+            cursor = self._conn.execute("INSERT INTO slots (name, worker_id) VALUES (?, ?)", (name, self.worker_id))
+            self._conn.execute("COMMIT")
+        return cursor.lastrowid
+
+    def release_slot(self, slot_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM slots WHERE slot_id = ?", (slot_id,))
+
+    def begin_write(self) -> bool:
+        """Register a write by this worker, unless writes are paused; returns whether it may proceed"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            paused_by = self._conn.execute("SELECT paused_by FROM write_gate").fetchone()[0]
+            if paused_by is not None and self._alive_locked(paused_by):
+                self._conn.execute("ROLLBACK")
+                return False
+            self._conn.execute("UPDATE workers SET writes = writes + 1 WHERE worker_id = ?", (self.worker_id,))
+            self._conn.execute("COMMIT")
+        return True
+
+    def end_write(self):
+        with self._lock:
+            self._conn.execute("UPDATE workers SET writes = MAX(writes - 1, 0) WHERE worker_id = ?", (self.worker_id,))
+
+    def pause_writes(self):
+        """Hold back new writes in every worker, until resume_writes or until this worker dies"""
+        with self._lock:
+            self._conn.execute("UPDATE write_gate SET paused_by = ?", (self.worker_id,))
+
+    def resume_writes(self):
+        with self._lock:
+            self._conn.execute("UPDATE write_gate SET paused_by = NULL WHERE paused_by = ?", (self.worker_id,))
+
+    def active_writes(self) -> int:
+        """Writes in progress in live workers"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(writes), 0) FROM workers WHERE heartbeat >= ?", (time.time() - self.heartbeat_timeout,)
+            ).fetchone()
+        return row[0]
+
+    def _alive_locked(self, worker_id: str) -> bool:
+        row = self._conn.execute("SELECT heartbeat FROM workers WHERE worker_id = ?", (worker_id,)).fetchone()
+        return row is not None and row[0] >= time.time() - self.heartbeat_timeout
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+            self._conn.execute("DELETE FROM slots WHERE worker_id = ?", (self.worker_id,))
+            self._conn.close()
+
+def apply_settings(values: Dict[str, Any]):
+    """Apply shared runtime settings to this worker's settings"""
+    for key, value in values.items():
+        if key in SHARED_SETTINGS:
+            setattr(settings, key, value)
+
+class SharedStateMiddleware:
+    """ASGI middleware bringing this worker up to date with other workers before each request"""
+
+    def __init__(self, app, refresh: Callable[[], Awaitable[None]]):
+        self.app = app
+        self.refresh = refresh
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self.refresh()
+        await self.app(scope, receive, send)
+
+async def get_shared_state() -> SharedState:
+    """Get or open the shared state"""
+    global _shared_state
+    if _shared_state is None:
+        _shared_state = SharedState(
+            os.path.join(settings.chroma_persist_directory, "shared.db"),
+            heartbeat_timeout=settings.worker_heartbeat_timeout
+        )
+    return _shared_state
+
+def close_shared_state():
+    global _shared_state
+    if _shared_state is not None:
+        _shared_state.close()
+        _shared_state = None
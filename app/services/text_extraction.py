@@ -0,0 +1,251 @@
+import bisect
+import hashlib
+import tarfile
+import zipfile
+import logging
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A page of text; the page number is None for sources without pages (e.g. plain text)
+Page = Tuple[Optional[int], str]
+
+# Shared pools for extracting large PDFs and bulk uploads
+_pdf_pool = None
+_bulk_pool = None
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        # Spawn rather than fork: the parent process runs threads (event loop, embedding model)
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=settings.pdf_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pdf_pool
+
+def get_bulk_pool() -> ProcessPoolExecutor:
+    """Pool for extract_item: PyMuPDF is not thread-safe, so bulk items are parsed in processes too"""
+    global _bulk_pool
+    if _bulk_pool is None:
+        _bulk_pool = ProcessPoolExecutor(
+            max_workers=settings.bulk_extract_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _bulk_pool
+
+def hash_content(data: bytes) -> str:
+    """
+    The content hash of a document, used to skip exact re-uploads: sha256 of its bytes as
+    received, before any decoding, on every ingest route (see also hash_file).
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) - runs in a worker process"""
+    import fitz
+    with fitz.open(file_path) as doc:
+        return [doc[page_number].get_text() for page_number in range(start, end)]
+
+def pdf_page_count(file_path: str) -> int:
+    import fitz
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+def iter_pdf_pages(file_path: str) -> Iterator[Page]:
+    """
+    Yield (page number, text) for each page of a PDF, in order, starting at page 1.
+
+    Small PDFs are read page by page in this process. Large ones are split into page ranges
+    extracted in parallel on a process pool, with a bounded number of ranges in flight so
+    memory stays flat regardless of document size.
+    """
+    import fitz  # PyMuPDF is only imported once a PDF is processed
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+        if page_count < settings.pdf_parallel_min_pages:
+            for page_number in range(page_count):
+                yield page_number + 1, doc[page_number].get_text()
+            return
+
+    pool = _get_pdf_pool()
+    pages_per_task = settings.pdf_pages_per_task
+    ranges = iter(range(0, page_count, pages_per_task))
+    in_flight = deque()
+
+    def submit_next() -> bool:
+        start = next(ranges, None)
+        if start is None:
+            return False
+        end = min(start + pages_per_task, page_count)
+        in_flight.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+        return True
+
+    for _ in range(settings.pdf_workers * 2):
+        if not submit_next():
+            break
+
+    while in_flight:
+        start, future = in_flight.popleft()
+        texts = future.result()
+        submit_next()
+        for offset, text in enumerate(texts):
+            yield start + offset + 1, text
+
+def iter_text_file(file_path: str, block_size: int = 64 * 1024) -> Iterator[Page]:
+    """Yield a text file in blocks, without reading it into memory at once"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            yield None, block
+
+# Extensions that can be ingested, and archive extensions expanded by bulk uploads
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Loaders are partials of module-level functions, so they can be sent to the extraction processes
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
+
+def _fail(message: str) -> bytes:
+    """The loader of an item that cannot be ingested, reported as failed by extract_item"""
+    raise ValueError(message)
+
+def iter_bulk_items(files: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """
+    Expand (path, name) pairs into (name, loader) items, one per document.
+
+    Archive members are listed but not read; each loader returns the raw bytes when called, so
+    reading can happen in the extraction processes. Unsupported archive members are skipped.
+    Archives with more than settings.archive_max_members documents, and members larger than
+    settings.archive_max_member_bytes, are reported as failed rather than read.
+    """
+    for file_path, name in files:
+        lower = name.lower()
+
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(file_path) as archive:
+                members = [(m.filename, m.file_size) for m in archive.infolist() if not m.is_dir()]
+            read_member = _read_zip_member
+        elif lower.endswith(ARCHIVE_EXTENSIONS):
+            with tarfile.open(file_path) as archive:
+                members = [(m.name, m.size) for m in archive.getmembers() if m.isfile()]
+            read_member = _read_tar_member
+        else:
+            yield name, functools.partial(_read_file, file_path)
+            continue
+
+        members = [(member, size) for member, size in members if member.lower().endswith(SUPPORTED_EXTENSIONS)]
+        if len(members) > settings.archive_max_members:
+            yield name, functools.partial(_fail, f"The archive holds {len(members)} documents, more than the limit of {settings.archive_max_members}")
+            continue
+        for member, size in members:
+            if size > settings.archive_max_member_bytes:
+                yield member, functools.partial(
+                    _fail, f"{size} bytes uncompressed, more than the limit of {settings.archive_max_member_bytes} bytes"
+                )
+            else:
+                yield member, functools.partial(read_member, file_path, member)
+
+def _read_limited(f, member: str) -> bytes:
+    # The size in the archive's header is checked when listing; this guards against one that lies
+    data = f.read(settings.archive_max_member_bytes + 1)
+    if len(data) > settings.archive_max_member_bytes:
+        raise ValueError(f"{member} is larger than the limit of {settings.archive_max_member_bytes} bytes")
+    return data
+
+def _read_zip_member(file_path: str, member: str) -> bytes:
+    with zipfile.ZipFile(file_path) as archive, archive.open(member) as f:
+        return _read_limited(f, member)
+
+def _read_tar_member(file_path: str, member: str) -> bytes:
+    with tarfile.open(file_path) as archive:
+        return _read_limited(archive.extractfile(member), member)
+
+def extract_item(name: str, load: Callable[[], bytes]) -> Tuple[str, Optional[str], Optional[List[Page]], Optional[str]]:
+    """
+    Read and extract one bulk item - runs in a worker process (see get_bulk_pool).
+
+    Returns (name, content hash, pages, error). The hash is taken over the raw bytes, as for
+    single uploads, so duplicates are detected the same way.
+    """
+    try:
+        data = load()
+        content_hash = hash_content(data)
+
+        if name.lower().endswith(".pdf"):
+            import fitz
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                pages = [(page_number + 1, doc[page_number].get_text()) for page_number in range(doc.page_count)]
+        elif name.lower().endswith(".txt"):
+            pages = [(None, data.decode("utf-8"))]
+        else:
+            return name, None, None, "Unsupported file type. Only .txt and .pdf are supported."
+
+        return name, content_hash, pages, None
+    except Exception as e:
+        logger.error(f"Error extracting {name}: {str(e)}")
+        return name, None, None, str(e)
+
+def split_pages(pages: Iterable[Page], text_splitter, window: int) -> Iterator[Tuple[str, Optional[int], Optional[int]]]:
+    """
+    Incrementally split a stream of pages into chunks.
+
+    Yields (chunk text, first page, last page). Text is buffered until it holds about `window`
+    characters, split, and all chunks but the last are emitted. The last chunk's text is carried
+    over so chunks spanning page boundaries are split the same way as in the whole text.
+    `text_splitter` must be created with add_start_index=True.
+    """
+    buffer = ""
+    page_starts: List[int] = []  # offset in buffer where each buffered page starts
+    page_numbers: List[Optional[int]] = []
+
+    def page_at(offset: int) -> Optional[int]:
+        # The splitter reports a start index of -1 for a chunk it could not locate in the text
+        if offset < 0:
+            return None
+        return page_numbers[bisect.bisect_right(page_starts, offset) - 1]
+
+    def split(final: bool):
+        nonlocal buffer, page_starts, page_numbers
+        chunks = text_splitter.create_documents([buffer])
+        emitted = chunks if final else chunks[:-1]
+
+        for chunk in emitted:
+            start = chunk.metadata["start_index"]
+            end = start + max(len(chunk.page_content) - 1, 0) if start >= 0 else -1
+            yield chunk.page_content, page_at(start), page_at(end)
+
+        if not final and chunks:
+            # Carry the last chunk over, dropping pages that ended before it
+            carry = chunks[-1].metadata["start_index"]
+            if carry < 0:
+                carry = buffer.rfind(chunks[-1].page_content)
+            if carry < 0:
+                # Nowhere to resume from: emit the chunk as is rather than split the text again
+                yield chunks[-1].page_content, None, None
+                carry = len(buffer)
+            first = bisect.bisect_right(page_starts, carry) - 1
+            page_starts = [max(offset - carry, 0) for offset in page_starts[first:]]
+            page_numbers = page_numbers[first:]
+            buffer = buffer[carry:]
+
+    for page_number, text in pages:
+        if not text:
+            continue
+        page_starts.append(len(buffer))
+        page_numbers.append(page_number)
+        buffer += text
+
+        if len(buffer) >= window:
+            yield from split(final=False)
+
+    if buffer:
+        yield from split(final=True)
@@ -0,0 +1,165 @@
+import os
+import shutil
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+from app.config import settings
+from app.services.collection_registry import get_collection_registry, ACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Global vector store
+_vector_store = None
+_chroma = None
+
+# Stores selectable with settings.vector_store
+VECTOR_STORES = ("chroma", "numpy")
+
+def is_multiprocess_safe() -> bool:
+    """Whether several worker processes can use the store: only a Chroma server is; local files are not"""
+    return settings.vector_store == "chroma" and settings.chroma_server_host is not None
+
+class VectorStore:
+    """
+    Chunk storage with nearest neighbour search, behind DocumentService and ChatService.
+
+    The methods are the subset of the Chroma collection API the app uses, with the same
+    arguments and result shapes, so stores are interchangeable:
+
+    - get and query results are dicts of "ids", "documents", "metadatas", "embeddings"
+      (and "distances" for query), holding None for fields not in `include`
+    - query takes a list of query embeddings and returns one list of hits per query
+    - distances are squared L2, as in Chroma's default space
+    - `where` filters only support equality on metadata fields, e.g. {"document_id": "..."}
+    """
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str]
+    ):
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the metadata of existing chunks"""
+        raise NotImplementedError
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int,
+        include: Sequence[str] = ("documents", "metadatas", "distances")
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Persist anything held in memory only"""
+
+class ChromaVectorStore(VectorStore):
+    """A Chroma collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add(self, ids, embeddings, metadatas, documents):
+        self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+
+    def query(self, query_embeddings, n_results, include=("documents", "metadatas", "distances")):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, include=list(include))
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+def _chroma_client():
+    global _chroma
+    if _chroma is None:
+        import chromadb
+
+        if settings.chroma_server_host:
+            # Client/server mode: the server owns the data, so any number of workers can share it
+            _chroma = chromadb.HttpClient(host=settings.chroma_server_host, port=settings.chroma_server_port)
+            logger.info(f"Using the Chroma server at {settings.chroma_server_host}:{settings.chroma_server_port}")
+        else:
+            # Create the directory for ChromaDB persistence if it doesn't exist
+            os.makedirs(settings.chroma_persist_directory, exist_ok=True)
+            _chroma = chromadb.PersistentClient(path=settings.chroma_persist_directory)
+    return _chroma
+
+def _numpy_directory(name: str) -> str:
+    return os.path.join(settings.chroma_persist_directory, "vectors", name)
+
+def open_vector_store(name: str) -> VectorStore:
+    """Open a collection of the store selected by settings.vector_store, creating it if needed"""
+    if settings.vector_store == "chroma":
+        client = _chroma_client()
+        # Get the collection, or create it on first run
+        try:
+            collection = client.get_collection(name=name)
+            logger.info(f"Using existing collection: {name}")
+        except Exception:
+            collection = client.create_collection(name=name)
+            logger.info(f"Created new collection: {name}")
+        return ChromaVectorStore(collection)
+    elif settings.vector_store == "numpy":
+        # Imported here: only needed when selected
+        from app.services.numpy_vector_store import NumpyVectorStore
+        return NumpyVectorStore(_numpy_directory(name), dtype=settings.vector_store_dtype, index=settings.vector_index)
+    raise ValueError(f"Unknown vector store {settings.vector_store}, expected one of {', '.join(VECTOR_STORES)}")
+
+def drop_vector_store(name: str):
+    """Delete a collection and its vectors"""
+    if settings.vector_store == "chroma":
+        _chroma_client().delete_collection(name=name)
+    elif settings.vector_store == "numpy":
+        shutil.rmtree(_numpy_directory(name), ignore_errors=True)
+
+async def get_vector_store() -> VectorStore:
+    """Get or open the active collection, as recorded in the collection registry"""
+    global _vector_store
+    if _vector_store is None:
+        registry = await get_collection_registry()
+        active = registry.active()
+        if active is None:
+            # First start, or a collection from before collections were versioned:
+            # its vectors are taken to come from the configured model
+            registry.register(settings.collection_name, settings.embedding_model, ACTIVE)
+            active = registry.active()
+        _vector_store = open_vector_store(active["name"])
+    return _vector_store
+
+def set_vector_store(vector_store: VectorStore):
+    """Replace the active collection, once a re-embedding migration has swapped it"""
+    global _vector_store
+    _vector_store = vector_store
+
+def close_vector_store():
+    global _vector_store
+    if _vector_store is not None:
+        _vector_store.close()
+        _vector_store = None
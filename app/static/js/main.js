@@ -120,7 +120,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         try {
             document.getElementById('loading-documents').classList.remove('hidden');
-            const response = await fetch('/api/documents/drive', {
+            const response = await fetch('/api/documents/drive/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -132,8 +132,37 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Failed to import from Google Drive');
             }
             
-            const result = await response.json();
-            showNotification(`Successfully imported ${result.length} documents`);
+            // Progress arrives as newline-delimited JSON events, one per file
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let summary = null;
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const event = JSON.parse(line);
+                    
+                    if (event.type === 'file' && event.status === 'failed') {
+                        showNotification(`Failed to import ${event.name}: ${event.error}`, true);
+                    } else if (event.type === 'done') {
+                        summary = event;
+                    } else if (event.type === 'error') {
+                        throw new Error(event.detail);
+                    }
+                }
+            }
+            
+            if (summary) {
+                showNotification(`Imported ${summary.ingested} of ${summary.total} documents`);
+            }
             loadDocuments();
             driveImportForm.classList.add('hidden');
         } catch (error) {
@@ -169,10 +198,25 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Failed to upload document');
             }
             
-            const result = await response.json();
-            showNotification(`Successfully uploaded ${result.document_name}`);
-            loadDocuments();
+            // Ingestion runs in the background; poll the job until it finishes
+            let job = await response.json();
             fileInput.value = '';
+            showNotification(`Uploaded ${job.document_name}, processing...`);
+            
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const jobResponse = await fetch(`/api/documents/jobs/${job.job_id}`);
+                if (!jobResponse.ok) {
+                    throw new Error('Failed to get upload status');
+                }
+                job = await jobResponse.json();
+            }
+            
+            if (job.status === 'failed') {
+                throw new Error(job.error);
+            }
+            showNotification(`Successfully processed ${job.document_name} (${job.result.status})`);
+            loadDocuments();
         } catch (error) {
             showNotification('Error uploading document: ' + error.message, true);
         } finally {
@@ -187,7 +231,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const useLlmCheckbox = document.getElementById('use-llm');
     const useHistoryCheckbox = document.getElementById('use-history');
     
-    let chatHistory = [];
+    // The server keeps the conversation history for this session
+    let sessionId = null;
     
     chatForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -211,14 +256,14 @@ document.addEventListener('DOMContentLoaded', function() {
             const useLlm = useLlmCheckbox.checked;
             const useRetrieval = document.getElementById('use-retrieval').checked;
             
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
                     query: query,
-                    history: useHistoryCheckbox.checked ? chatHistory : [], // Only send history if checkbox is checked
+                    session_id: useHistoryCheckbox.checked ? sessionId : null, // Only continue the session if checkbox is checked
                     use_llm: useLlm,
                     skip_retrieval: !useRetrieval // We inverse the value here
                 })
@@ -228,17 +273,56 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Failed to get response');
             }
             
-            const result = await response.json();
-            
-            // Remove loading indicator
-            chatMessages.removeChild(loadingMessage);
+            // Read newline-delimited JSON events: sources first, then tokens as they are generated
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let answer = '';
+            let sources = [];
+            let answerParagraph = null;
             
-            // Add assistant message with sources
-            addMessage('assistant', result.answer, result.sources);
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const event = JSON.parse(line);
+                    
+                    if (event.type === 'sources') {
+                        sources = event.sources;
+                        if (useHistoryCheckbox.checked) {
+                            sessionId = event.session_id;
+                        }
+                    } else if (event.type === 'token') {
+                        if (!answerParagraph) {
+                            // Replace the loading indicator with the message being streamed
+                            chatMessages.removeChild(loadingMessage);
+                            answerParagraph = addMessage('assistant', '').querySelector('p');
+                        }
+                        answer += event.content;
+                        answerParagraph.textContent = answer;
+                        chatMessages.scrollTop = chatMessages.scrollHeight;
+                    } else if (event.type === 'done') {
+                        // A new session is only started once an answer is recorded
+                        if (useHistoryCheckbox.checked && event.session_id) {
+                            sessionId = event.session_id;
+                        }
+                    } else if (event.type === 'error') {
+                        throw new Error(event.detail);
+                    }
+                }
+            }
             
-            // Update chat history
-            chatHistory.push({role: 'user', content: query});
-            chatHistory.push({role: 'assistant', content: result.answer});
+            if (!answerParagraph) {
+                chatMessages.removeChild(loadingMessage);
+                answerParagraph = addMessage('assistant', answer).querySelector('p');
+            }
+            addSources(answerParagraph.parentElement, sources);
         } catch (error) {
             chatMessages.removeChild(chatMessages.lastChild); // Remove loading
             showNotification('Error: ' + error.message, true);
@@ -298,7 +382,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         try {
             document.getElementById('loading-documents').classList.remove('hidden');
-            const response = await fetch('/api/documents');
+            const response = await fetch('/api/documents?limit=1000');
             
             if (!response.ok) {
                 throw new Error('Failed to fetch documents');
@@ -370,6 +454,14 @@ document.addEventListener('DOMContentLoaded', function() {
         contentP.textContent = content;
         messageDiv.appendChild(contentP);
         
+        addSources(messageDiv, sources);
+        
+        chatMessages.appendChild(messageDiv);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
+    }
+    
+    function addSources(messageDiv, sources) {
         if (sources && sources.length > 0) {
             const sourcesDiv = document.createElement('div');
             sourcesDiv.className = 'sources';
@@ -378,15 +470,15 @@ document.addEventListener('DOMContentLoaded', function() {
             sources.forEach(source => {
                 const sourceItem = document.createElement('div');
                 sourceItem.className = 'source-item';
-                sourceItem.textContent = `${source.document_name} (Relevance: ${source.relevance.toFixed(2)})`;
+                const pages = source.page_start == null ? ''
+                    : source.page_start === source.page_end ? `, p. ${source.page_start}`
+                    : `, pp. ${source.page_start}-${source.page_end}`;
+                sourceItem.textContent = `${source.document_name}${pages} (Relevance: ${source.relevance.toFixed(2)})`;
                 sourcesDiv.appendChild(sourceItem);
             });
             
             messageDiv.appendChild(sourcesDiv);
         }
-        
-        chatMessages.appendChild(messageDiv);
-        chatMessages.scrollTop = chatMessages.scrollHeight;
     }
     
     function showNotification(message, isError = false) {
@@ -0,0 +1,116 @@
+"""
+Benchmark the BM25 lexical index on a synthetic corpus.
+
+Measures index build time, memory footprint, on-disk size, reload time, incremental delete time
+and query latency for plain-word and identifier queries.
+
+    python -m benchmarks.bm25_benchmark --chunks 50000 --queries 500 --output bm25.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from typing import Dict, List
+
+from app.services.lexical_index import BM25Index
+
+def make_corpus(chunks: int, words_per_chunk: int, vocabulary: int, seed: int) -> List[str]:
+    """Zipf-like word distribution, with an identifier (e.g. "ERR-01234") in every tenth chunk"""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary)]
+
+    corpus = []
+    for i in range(chunks):
+        text = rng.choices(words, weights=weights, k=words_per_chunk)
+        if i % 10 == 0:
+            text.insert(rng.randrange(len(text)), f"ERR-{i:05d}")
+        corpus.append(" ".join(text))
+    return corpus
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    pick = lambda p: samples[min(int(p / 100 * len(samples)), len(samples) - 1)]
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99), "mean_ms": sum(samples) / len(samples)}
+
+def run(args) -> Dict[str, object]:
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.chunks, args.words_per_chunk, args.vocabulary, args.seed)
+    path = os.path.join(tempfile.mkdtemp(prefix="bm25_"), "lexical_index.db")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = BM25Index(path)
+    for offset in range(0, len(corpus), args.batch_size):
+        index.add_chunks(
+            (f"chunk_{i}", f"doc_{i // 50}", corpus[i])
+            for i in range(offset, min(offset + args.batch_size, len(corpus)))
+        )
+    build_seconds = time.perf_counter() - start
+    memory_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    word_queries = [" ".join(rng.choices(corpus[rng.randrange(len(corpus))].split(), k=4)) for _ in range(args.queries)]
+    identifier_queries = [f"what does err-{rng.randrange(0, args.chunks, 10):05d} mean" for _ in range(args.queries)]
+
+    latency = {}
+    for name, queries in (("word", word_queries), ("identifier", identifier_queries)):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k=20)
+            samples.append((time.perf_counter() - start) * 1000)
+        latency[name] = percentiles(samples)
+
+    # Identifier queries should find their chunk first
+    hits = sum(
+        1 for query in identifier_queries
+        if (results := index.search(query, k=1)) and results[0][0] == f"chunk_{int(query.split('-')[1].split()[0])}"
+    )
+
+    start = time.perf_counter()
+    index.remove_document("doc_0")
+    delete_ms = (time.perf_counter() - start) * 1000
+    stats = index.stats()
+    index.close()
+
+    start = time.perf_counter()
+    BM25Index(path).close()
+    reload_seconds = time.perf_counter() - start
+
+    return {
+        "chunks": args.chunks,
+        "build_seconds": build_seconds,
+        "chunks_per_second": args.chunks / build_seconds,
+        "memory_mb": memory_bytes / 2**20,
+        "peak_memory_mb": peak_bytes / 2**20,
+        "disk_mb": os.path.getsize(path) / 2**20,
+        "reload_seconds": reload_seconds,
+        "delete_document_ms": delete_ms,
+        "query_latency": latency,
+        "identifier_hit_rate": hits / len(identifier_queries),
+        "index": stats
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--words-per-chunk", type=int, default=150)
+    parser.add_argument("--vocabulary", type=int, default=30000)
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks indexed per call, as during ingestion")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
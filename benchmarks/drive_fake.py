@@ -0,0 +1,106 @@
+"""
+A local fake of the Drive v3 files API, for exercising Drive ingestion without credentials or
+a network.
+
+Implements the calls GoogleDriveService makes: files().list (paged with nextPageToken),
+files().get, files().export and files().get_media, each returning a request whose execute()
+sleeps for a configurable latency. Pass `FakeDrive.service` as the service_factory of
+GoogleDriveService; every thread gets a service over the same files.
+
+    drive = FakeDrive.with_files(120, failing={"file_7"}, latency=0.01)
+    service = GoogleDriveService(service_factory=drive.service)
+"""
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+GOOGLE_DOC = "application/vnd.google-apps.document"
+
+class FakeDriveError(Exception):
+    """Raised by execute() for a file set up to fail, like an HttpError from googleapiclient"""
+
+class _Request:
+    def __init__(self, drive: "FakeDrive", call: str, result):
+        self._drive = drive
+        self._call = call
+        self._result = result
+
+    def execute(self):
+        self._drive.record(self._call)
+        time.sleep(self._drive.latency)
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+class _Files:
+    def __init__(self, drive: "FakeDrive"):
+        self._drive = drive
+
+    def list(self, q: str = "", pageSize: int = 100, pageToken: Optional[str] = None, fields: str = ""):
+        files = self._drive.files
+        start = int(pageToken) if pageToken else 0
+        page = files[start:start + pageSize]
+        result: Dict[str, Any] = {"files": [{key: file[key] for key in ("id", "name", "mimeType")} for file in page]}
+        if start + pageSize < len(files):
+            result["nextPageToken"] = str(start + pageSize)
+        return _Request(self._drive, "list", result)
+
+    def get(self, fileId: str, fields: str = ""):
+        file = self._drive.find(fileId)
+        return _Request(self._drive, "get", {"id": fileId, "mimeType": file["mimeType"]})
+
+    def export(self, fileId: str, mimeType: str):
+        return _Request(self._drive, "export", self._drive.content(fileId))
+
+    def get_media(self, fileId: str):
+        return _Request(self._drive, "get_media", self._drive.content(fileId))
+
+class _Service:
+    def __init__(self, drive: "FakeDrive"):
+        self._files = _Files(drive)
+
+    def files(self) -> _Files:
+        return self._files
+
+class FakeDrive:
+    """In-memory Drive files: dicts with id, name, mimeType and content (bytes)"""
+
+    def __init__(self, files: Iterable[Dict[str, Any]], failing: Iterable[str] = (), latency: float = 0.0):
+        self.files: List[Dict[str, Any]] = list(files)
+        self.failing = set(failing)
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def with_files(cls, count: int, failing: Iterable[str] = (), latency: float = 0.0, words: int = 200) -> "FakeDrive":
+        """`count` files, alternating plain text and Google Docs"""
+        files = []
+        for i in range(count):
+            text = " ".join(f"file{i}-word{j}" for j in range(words))
+            files.append({
+                "id": f"file_{i}",
+                "name": f"document_{i}.txt",
+                "mimeType": GOOGLE_DOC if i % 2 else "text/plain",
+                "content": text.encode("utf-8")
+            })
+        return cls(files, failing, latency)
+
+    def service(self) -> _Service:
+        return _Service(self)
+
+    def record(self, call: str):
+        with self._lock:
+            self.calls[call] = self.calls.get(call, 0) + 1
+
+    def find(self, file_id: str) -> Dict[str, Any]:
+        for file in self.files:
+            if file["id"] == file_id:
+                return file
+        raise FakeDriveError(f"File not found: {file_id}")
+
+    def content(self, file_id: str):
+        """The file's bytes, or the error its download raises"""
+        if file_id in self.failing:
+            return FakeDriveError(f"Download of {file_id} failed")
+        return self.find(file_id)["content"]
@@ -0,0 +1,117 @@
+"""
+Compare the embedding backends: agreement with the PyTorch backend, throughput and latency.
+
+Each backend embeds the same sample texts. Agreement is the cosine similarity of its vectors
+with the huggingface backend's vectors for the same texts; the script exits with status 1 when
+the lowest similarity is under --min-cosine, so it can gate a backend change.
+
+    python -m benchmarks.embedding_backends_benchmark --backends onnx onnx-int8 --output embeddings.json
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import statistics
+from typing import Dict, List
+from app.config import settings
+from app.services.embedding_backends import BACKENDS, create_backend
+
+REFERENCE_BACKEND = "huggingface"
+
+SENTENCES = [
+    "The invoice is due thirty days after delivery.",
+    "Install the package with pip and restart the server.",
+    "Photosynthesis converts light energy into chemical energy.",
+    "The committee postponed the vote until next quarter.",
+    "Set CHROMA_PERSIST_DIRECTORY to keep the index between runs.",
+    "Employees accrue two days of paid leave per month.",
+    "The bridge was closed for repairs after the storm.",
+    "Gradient descent updates the weights against the gradient of the loss.",
+    "Refunds are issued to the original payment method.",
+    "The library opens at nine on weekdays and ten on weekends.",
+]
+
+def sample_texts(count: int, seed: int) -> List[str]:
+    """Short queries and chunk-sized passages, like the service embeds"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        sentences = 1 if i % 4 == 0 else rng.randint(3, 12)
+        texts.append(" ".join(rng.choice(SENTENCES) for _ in range(sentences)))
+    return texts
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def measure(backend, texts: List[str], batch_size: int) -> Dict[str, float]:
+    """Embed the texts in batches, timing each batch"""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        batch_start = time.perf_counter()
+        backend.embed(texts[i:i + batch_size])
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "batch_size": batch_size,
+        "texts_per_second": len(texts) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["onnx", "onnx-int8"])
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts, args.seed)
+    names = [REFERENCE_BACKEND] + [name for name in args.backends if name != REFERENCE_BACKEND]
+
+    results = {"model": args.model, "texts": len(texts), "min_cosine": args.min_cosine, "backends": {}}
+    reference = None
+    passed = True
+    for name in names:
+        backend = create_backend(name, args.model)
+        start = time.perf_counter()
+        backend.load()
+        backend.embed(["warmup"])
+        result = {"load_seconds": time.perf_counter() - start}
+
+        vectors = backend.embed(texts)
+        if reference is None:
+            reference = vectors
+        else:
+            similarities = [_cosine(a, b) for a, b in zip(vectors, reference)]
+            result["cosine_to_reference"] = {
+                "min": min(similarities),
+                "mean": statistics.mean(similarities)
+            }
+            passed = passed and min(similarities) >= args.min_cosine
+
+        result["runs"] = [measure(backend, texts, batch_size) for batch_size in args.batch_sizes]
+        results["backends"][name] = result
+
+    results["passed"] = passed
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if not passed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
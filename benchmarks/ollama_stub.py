@@ -0,0 +1,72 @@
+"""
+A stand-in for Ollama's /api/generate with configurable latency, for benchmarks without a GPU
+or a network.
+
+Answers after `--prompt-latency-ms` (time to first token) with `--tokens` tokens, one every
+`--token-latency-ms`. Streaming and non-streaming calls are supported, and a call without a
+prompt (a model load) returns at once. The final response carries eval_count and eval_duration
+like Ollama's.
+
+    python -m benchmarks.ollama_stub --port 11500 --token-latency-ms 20 --tokens 64
+"""
+import json
+import time
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+def create_app(prompt_latency: float, token_latency: float, tokens: int) -> FastAPI:
+    app = FastAPI(title="Ollama stub")
+
+    def final(start: float, response: str = "") -> dict:
+        return {
+            "model": "stub",
+            "response": response,
+            "done": True,
+            "eval_count": tokens,
+            "eval_duration": int((time.perf_counter() - start) * 1e9)
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        payload = await request.json()
+        if not payload.get("prompt"):
+            return {"model": payload.get("model"), "response": "", "done": True}
+
+        await asyncio.sleep(prompt_latency)
+        start = time.perf_counter()
+
+        if not payload.get("stream", True):
+            await asyncio.sleep(token_latency * tokens)
+            return final(start, " ".join(f"token{i}" for i in range(tokens)))
+
+        async def stream():
+            for i in range(tokens):
+                yield json.dumps({"model": "stub", "response": f"token{i} ", "done": False}) + "\n"
+                await asyncio.sleep(token_latency)
+            yield json.dumps(final(start)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "stub"}]}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--prompt-latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.prompt_latency_ms / 1000, args.token_latency_ms / 1000, args.tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+End-to-end benchmark: ingestion and chat on a synthetic corpus, with a stub Ollama.
+
+1. Generates a corpus of .txt and .pdf files (see benchmarks.synthetic_corpus).
+2. Ingests it with DocumentService into a temporary data directory, in a separate process,
+   measuring chunks/s, peak RSS, list_documents latency and retrieval latency.
+3. Starts benchmarks.ollama_stub and the app with uvicorn, waits for /health/ready, then
+   sends chat requests to /api/chat/ (or /api/chat/stream) at the given concurrency,
+   measuring end-to-end latency and the server's per-stage Server-Timing.
+
+Nothing leaves the machine, but the embedding model must already be in the local Hugging Face
+cache. Results are written as JSON; pass a previous run with --baseline to print the changes.
+Other settings (e.g. OLLAMA_MAX_CONCURRENCY, RETRIEVAL_MODE) are read from the environment.
+
+    python -m benchmarks.rag_benchmark --documents 200 --requests 200 --concurrency 8 --output run.json
+    python -m benchmarks.rag_benchmark --documents 200 --requests 200 --concurrency 8 --baseline run.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from benchmarks.synthetic_corpus import generate, make_questions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda p: samples[min(int(p / 100 * len(samples)), len(samples) - 1)]
+    return {
+        "p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99),
+        "mean_ms": sum(samples) / len(samples), "count": len(samples)
+    }
+
+def peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """{"embed": 12.3, ...} from "embed;dur=12.3, ..." """
+    timings = {}
+    for entry in (header or "").split(","):
+        name, _, duration = entry.strip().partition(";dur=")
+        if name and duration:
+            timings[name] = float(duration)
+    return timings
+
+async def ingest_phase(corpus_directory: str, mode: str, questions: List[str], list_runs: int) -> Dict[str, Any]:
+    """Runs in its own process, so its peak RSS is that of ingestion alone"""
+    from app.database import init_db
+    from app.services.document_service import get_document_service
+    from app.services.chat_service import get_chat_service
+
+    await init_db()
+    service = await get_document_service()
+    chat_service = await get_chat_service()
+
+    start = time.perf_counter()
+    await service.embedding_service.warmup()
+    model_load_seconds = time.perf_counter() - start
+
+    files = sorted(os.listdir(corpus_directory))
+    start = time.perf_counter()
+    if mode == "bulk":
+        result = await service.process_files_bulk(
+            [(os.path.join(corpus_directory, name), name) for name in files], "benchmark"
+        )
+        chunks = result["chunks"]
+    else:
+        chunks = 0
+        for name in files:
+            response = await service.process_uploaded_file(os.path.join(corpus_directory, name), name, "benchmark")
+            chunks += response.chunk_count
+    elapsed = time.perf_counter() - start
+
+    list_samples = []
+    for _ in range(list_runs):
+        started = time.perf_counter()
+        await service.list_documents(limit=100)
+        list_samples.append((time.perf_counter() - started) * 1000)
+
+    # Distinct questions, so every retrieval embeds and queries
+    retrieval_samples = []
+    for question in questions:
+        started = time.perf_counter()
+        await chat_service._retrieve_relevant_documents(question)
+        retrieval_samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "mode": mode,
+        "files": len(files),
+        "chunks": chunks,
+        "seconds": elapsed,
+        "files_per_second": len(files) / elapsed,
+        "chunks_per_second": chunks / elapsed,
+        "model_load_seconds": model_load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "list_documents": percentiles(list_samples),
+        "retrieval": percentiles(retrieval_samples)
+    }
+
+def run_ingestion(args, corpus_directory: str, env: Dict[str, str]) -> Dict[str, Any]:
+    command = [
+        sys.executable, "-m", "benchmarks.rag_benchmark", "--phase", "ingest",
+        "--corpus", corpus_directory, "--ingest-mode", args.ingest_mode,
+        "--retrieval-queries", str(args.retrieval_queries), "--list-runs", str(args.list_runs),
+        "--topics", str(args.topics), "--seed", str(args.seed)
+    ]
+    output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"Ingestion failed:\n{output.stderr[-4000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+async def wait_ready(client, url: str, server: subprocess.Popen, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return time.perf_counter() - start
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"{url} not ready within {timeout}s")
+
+async def drive_chat(client, base_url: str, questions: List[str], concurrency: int, stream: bool) -> Dict[str, Any]:
+    """Send every question once, `concurrency` at a time"""
+    queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    latencies, first_tokens, errors = [], [], {}
+    stages: Dict[str, List[float]] = {}
+
+    async def send(question: str):
+        body = {"query": question, "use_cache": False}
+        started = time.perf_counter()
+        if stream:
+            async with client.stream("POST", f"{base_url}/api/chat/stream", json=body) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    return response.status_code, response.headers, None
+                first_token = None
+                async for line in response.aiter_lines():
+                    if line and first_token is None and json.loads(line).get("type") == "token":
+                        first_token = (time.perf_counter() - started) * 1000
+                return 200, response.headers, first_token
+        response = await client.post(f"{base_url}/api/chat/", json=body)
+        return response.status_code, response.headers, None
+
+    async def worker():
+        while not queue.empty():
+            question = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                status, headers, first_token = await send(question)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if first_token is not None:
+                first_tokens.append(first_token)
+            for stage, duration in parse_server_timing(headers.get("server-timing")).items():
+                stages.setdefault(stage, []).append(duration)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    results = {
+        "endpoint": "/api/chat/stream" if stream else "/api/chat/",
+        "requests": len(questions),
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "errors": errors,
+        "end_to_end": percentiles(latencies),
+        "server_timing": {stage: percentiles(samples) for stage, samples in stages.items()}
+    }
+    if stream:
+        results["time_to_first_token"] = percentiles(first_tokens)
+    return results
+
+async def run_chat(args, questions: List[str], env: Dict[str, str], stub_port: int) -> Dict[str, Any]:
+    import httpx
+
+    server_port = _free_port()
+    stub = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.ollama_stub", "--port", str(stub_port),
+            "--prompt-latency-ms", str(args.prompt_latency_ms), "--token-latency-ms", str(args.token_latency_ms),
+            "--tokens", str(args.tokens)
+        ],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(server_port), "--log-level", "warning"],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{server_port}"
+    try:
+        async with httpx.AsyncClient(timeout=args.request_timeout) as client:
+            ready_seconds = await wait_ready(client, f"{base_url}/health/ready", server, args.ready_timeout)
+            results = await drive_chat(client, base_url, questions, args.concurrency, args.stream)
+        return {"ready_seconds": ready_seconds, **results}
+    finally:
+        for process in (server, stub):
+            process.terminate()
+            process.wait()
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any]):
+    """Print the metrics of both runs side by side, with the relative change"""
+    before, after = _flatten(baseline["results"]), _flatten(results["results"])
+    print(f"\n{'metric':60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(before.keys() & after.keys()):
+        change = f"{(after[name] - before[name]) / before[name] * 100:+.1f}%" if before[name] else ""
+        print(f"{name:60} {before[name]:12.2f} {after[name]:12.2f} {change:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--words-per-document", type=int, default=1500)
+    parser.add_argument("--pdf-fraction", type=float, default=0.25)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--ingest-mode", choices=["upload", "bulk"], default="upload",
+                        help="one process_uploaded_file call per file, or a single process_files_bulk call")
+    parser.add_argument("--list-runs", type=int, default=50)
+    parser.add_argument("--retrieval-queries", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stream", action="store_true", help="use /api/chat/stream and report time to first token")
+    parser.add_argument("--prompt-latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the corpus and data directory")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results of a previous run to compare against")
+    # Internal: the ingestion phase, run in a child process
+    parser.add_argument("--phase", choices=["all", "ingest"], default="all", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "ingest":
+        questions = make_questions(args.retrieval_queries, args.topics, args.seed)
+        results = asyncio.run(ingest_phase(args.corpus, args.ingest_mode, questions, args.list_runs))
+        print(json.dumps(results))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="rag_benchmark_")
+    corpus_directory = os.path.join(workdir, "corpus")
+    stub_port = _free_port()
+    env = {
+        **os.environ,
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(workdir, "data"),
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{stub_port}",
+        "OLLAMA_MODEL": "stub"
+    }
+
+    try:
+        generate(corpus_directory, args.documents, args.words_per_document, args.pdf_fraction, args.topics, args.seed)
+        ingestion = run_ingestion(args, corpus_directory, env)
+        # Different questions from the retrieval phase, so no cached retrieval is reused
+        questions = make_questions(args.retrieval_queries + args.requests, args.topics, args.seed)[args.retrieval_queries:]
+        chat = asyncio.run(run_chat(args, questions, env, stub_port))
+    finally:
+        if args.keep:
+            print(f"Kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("phase", "corpus", "output", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": {"ingestion": ingestion, "chat": chat}
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
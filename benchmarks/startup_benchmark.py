@@ -0,0 +1,106 @@
+"""
+Benchmark cold start: the time to import app.main, and the time from launching the server to
+the first 200 from /health.
+
+Each run uses a fresh interpreter and an empty data directory, so nothing is cached between runs.
+Heavy modules imported by app.main are listed, to catch eager imports creeping back in.
+
+    python -m benchmarks.startup_benchmark --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from typing import Dict, List
+
+# Modules that should only be imported once their feature is used
+HEAVY_MODULES = [
+    "langchain", "langchain_community", "sentence_transformers", "torch",
+    "fitz", "googleapiclient", "google_auth_oauthlib", "chromadb"
+]
+
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def _environment(data_directory: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["CHROMA_PERSIST_DIRECTORY"] = data_directory
+    return env
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import() -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as data_directory:
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            env=_environment(data_directory), capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_first_health(path: str, timeout: float) -> float:
+    """Launch uvicorn and poll until the health endpoint returns 200"""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as data_directory:
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+            env=_environment(data_directory), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                        if response.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                time.sleep(0.02)
+            raise TimeoutError(f"No 200 from {path} within {timeout}s")
+        finally:
+            server.terminate()
+            server.wait()
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "max_s": max(samples)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--health-path", default="/health/live")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    health = [measure_first_health(args.health_path, args.timeout) for _ in range(args.runs)]
+
+    results = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "import_app_main": summarize([run["seconds"] for run in imports]),
+        "heavy_modules_imported": sorted({module for run in imports for module in run["heavy"]}),
+        "first_health_200": {"path": args.health_path, **summarize(health)}
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
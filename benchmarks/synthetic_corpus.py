@@ -0,0 +1,117 @@
+"""
+Generate a synthetic corpus of .txt and .pdf documents, and questions about it.
+
+Every document covers a few topics, and each topic sentence states a fact with a unique code
+(e.g. "policy-0042"), so generated questions have a known answer somewhere in the corpus.
+
+    python -m benchmarks.synthetic_corpus --documents 200 --pdf-fraction 0.25 --directory corpus/
+"""
+import os
+import json
+import random
+import argparse
+from typing import Dict, List
+
+SUBJECTS = [
+    "travel policy", "expense report", "security review", "release process", "onboarding plan",
+    "backup schedule", "incident response", "vendor contract", "support rotation", "budget forecast"
+]
+VERBS = ["requires", "describes", "limits", "extends", "replaces", "documents", "schedules", "approves"]
+OBJECTS = [
+    "a manager sign-off", "the quarterly audit", "two factor authentication", "a rollback plan",
+    "the regional office", "weekly status reports", "an external reviewer", "the staging cluster",
+    "encrypted storage", "a thirty day notice"
+]
+FILLER = [
+    "This section was last reviewed by the operations team.",
+    "Questions about it should go to the owning department.",
+    "Exceptions are recorded in the shared tracker.",
+    "The previous version of this text is kept in the archive.",
+    "It applies to all teams unless stated otherwise.",
+    "Details may change after the next planning cycle."
+]
+
+def topic_code(index: int) -> str:
+    return f"policy-{index:04d}"
+
+def fact(rng: random.Random, topic: int) -> str:
+    return (
+        f"The {rng.choice(SUBJECTS)} {topic_code(topic)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+        f"and {rng.choice(OBJECTS)}."
+    )
+
+def make_document(rng: random.Random, topics: List[int], words: int) -> str:
+    """Paragraphs of facts about the given topics, padded with filler to about `words` words"""
+    paragraphs = []
+    count = 0
+    while count < words:
+        sentences = [fact(rng, rng.choice(topics))] + rng.choices(FILLER, k=rng.randint(2, 5))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        count += len(paragraph.split())
+    return "\n\n".join(paragraphs)
+
+def write_pdf(path: str, text: str, words_per_page: int = 450):
+    """Write text to a PDF, a page per `words_per_page` words"""
+    import fitz
+
+    words = text.split(" ")
+    pdf = fitz.open()
+    for start in range(0, len(words), words_per_page):
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), " ".join(words[start:start + words_per_page]), fontsize=9)
+    pdf.save(path)
+    pdf.close()
+
+def generate(
+    directory: str, documents: int, words_per_document: int, pdf_fraction: float, topics: int, seed: int
+) -> List[Dict[str, str]]:
+    """Write the corpus to `directory`, returning the name, path and topics of each document"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    files = []
+    for i in range(documents):
+        document_topics = rng.sample(range(topics), k=min(3, topics))
+        text = make_document(rng, document_topics, words_per_document)
+        is_pdf = rng.random() < pdf_fraction
+        name = f"doc_{i:05d}.{'pdf' if is_pdf else 'txt'}"
+        path = os.path.join(directory, name)
+        if is_pdf:
+            write_pdf(path, text)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        files.append({"name": name, "path": path, "topics": document_topics})
+    return files
+
+def make_questions(count: int, topics: int, seed: int) -> List[str]:
+    """Distinct questions about topics of the corpus"""
+    rng = random.Random(seed + 1)
+    templates = [
+        "What does {code} require?",
+        "Which rules apply under {code}?",
+        "Summarize {code} for a new employee.",
+        "Does {code} mention {object}?"
+    ]
+    questions = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        questions.append(template.format(code=topic_code(rng.randrange(topics)), object=rng.choice(OBJECTS)) + f" (#{i})")
+    return questions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", required=True)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--words-per-document", type=int, default=1500)
+    parser.add_argument("--pdf-fraction", type=float, default=0.25)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate(args.directory, args.documents, args.words_per_document, args.pdf_fraction, args.topics, args.seed)
+    print(json.dumps({"documents": len(files), "directory": args.directory}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare vector stores on the same synthetic corpus: Chroma, and the NumPy store with each
+storage type and index.
+
+Embeddings are clustered unit vectors, like sentence embeddings of related chunks. Recall@k is
+measured against exact float32 search; latency is per single-vector query.
+
+    python -m benchmarks.vector_store_benchmark --vectors 100000 --queries 500 --output vector_stores.json
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vector_store import ChromaVectorStore
+from app.services.numpy_vector_store import NumpyVectorStore
+
+STORES = ["chroma", "float32-flat", "float16-flat", "int8-flat", "float16-hnsw", "int8-hnsw"]
+
+def make_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    distances = np.square(queries).sum(axis=1)[:, None] + np.square(vectors).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    return [set(row) for row in np.argsort(distances, axis=1)[:, :k]]
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    pick = lambda p: samples[min(int(p / 100 * len(samples)), len(samples) - 1)]
+    return {"p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99), "mean_ms": sum(samples) / len(samples)}
+
+def directory_size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+
+def open_store(name: str, directory: str):
+    if name == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=directory)
+        return ChromaVectorStore(client.create_collection(name="benchmark"))
+    dtype, index = name.split("-")
+    return NumpyVectorStore(directory, dtype=dtype, index=index)
+
+def run_store(name: str, vectors: np.ndarray, queries: np.ndarray, truth: List[set], k: int, batch_size: int) -> Dict[str, object]:
+    directory = tempfile.mkdtemp(prefix=f"vectors_{name}_")
+    try:
+        store = open_store(name, directory)
+
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), batch_size):
+            end = min(offset + batch_size, len(vectors))
+            store.add(
+                ids=[f"chunk_{i}" for i in range(offset, end)],
+                embeddings=vectors[offset:end].tolist(),
+                metadatas=[{"document_id": f"doc_{i // 20}", "chunk_id": i % 20} for i in range(offset, end)],
+                documents=[f"text of chunk {i}" for i in range(offset, end)]
+            )
+        add_seconds = time.perf_counter() - start
+
+        # The first query builds the HNSW graph of the NumPy store
+        start = time.perf_counter()
+        store.query(query_embeddings=[queries[0].tolist()], n_results=k)
+        first_query_seconds = time.perf_counter() - start
+
+        samples, found = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = store.query(query_embeddings=[query.tolist()], n_results=k, include=["metadatas", "distances"])
+            samples.append((time.perf_counter() - start) * 1000)
+            found += len(expected & {int(chunk_key.split("_")[1]) for chunk_key in result["ids"][0]})
+
+        start = time.perf_counter()
+        store.get(where={"document_id": "doc_7"}, include=["metadatas"])
+        get_ms = (time.perf_counter() - start) * 1000
+
+        store.close()
+        return {
+            "add_seconds": add_seconds,
+            "vectors_per_second": len(vectors) / add_seconds,
+            "first_query_seconds": first_query_seconds,
+            "query_latency": percentiles(samples),
+            f"recall_at_{k}": found / (k * len(queries)),
+            "get_by_document_ms": get_ms,
+            "disk_mb": directory_size_mb(directory)
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=5000, help="vectors per add call, as during bulk ingestion")
+    parser.add_argument("--stores", nargs="+", choices=STORES, default=STORES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Queries come from the same clusters, as a question is near the chunks that answer it
+    generated = make_vectors(args.vectors + args.queries, args.dimension, args.clusters, args.seed)
+    vectors, queries = generated[:args.vectors], generated[args.vectors:]
+    truth = exact_neighbours(vectors, queries, args.k)
+
+    results = {
+        "vectors": args.vectors,
+        "dimension": args.dimension,
+        "queries": args.queries,
+        "k": args.k,
+        "stores": {name: run_store(name, vectors, queries, truth, args.k, args.batch_size) for name in args.stores}
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()